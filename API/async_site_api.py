@@ -0,0 +1,439 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from telebot.asyncio_helper import ApiTelegramException
+from telebot.types import InputMediaPhoto, Message
+
+from async_loader import bot
+from config_data.config import settings
+from API.cache import make_cache_key, mark_stale
+from API.circuit_breaker import UNAVAILABLE_REPLY, ApiUnavailable, breaker
+from API.quota import DAILY_LIMIT_REPLY, QuotaExceeded, quota
+from API.movie import MovieRecord, decode_docs
+from API.singleflight import AsyncSingleFlight
+from database import catalog, title_index
+from utils.send_scheduler import BULK, send_priority
+from utils.tracing import API, traced
+from API.kinopoisk import (
+    ALBUM_SIZE,
+    NO_POSTER_TEXT,
+    api_latency,
+    api_requests,
+    budget_params,
+    collect_name_matches,
+    index_titles,
+    format_movie_info,
+    name_params,
+    poster_cache,
+    rating_params,
+    response_cache,
+)
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_session: Optional[aiohttp.ClientSession] = None
+single_flight = AsyncSingleFlight()
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Возвращает общую HTTP-сессию асинхронного режима, создавая ее при первом обращении.
+    :return aiohttp.ClientSession: Сессия с пулом keep-alive соединений.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=settings.HTTP_POOL_SIZE),
+            timeout=aiohttp.ClientTimeout(
+                connect=settings.HTTP_CONNECT_TIMEOUT,
+                sock_read=settings.HTTP_READ_TIMEOUT,
+            ),
+            headers={"Accept": "application/json", "Accept-Encoding": "gzip, deflate"},
+        )
+    return _session
+
+
+async def close_session() -> None:
+    """Закрывает HTTP-сессию асинхронного режима.
+    :return None
+    """
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def search_by_budget(
+    user_id: int, count: int, sort_type: int, page: int = 1
+) -> Optional[List[MovieRecord]]:
+    """Выполняет поиск фильмов по бюджету.
+    Если включен локальный каталог, фильмы берутся из него, API используется при промахе.
+    :param user_id: Идентификатор пользователя, для которого выполняется поиск.
+    :param count: Количество фильмов, которое нужно получить.
+    :param sort_type: Тип сортировки результатов поиска.
+    :param page: Номер страницы результатов поиска. По умолчанию 1.
+    :return Optional[List[MovieRecord]]: Список фильмов, найденных по бюджету.
+    """
+    movies = await asyncio.to_thread(catalog.search_by_budget, count, sort_type, page)
+    if movies:
+        return movies
+    params = budget_params(count, sort_type, page)
+    return await make_request(
+        settings.API_URL, params, user_id, search_type="budget", first_page=page == 1
+    )
+
+
+async def search_by_name(
+    user_id: int, name: str, count: int = 10, offset: int = 0
+) -> Tuple[List[MovieRecord], List[int]]:
+    """Выполняет поиск фильмов по названию.
+    Локальный индекс названий отвечает, только если в нем набирается count фильмов,
+    название которых содержит запрос, иначе используется API. Уже показанные из индекса
+    фильмы при переходе к API пропускаются. Похожие названия с учетом опечаток берутся
+    из индекса, если API ничего не нашло или недоступно.
+    Результаты API фильтруются по вхождению названия, поэтому страницы API запрашиваются
+    до тех пор, пока не наберется нужное количество фильмов или результаты не закончатся.
+    :param user_id: Идентификатор пользователя, для которого выполняется поиск.
+    :param name: Название фильма.
+    :param count: Количество фильмов, которое нужно получить. По умолчанию 10.
+    :param offset: Позиция в результатах API, с которой начинается поиск. По умолчанию 0.
+    Отрицательная позиция - позиция в результатах локального индекса.
+    :return Tuple[List[MovieRecord], List[int]]: Список фильмов, найденных по названию, и позиции в
+    результатах API сразу после каждого из них.
+    """
+    local = await asyncio.to_thread(title_index.search_page, name, offset, count)
+    if local is not None:
+        return local
+
+    local_offset = min(offset, 0)
+    shown = await asyncio.to_thread(title_index.shown_ids, name, local_offset)
+    offset = max(offset, 0)
+    from_start = offset == 0
+    batch_size = settings.NAME_SEARCH_BATCH
+    movies: List[MovieRecord] = []
+    offsets: List[int] = []
+
+    try:
+        for _ in range(settings.NAME_SEARCH_MAX_BATCHES):
+            page, skip = divmod(offset, batch_size)
+            batch = await make_request(
+                settings.API_URL + "/search",
+                name_params(name, page + 1),
+                user_id,
+                search_type="name",
+                first_page=offset == 0,
+                keep_positions=True,
+            )
+            if collect_name_matches(
+                batch[skip:], name, offset, count, movies, offsets, shown
+            ):
+                break
+
+            if len(batch) < batch_size:
+                break
+            offset = (page + 1) * batch_size
+    except ApiUnavailable:
+        if movies or not from_start:
+            raise
+        fuzzy = await asyncio.to_thread(
+            title_index.fuzzy_page, name, local_offset, count
+        )
+        if not fuzzy[0]:
+            raise
+        return fuzzy
+
+    if not movies and from_start:
+        return await asyncio.to_thread(
+            title_index.fuzzy_page, name, local_offset, count
+        )
+    return movies, offsets
+
+
+async def search_by_rating(
+    user_id: int, count: int, sort_type: int, rating: str, page: int = 1
+) -> Optional[List[MovieRecord]]:
+    """Выполняет поиск фильмов по рейтингу.
+    Если включен локальный каталог, фильмы берутся из него, API используется при промахе.
+    :param user_id: Идентификатор пользователя, для которого выполняется поиск.
+    :param count: Количество фильмов, которое нужно получить.
+    :param sort_type: Тип сортировки результатов поиска.
+    :param rating: Диапазон рейтинга, который нужно использовать для поиска.
+    :param page: Номер страницы результатов поиска. По умолчанию 1.
+    :return Optional[List[MovieRecord]]: Список фильмов, найденных по рейтингу.
+    """
+    movies = await asyncio.to_thread(
+        catalog.search_by_rating, count, sort_type, rating, page
+    )
+    if movies:
+        return movies
+    params = rating_params(count, sort_type, rating, page)
+    return await make_request(
+        settings.API_URL, params, user_id, search_type="rating", first_page=page == 1
+    )
+
+
+async def send_movies_info(chat_id: int, movies: List[MovieRecord]) -> List[Message]:
+    """Отправляет информацию о фильмах пользователю.
+    В режиме "album" постеры отправляются альбомами до 10 фотографий, фильмы без постера - текстом.
+    Порядок фильмов сохраняется: альбом прерывается перед фильмом без постера.
+    :param chat_id: Идентификатор чата, в который нужно отправить информацию о фильмах.
+    :param movies: Список фильмов, информацию о которых нужно отправить.
+    :return List[Message]: Отправленные сообщения в порядке отправки.
+    """
+    with send_priority(BULK):
+        messages = []
+        album = []
+        for movie in movies:
+            poster_url, caption = format_movie_info(movie)
+            if not poster_url:
+                if album:
+                    messages += await send_album(chat_id, album)
+                    album = []
+                messages.append(
+                    await bot.send_message(chat_id, caption + NO_POSTER_TEXT)
+                )
+            elif settings.RESULTS_DELIVERY != "album":
+                messages.append(await send_poster(chat_id, poster_url, caption))
+            else:
+                album.append((poster_url, caption))
+                if len(album) == ALBUM_SIZE:
+                    messages += await send_album(chat_id, album)
+                    album = []
+        if album:
+            messages += await send_album(chat_id, album)
+        return messages
+
+
+async def edit_movies_info(
+    chat_id: int, first_message_id: int, count: int, movies: List[MovieRecord]
+) -> bool:
+    """Заменяет постеры и подписи уже отправленной страницы результатов на новые фильмы.
+    Замена возможна, если у новой страницы столько же фильмов, что и у старой, и у всех
+    есть постеры.
+    :param chat_id: Идентификатор чата.
+    :param first_message_id: Идентификатор первого сообщения старой страницы.
+    :param count: Количество сообщений старой страницы.
+    :param movies: Фильмы новой страницы.
+    :return bool: True, если страница заменена, False - если ее нужно отправить заново.
+    """
+    if len(movies) != count:
+        return False
+    posters = [format_movie_info(movie) for movie in movies]
+    if not all(poster_url for poster_url, _ in posters):
+        return False
+
+    with send_priority(BULK):
+        for message_id, (poster_url, caption) in enumerate(posters, first_message_id):
+            file_id = await asyncio.to_thread(poster_cache.get, poster_url)
+            try:
+                message = await bot.edit_message_media(
+                    InputMediaPhoto(file_id or poster_url, caption), chat_id, message_id
+                )
+            except ApiTelegramException as err:
+                if "message is not modified" in str(err):
+                    continue
+                logging.warning(
+                    f"Не удалось заменить сообщение {message_id} в чате {chat_id}: {err}"
+                )
+                if file_id:
+                    await asyncio.to_thread(poster_cache.invalidate, poster_url)
+                return False
+            if isinstance(message, Message) and message.photo:
+                await asyncio.to_thread(
+                    poster_cache.set, poster_url, message.photo[-1].file_id
+                )
+        return True
+
+
+async def send_album(chat_id: int, album: List[Tuple[str, str]]) -> List[Message]:
+    """Отправляет один альбом постеров, используя file_id уже загруженных постеров.
+    :param chat_id: Идентификатор чата.
+    :param album: Список пар (URL постера, подпись).
+    :return List[Message]: Отправленные сообщения.
+    """
+    if len(album) == 1:
+        return [await send_poster(chat_id, *album[0])]
+
+    file_ids = await asyncio.to_thread(
+        lambda: [poster_cache.get(poster_url) for poster_url, _ in album]
+    )
+    try:
+        messages = await bot.send_media_group(
+            chat_id,
+            [
+                InputMediaPhoto(file_id or poster_url, caption)
+                for (poster_url, caption), file_id in zip(album, file_ids)
+            ],
+        )
+    except ApiTelegramException as err:
+        logging.warning(f"Не удалось отправить альбом в чат {chat_id}: {err}")
+        for (poster_url, _), file_id in zip(album, file_ids):
+            if file_id:
+                await asyncio.to_thread(poster_cache.invalidate, poster_url)
+        messages = []
+        for poster_url, caption in album:
+            try:
+                messages.append(await send_poster(chat_id, poster_url, caption))
+            except ApiTelegramException:
+                messages.append(
+                    await bot.send_message(chat_id, caption + NO_POSTER_TEXT)
+                )
+        return messages
+
+    for (poster_url, _), message in zip(album, messages):
+        if message.photo:
+            await asyncio.to_thread(
+                poster_cache.set, poster_url, message.photo[-1].file_id
+            )
+    return messages
+
+
+async def send_poster(chat_id: int, poster_url: str, caption: str) -> Message:
+    """Отправляет постер с подписью, используя file_id из кэша, если он есть.
+    :param chat_id: Идентификатор чата.
+    :param poster_url: URL постера.
+    :param caption: Подпись к постеру.
+    :return Message: Отправленное сообщение.
+    """
+    file_id = await asyncio.to_thread(poster_cache.get, poster_url)
+    if file_id:
+        try:
+            return await bot.send_photo(chat_id, file_id, caption)
+        except ApiTelegramException as err:
+            logging.warning(f"Не удалось отправить постер по file_id {file_id}: {err}")
+            await asyncio.to_thread(poster_cache.invalidate, poster_url)
+
+    message = await bot.send_photo(chat_id, poster_url, caption)
+    if message.photo:
+        await asyncio.to_thread(poster_cache.set, poster_url, message.photo[-1].file_id)
+    return message
+
+
+@traced(API)
+async def make_request(
+    url: str,
+    params: Dict[str, Any],
+    user_id: int,
+    search_type: Optional[str] = None,
+    first_page: bool = True,
+    keep_positions: bool = False,
+) -> List[Optional[MovieRecord]]:
+    """Асинхронно выполняет HTTP-запрос к API и возвращает список фильмов из ответа.
+    Использует тот же кэш ответов, лимит запросов и предохранитель, что и синхронный режим,
+    и объединяет одинаковые запросы. Если API недоступно, возвращается устаревший ответ из кэша.
+    :param url: URL, к которому нужно выполнить запрос.
+    :param params: Параметры, которые нужно передать в запросе.
+    :param user_id: Идентификатор пользователя, для которого выполняется запрос.
+    :param search_type: Тип поиска, определяющий время жизни записи в кэше.
+    :param first_page: Запрос первой страницы нового поиска, для которой зарезервирована часть лимита.
+    :param keep_positions: Оставлять None на месте неполных фильмов, сохраняя позиции ответа API.
+    :return List[Optional[MovieRecord]]: Фильмы из ответа API или из кэша.
+    :raises QuotaExceeded: Если лимит запросов исчерпан.
+    :raises ApiUnavailable: Если API недоступно, а устаревшего ответа в кэше нет.
+    """
+    cache_key = make_cache_key(url, params)
+    label = search_type or ""
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        api_requests.inc(label, "cache")
+        return cached
+
+    async def fetch() -> List[MovieRecord]:
+        if not breaker.allow():
+            raise ApiUnavailable(UNAVAILABLE_REPLY)
+        try:
+            await asyncio.to_thread(quota.acquire, user_id, first_page)
+        except QuotaExceeded:
+            breaker.cancel()
+            raise
+        started = time.monotonic()
+        try:
+            movies = await fetch_docs(
+                url, params, cache_key, search_type, keep_positions
+            )
+        except QuotaExceeded:
+            breaker.record(True, time.monotonic() - started)
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            breaker.record(False, time.monotonic() - started)
+            raise
+        except BaseException:
+            breaker.cancel()
+            raise
+        finally:
+            api_latency.observe(time.monotonic() - started, label)
+        breaker.record(True, time.monotonic() - started)
+        return movies
+
+    try:
+        movies = list(await single_flight.do(cache_key, fetch))
+    except QuotaExceeded:
+        api_requests.inc(label, "quota")
+        raise
+    except (
+        aiohttp.ClientError,
+        asyncio.TimeoutError,
+        ValueError,
+        ApiUnavailable,
+    ) as err:
+        if not isinstance(err, ApiUnavailable):
+            logging.error(
+                f"Произошла ошибка при запросе '{url}' для пользователя {user_id}: {err}."
+            )
+        stale = response_cache.get_stale(cache_key)
+        if stale is None:
+            api_requests.inc(label, "unavailable")
+            raise ApiUnavailable(UNAVAILABLE_REPLY) from err
+        api_requests.inc(label, "stale")
+        return mark_stale(stale)
+    api_requests.inc(label, "api")
+    return movies
+
+
+async def fetch_docs(
+    url: str,
+    params: Dict[str, Any],
+    cache_key: str,
+    search_type: Optional[str],
+    keep_positions: bool = False,
+) -> List[Optional[MovieRecord]]:
+    """Запрашивает список фильмов у API с повторами при сбоях сервера, сохраняет его в кэш
+    и индекс названий. Фильмы, неполные по notNullFields запроса, отбрасываются.
+    :param url: URL, к которому нужно выполнить запрос.
+    :param params: Параметры, которые нужно передать в запросе.
+    :param cache_key: Ключ кэша для ответа.
+    :param search_type: Тип поиска, определяющий время жизни записи в кэше.
+    :param keep_positions: Оставлять None на месте неполных фильмов.
+    :return List[Optional[MovieRecord]]: Фильмы из поля "docs" ответа.
+    :raises QuotaExceeded: Если API сообщило об исчерпании лимита.
+    """
+    query = [
+        (key, str(item))
+        for key, value in params.items()
+        for item in (value if isinstance(value, (list, tuple)) else [value])
+    ]
+    for attempt in range(settings.HTTP_RETRIES + 1):
+        try:
+            async with get_session().get(url, params=query) as response:
+                if response.status in (403, 429):
+                    await asyncio.to_thread(quota.exhaust)
+                    raise QuotaExceeded(DAILY_LIMIT_REPLY)
+                if (
+                    response.status in RETRY_STATUSES
+                    and attempt < settings.HTTP_RETRIES
+                ):
+                    raise aiohttp.ServerConnectionError(f"HTTP {response.status}")
+                response.raise_for_status()
+                docs = (await response.json()).get("docs", [])
+                break
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == settings.HTTP_RETRIES:
+                raise
+            await asyncio.sleep(settings.HTTP_BACKOFF_FACTOR * 2**attempt)
+
+    movies = decode_docs(docs, params.get("notNullFields", ()), keep_positions)
+    response_cache.set(cache_key, movies, search_type)
+    await asyncio.to_thread(index_titles, docs)
+    return movies
@@ -0,0 +1,221 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from API.movie import MovieRecord
+
+EXCLUDED_KEY_PARAMS = frozenset(["token"])
+
+
+def make_cache_key(url: str, params: Dict[str, Any]) -> str:
+    """Строит ключ кэша из URL и нормализованных параметров запроса.
+    Параметры сортируются, списки приводятся к кортежам, токен API в ключ не попадает.
+    :param url: URL запроса.
+    :param params: Параметры запроса.
+    :return str: Ключ кэша.
+    """
+    normalized = {
+        key: sorted(value) if isinstance(value, (list, tuple, set)) else value
+        for key, value in params.items()
+        if key not in EXCLUDED_KEY_PARAMS
+    }
+    return (
+        url
+        + "?"
+        + json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    )
+
+
+def mark_stale(movies: List[Optional[MovieRecord]]) -> List[Optional[MovieRecord]]:
+    """Помечает фильмы как взятые из устаревшей записи кэша.
+    :param movies: Список фильмов, возможно с None на месте неполных.
+    :return List[Optional[MovieRecord]]: Копии фильмов с пометкой.
+    """
+    return [movie._replace(stale=True) if movie else movie for movie in movies]
+
+
+def is_stale(movies: List[MovieRecord]) -> bool:
+    """Проверяет, есть ли среди фильмов взятые из устаревшей записи кэша.
+    :param movies: Список фильмов.
+    :return bool: True, если хотя бы один фильм помечен mark_stale.
+    """
+    return any(movie.stale for movie in movies)
+
+
+class ResponseCache:
+    """Ограниченный по числу записей и объему кэш ответов с TTL и вытеснением LRU.
+    Истекшие записи хранятся еще stale_ttl секунд и отдаются методом get_stale, когда
+    API недоступно.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttls: Dict[str, float],
+        default_ttl: float = 60.0,
+        stale_ttl: float = 0.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.stale_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, List[MovieRecord]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def ttl_for(self, search_type: Optional[str]) -> float:
+        """Возвращает время жизни записи для типа поиска.
+        :param search_type: Тип поиска.
+        :return float: TTL в секундах.
+        """
+        return self.ttls.get(search_type, self.default_ttl)
+
+    def get(self, key: Hashable) -> Optional[List[MovieRecord]]:
+        """Возвращает закэшированный список фильмов или None, если записи нет или она устарела.
+        :param key: Ключ кэша.
+        :return Optional[List[MovieRecord]]: Копия закэшированного списка.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, docs = entry
+            now = time.monotonic()
+            if expires_at < now:
+                if expires_at + self.stale_ttl < now:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(docs)
+
+    def get_stale(self, key: Hashable) -> Optional[List[MovieRecord]]:
+        """Возвращает список фильмов, даже если запись истекла, но еще не старше stale_ttl.
+        :param key: Ключ кэша.
+        :return Optional[List[MovieRecord]]: Копия закэшированного списка или None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, _, docs = entry
+            if expires_at + self.stale_ttl < time.monotonic():
+                self._remove(key)
+                return None
+            self.stale_hits += 1
+            return list(docs)
+
+    def set(
+        self, key: Hashable, docs: List[MovieRecord], search_type: Optional[str]
+    ) -> None:
+        """Сохраняет список фильмов в кэш, вытесняя давно не использованные записи.
+        :param key: Ключ кэша.
+        :param docs: Список фильмов.
+        :param search_type: Тип поиска, определяющий TTL записи.
+        :return None
+        """
+        ttl = self.ttl_for(search_type)
+        if ttl <= 0:
+            return
+        size = len(json.dumps(docs, ensure_ascii=False, default=str).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, list(docs))
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Очищает кэш.
+        :return None
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает счетчики попаданий и промахов, а также текущий размер кэша.
+        :return Dict[str, int]: Статистика кэша.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+
+class CaptionCache:
+    """Ограниченный кэш подписей к фильмам с вытеснением LRU.
+    Ключ - идентификатор фильма и хэш его полей, поэтому при изменении данных фильма
+    подпись строится заново.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[MovieRecord, str]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, movie: MovieRecord, render: Callable[[MovieRecord], str]) -> str:
+        """Возвращает подпись к фильму из кэша или строит и сохраняет ее.
+        :param movie: Фильм.
+        :param render: Функция, строящая подпись.
+        :return str: Подпись к фильму.
+        """
+        content = movie._replace(stale=False)
+        key = (movie.id, hash(content))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == content:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        caption = render(content)
+        with self._lock:
+            self._entries[key] = (content, caption)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return caption
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает счетчики попаданий и промахов кэша.
+        :return Dict[str, int]: Статистика кэша.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,143 @@
+import logging
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+import requests
+
+from config_data.config import settings
+from database import catalog
+from API.client import get_session, get_timeout
+from API.kinopoisk import base_params, index_titles
+from API.circuit_breaker import CLOSED, breaker
+from API.quota import DAILY_LIMIT_REPLY, QuotaExceeded, quota
+
+SYNC_LIMIT_REPLY = "Дневной лимит запросов для синхронизации каталога исчерпан."
+
+
+def updated_day(value: str) -> date:
+    """Возвращает день из значения поля updatedAt.
+    :param value: Время изменения фильма в формате ISO, например "2024-05-01T10:00:00.000Z".
+    :return date: День изменения.
+    """
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+
+
+def catalog_params(page: int, since: Optional[str]) -> Dict[str, Any]:
+    """Строит параметры запроса одной страницы каталога.
+    Фильмы запрашиваются с теми же selectFields и notNullFields, что и при поиске,
+    отсортированными по времени изменения и идентификатору.
+    :param page: Номер страницы.
+    :param since: Значение updatedAt, с дня которого нужны фильмы, или None для
+    полной загрузки.
+    :return Dict[str, Any]: Параметры запроса.
+    """
+    params = {
+        **base_params,
+        "selectFields": base_params["selectFields"] + ["updatedAt"],
+        "sortField": ["updatedAt", "id"],
+        "sortType": [1, 1],
+        "limit": settings.CATALOG_PAGE_SIZE,
+        "page": page,
+    }
+    if since:
+        params["updatedAt"] = f"{updated_day(since):%d.%m.%Y}-{datetime.now():%d.%m.%Y}"
+    return params
+
+
+class CatalogSync(threading.Thread):
+    """Фоновый поток, поддерживающий локальную копию каталога для поиска по рейтингу и бюджету.
+    Первый проход загружает каталог целиком, следующие запрашивают только фильмы,
+    измененные со времени последней синхронизации. После каждой страницы в CatalogState
+    сохраняется курсор: updatedAt последнего сохраненного фильма и число страниц, пройденных
+    начиная с его дня. Следующий запрос начинается с этого дня, поэтому фильмы, измененные
+    во время прохода, сдвигают границы страниц только внутри одного дня, а прерванный проход
+    продолжается с последнего сохраненного фильма. Запросы
+    расходуют не больше daily_quota запросов в сутки и только ту часть дневного лимита,
+    которая не зарезервирована за первыми страницами поиска. Пока предохранитель API
+    разомкнут, синхронизация откладывается.
+    """
+
+    def __init__(self, interval: float, daily_quota: int) -> None:
+        super().__init__(name="catalog-sync", daemon=True)
+        self.interval = interval
+        self.daily_quota = daily_quota
+        self._stop_event = threading.Event()
+
+    def sync(self) -> int:
+        """Выполняет один проход синхронизации.
+        :return int: Количество сохраненных фильмов.
+        :raises QuotaExceeded: Если лимит запросов исчерпан.
+        """
+        since, page = catalog.get_progress()
+        if since is not None or page:
+            logging.info(
+                f"Синхронизация каталога фильмов продолжается с {since or 'начала'}"
+            )
+        else:
+            since = catalog.last_updated_at() if catalog.is_ready() else None
+        page += 1
+        saved = 0
+        while not self._stop_event.is_set():
+            day = quota.today()
+            if not catalog.take_sync_quota(day, self.daily_quota):
+                raise QuotaExceeded(SYNC_LIMIT_REPLY)
+            try:
+                quota.acquire(None, first_page=False)
+            except QuotaExceeded:
+                catalog.refund_sync_quota(day)
+                raise
+            response = get_session().get(
+                settings.API_URL,
+                params=catalog_params(page, since),
+                timeout=get_timeout(),
+            )
+            if response.status_code in (403, 429):
+                quota.exhaust()
+                raise QuotaExceeded(DAILY_LIMIT_REPLY)
+            response.raise_for_status()
+            data = response.json()
+            docs = data.get("docs", [])
+            saved += catalog.upsert_docs(docs)
+            index_titles(docs)
+            if page >= data.get("pages", 0) or not docs:
+                catalog.mark_synced()
+                break
+            last = docs[-1].get("updatedAt")
+            if last and (since is None or updated_day(last) > updated_day(since)):
+                since, page = last, 0
+            catalog.save_progress(since, page)
+            page += 1
+        return saved
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            if breaker.state != CLOSED:
+                logging.warning(
+                    "Синхронизация каталога фильмов отложена: API Кинопоиска недоступно"
+                )
+                self._stop_event.wait(settings.BREAKER_OPEN_TIMEOUT)
+                continue
+            try:
+                saved = self.sync()
+                logging.info(f"Каталог фильмов синхронизирован, обновлено {saved}")
+            except (requests.RequestException, ValueError) as err:
+                logging.error(f"Ошибка при синхронизации каталога фильмов: {err}")
+            except QuotaExceeded:
+                logging.warning(
+                    "Синхронизация каталога фильмов отложена: исчерпан лимит запросов"
+                )
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        """Останавливает синхронизацию.
+        :return None
+        """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=10)
+
+
+catalog_sync = CatalogSync(
+    interval=settings.CATALOG_SYNC_INTERVAL, daily_quota=settings.CATALOG_SYNC_QUOTA
+)
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+from config_data.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+UNAVAILABLE_REPLY = "Кинопоиск сейчас недоступен. Попробуйте повторить поиск позже."
+
+
+class ApiUnavailable(Exception):
+    """API не ответило или временно отключено предохранителем.
+    Атрибут reply содержит текст ответа пользователю.
+    """
+
+    def __init__(self, reply: str) -> None:
+        super().__init__(reply)
+        self.reply = reply
+
+
+class CircuitBreaker:
+    """Предохранитель для запросов к API Кинопоиска.
+    Размыкается, когда среди последних window вызовов доля ошибок и вызовов дольше
+    slow_call секунд достигает failure_ratio. В разомкнутом состоянии запросы сразу
+    отклоняются, через open_timeout секунд пропускается не больше half_open_calls
+    пробных запросов: при их успехе предохранитель замыкается, при ошибке снова размыкается.
+    """
+
+    def __init__(
+        self,
+        window: int,
+        min_calls: int,
+        failure_ratio: float,
+        slow_call: float,
+        open_timeout: float,
+        half_open_calls: int,
+    ) -> None:
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call = slow_call
+        self.open_timeout = open_timeout
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.rejected = 0
+        self.opened = 0
+        self._results: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Проверяет, можно ли сейчас выполнить запрос к API.
+        Разрешение в полуоткрытом состоянии занимает место пробного запроса, поэтому после
+        него обязательно нужно вызвать record.
+        :return bool: True, если запрос можно выполнить.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+                logging.info("Предохранитель API: пробные запросы")
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    self.rejected += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, success: bool, duration: float) -> None:
+        """Учитывает результат запроса к API.
+        :param success: Запрос завершился без ошибки.
+        :param duration: Длительность запроса в секундах.
+        :return None
+        """
+        failed = not success or duration > self.slow_call
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if failed:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._results.clear()
+                    logging.info("Предохранитель API замкнут")
+                return
+            if self.state == OPEN:
+                return
+            self._results.append(failed)
+            failures = sum(self._results)
+            if (
+                len(self._results) >= self.min_calls
+                and failures / len(self._results) >= self.failure_ratio
+            ):
+                self._open()
+
+    def cancel(self) -> None:
+        """Освобождает место пробного запроса, если разрешенный запрос так и не был выполнен.
+        :return None
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает состояние предохранителя и счетчики.
+        :return Dict[str, Any]: Статистика предохранителя.
+        """
+        with self._lock:
+            return {
+                "state": self.state,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._results.clear()
+        logging.warning(
+            f"Предохранитель API разомкнут на {self.open_timeout:g} сек.: "
+            "запросы к Кинопоиску временно не выполняются"
+        )
+
+
+breaker = CircuitBreaker(
+    window=settings.BREAKER_WINDOW,
+    min_calls=settings.BREAKER_MIN_CALLS,
+    failure_ratio=settings.BREAKER_FAILURE_RATIO,
+    slow_call=settings.BREAKER_SLOW_CALL,
+    open_timeout=settings.BREAKER_OPEN_TIMEOUT,
+    half_open_calls=settings.BREAKER_HALF_OPEN_CALLS,
+)
@@ -0,0 +1,226 @@
+import logging
+from datetime import datetime
+from typing import Any, Collection, Dict, List, Optional, Tuple
+
+from config_data.config import settings
+from database.poster_cache import PosterCache
+from database.writer import HistoryWriter
+from database import title_index
+from utils.metrics import registry
+from utils.text import truncate
+from utils.tracing import DB, RENDER, traced
+from API.cache import CaptionCache, ResponseCache
+from API.movie import MovieRecord
+
+
+logging.basicConfig(level=logging.INFO)
+
+ALBUM_SIZE = 10
+CAPTION_LIMIT = 1024
+NO_POSTER_TEXT = "🖼Постер: Нет постера\n\n"
+
+
+base_params: Dict[str, Any] = {
+    "token": settings.API_KEY.get_secret_value(),
+    "selectFields": [
+        "id",
+        "name",
+        "description",
+        "year",
+        "genres",
+        "rating",
+        "ageRating",
+        "budget",
+        "poster",
+        "votes",
+    ],
+    "notNullFields": [
+        "name",
+        "year",
+        "description",
+        "rating.kp",
+        "genres.name",
+        "ageRating",
+        "budget.value",
+        "poster.url",
+    ],
+}
+
+response_cache = ResponseCache(
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    max_bytes=settings.CACHE_MAX_BYTES,
+    ttls={
+        "name": settings.CACHE_TTL_NAME,
+        "rating": settings.CACHE_TTL_RATING,
+        "budget": settings.CACHE_TTL_BUDGET,
+    },
+    stale_ttl=settings.CACHE_STALE_TTL,
+)
+history_writer = HistoryWriter(
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+)
+history_writer.start()
+poster_cache = PosterCache(max_entries=settings.POSTER_CACHE_ENTRIES)
+caption_cache = CaptionCache(max_entries=settings.CAPTION_CACHE_ENTRIES)
+api_requests = registry.counter(
+    "kinopoisk_requests_total",
+    "Запросы фильмов по источнику ответа: cache, api, stale, quota, unavailable",
+    ("search_type", "result"),
+)
+api_latency = registry.histogram(
+    "kinopoisk_request_seconds",
+    "Длительность запросов к API Кинопоиска",
+    ("search_type",),
+)
+if settings.TITLE_INDEX:
+    title_index.backfill()
+
+
+def budget_params(count: int, sort_type: int, page: int) -> Dict[str, Any]:
+    """Строит параметры запроса для поиска фильмов по бюджету.
+    :param count: Количество фильмов на странице.
+    :param sort_type: Тип сортировки результатов поиска.
+    :param page: Номер страницы результатов поиска.
+    :return Dict[str, Any]: Параметры запроса.
+    """
+    return {
+        **base_params,
+        "sortField": "budget.value",
+        "budget.value": "10000-10e20",
+        "rating.kp": "1-10",
+        "sortType": sort_type,
+        "limit": count,
+        "page": page,
+    }
+
+
+def rating_params(count: int, sort_type: int, rating: str, page: int) -> Dict[str, Any]:
+    """Строит параметры запроса для поиска фильмов по рейтингу.
+    :param count: Количество фильмов на странице.
+    :param sort_type: Тип сортировки результатов поиска.
+    :param rating: Диапазон рейтинга.
+    :param page: Номер страницы результатов поиска.
+    :return Dict[str, Any]: Параметры запроса.
+    """
+    return {
+        **base_params,
+        "rating.kp": rating,
+        "sortField": "rating.kp",
+        "sortType": sort_type,
+        "limit": count,
+        "page": page,
+    }
+
+
+def name_params(name: str, page: int) -> Dict[str, Any]:
+    """Строит параметры запроса одной пачки результатов поиска по названию.
+    Поиск по названию не поддерживает notNullFields, поэтому параметр не передается.
+    :param name: Название фильма.
+    :param page: Номер пачки результатов API.
+    :return Dict[str, Any]: Параметры запроса.
+    """
+    return {
+        **{key: value for key, value in base_params.items() if key != "notNullFields"},
+        "query": name,
+        "limit": settings.NAME_SEARCH_BATCH,
+        "page": page,
+    }
+
+
+@traced(DB)
+def index_titles(docs: List[Dict]) -> None:
+    """Добавляет полученные от API фильмы в локальный индекс названий.
+    :param docs: Список фильмов.
+    :return None
+    """
+    if not settings.TITLE_INDEX:
+        return
+    try:
+        title_index.add(docs)
+    except Exception as err:
+        logging.error(f"Ошибка при обновлении индекса названий: {err}")
+
+
+def collect_name_matches(
+    batch: List[Optional[MovieRecord]],
+    name: str,
+    offset: int,
+    count: int,
+    movies: List[MovieRecord],
+    offsets: List[int],
+    exclude: Collection[int] = (),
+) -> bool:
+    """Добавляет фильмы пачки, название которых содержит искомую строку.
+    :param batch: Фильмы пачки, начиная с позиции offset, с None на месте неполных фильмов.
+    :param name: Название фильма.
+    :param offset: Позиция первого фильма пачки в результатах API.
+    :param count: Сколько фильмов нужно набрать.
+    :param movies: Список найденных фильмов, который дополняется.
+    :param offsets: Позиции в результатах API сразу после каждого найденного фильма.
+    :param exclude: Идентификаторы фильмов, которые уже были показаны и не добавляются.
+    :return bool: True, если нужное количество фильмов набрано.
+    """
+    for position, movie in enumerate(batch, start=offset + 1):
+        if movie is None or movie.id in exclude:
+            continue
+        if name.lower() in movie.name.lower():
+            movies.append(movie)
+            offsets.append(position)
+            if len(movies) == count:
+                return True
+    return False
+
+
+@traced(DB)
+def save_history(user_id: int, movies: List[MovieRecord], search_type: str) -> None:
+    """Ставит историю поиска фильмов в очередь на запись в БД.
+    :param user_id: Идентификатор пользователя, который выполнил поиск.
+    :param movies: Список фильмов, которые были найдены.
+    :param search_type: Тип поиска, который был использован пользователем.
+    :return None
+    """
+    timestamp = datetime.now()
+    rows = []
+
+    for movie in movies:
+        rows.append(
+            {
+                "user": user_id,
+                "movie": movie.to_row(),
+                "search_type": search_type,
+                "timestamp": timestamp,
+            }
+        )
+
+    history_writer.add(rows)
+
+
+@traced(RENDER)
+def format_movie_info(movie: MovieRecord) -> Tuple[Optional[str], str]:
+    """Форматирует информацию о фильме для отправки пользователю.
+    Подписи берутся из кэша, поэтому часто показываемые фильмы форматируются один раз.
+    :param movie: Фильм.
+    :return Tuple[Optional[str], str]: URL постера фильма и отформатированная информация о фильме.
+    """
+    return movie.poster_url, caption_cache.get(movie, render_caption)
+
+
+def render_caption(movie: MovieRecord) -> str:
+    """Строит подпись к фильму не длиннее лимита Telegram для подписей к фото.
+    :param movie: Фильм.
+    :return str: Подпись.
+    """
+    age_rating = "Нет рейтинга" if movie.age_rating is None else f"{movie.age_rating}+"
+    budget = "Нет данных" if movie.budget is None else movie.budget
+
+    caption = (
+        f"📽Название: {movie.name}\n"
+        f"🎯Жанр: {', '.join(movie.genres) or 'Нет жанра'}\n"
+        f"💯Рейтинг: {movie.rating}\n"
+        f"🗓️Год выпуска: {movie.year}\n"
+        f"🔞Возрастной рейтинг: {age_rating}\n"
+        f"💰Бюджет: {budget} {movie.currency or ''}\n"
+        f"🎬Описание: {movie.description or 'Нет описания'}\n"
+    )
+    return truncate(caption, CAPTION_LIMIT)
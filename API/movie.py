@@ -0,0 +1,169 @@
+import logging
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Поля notNullFields запроса к API и соответствующие им атрибуты MovieRecord.
+NOT_NULL_ATTRIBUTES = {
+    "name": "name",
+    "year": "year",
+    "description": "description",
+    "rating.kp": "rating",
+    "genres.name": "genres",
+    "ageRating": "age_rating",
+    "budget.value": "budget",
+    "poster.url": "poster_url",
+}
+
+
+class MovieRecord(NamedTuple):
+    """Фильм из ответа API, общий для вывода пользователю и записи в историю."""
+
+    id: int
+    name: str
+    description: Optional[str] = None
+    year: Optional[int] = None
+    rating: Optional[float] = None
+    genres: Tuple[str, ...] = ()
+    age_rating: Optional[int] = None
+    budget: Optional[float] = None
+    currency: Optional[str] = None
+    poster_url: Optional[str] = None
+    stale: bool = False
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> Optional["MovieRecord"]:
+        """Разбирает фильм из ответа API.
+        :param doc: Фильм в формате API.
+        :return Optional[MovieRecord]: Фильм или None, если у него нет идентификатора или названия.
+        """
+        movie_id = doc.get("id")
+        name = doc.get("name")
+        if movie_id is None or not name:
+            return None
+        rating = doc.get("rating")
+        budget = doc.get("budget")
+        poster = doc.get("poster")
+        genres = doc.get("genres")
+        return cls(
+            movie_id,
+            name,
+            doc.get("description"),
+            doc.get("year"),
+            rating.get("kp") if rating else None,
+            (
+                tuple(genre["name"] for genre in genres if genre.get("name"))
+                if genres
+                else ()
+            ),
+            doc.get("ageRating"),
+            budget.get("value") if budget else None,
+            budget.get("currency") if budget else None,
+            poster.get("url") if poster else None,
+        )
+
+    @classmethod
+    def from_model(cls, movie: Any) -> "MovieRecord":
+        """Создает фильм из записи таблицы Movie.
+        :param movie: Объект database.model.Movie.
+        :return MovieRecord: Фильм.
+        """
+        return cls(
+            movie.movie_id,
+            movie.name,
+            movie.description,
+            movie.year,
+            movie.rating,
+            tuple(
+                genre.strip()
+                for genre in (movie.genre or "").split(",")
+                if genre.strip()
+            ),
+            movie.age_rating,
+            movie.budget,
+            movie.currency,
+            movie.poster_url,
+        )
+
+    @classmethod
+    def from_values(cls, values: Iterable[Any]) -> "MovieRecord":
+        """Восстанавливает фильм, сохраненный в JSON списком значений полей,
+        например в хранилище состояний диалогов.
+        :param values: Значения полей в порядке объявления.
+        :return MovieRecord: Фильм.
+        """
+        movie = cls._make(values)
+        return movie._replace(genres=tuple(movie.genres))
+
+    def to_doc(self) -> Dict[str, Any]:
+        """Возвращает фильм в формате API для хранения в локальных индексах.
+        :return Dict[str, Any]: Фильм в формате API.
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "year": self.year,
+            "rating": {"kp": self.rating},
+            "genres": [{"name": genre} for genre in self.genres],
+            "ageRating": self.age_rating,
+            "budget": {"value": self.budget, "currency": self.currency},
+            "poster": {"url": self.poster_url},
+        }
+
+    def to_row(self) -> Dict[str, Any]:
+        """Возвращает поля фильма для записи в таблицу Movie.
+        :return Dict[str, Any]: Значения полей таблицы.
+        """
+        return {
+            "movie_id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "rating": self.rating,
+            "year": self.year,
+            "genre": ", ".join(self.genres),
+            "age_rating": self.age_rating,
+            "budget": self.budget,
+            "currency": self.currency,
+            "poster_url": self.poster_url,
+        }
+
+    def has_fields(self, not_null_fields: Iterable[str]) -> bool:
+        """Проверяет, что у фильма заполнены поля, запрошенные в notNullFields.
+        :param not_null_fields: Поля в формате параметра notNullFields.
+        :return bool: True, если все поля заполнены.
+        """
+        for field in not_null_fields:
+            attribute = NOT_NULL_ATTRIBUTES.get(field)
+            if attribute is None:
+                continue
+            value = getattr(self, attribute)
+            if value is None or value == "" or value == ():
+                return False
+        return True
+
+
+def decode_docs(
+    docs: Iterable[Dict[str, Any]],
+    not_null_fields: Iterable[str] = (),
+    keep_positions: bool = False,
+) -> List[Optional[MovieRecord]]:
+    """Разбирает список фильмов из ответа API, отбрасывая неполные.
+    :param docs: Фильмы в формате API.
+    :param not_null_fields: Поля, которые API должно было заполнить у каждого фильма.
+    :param keep_positions: Оставлять на месте неполных фильмов None, чтобы позиции в списке
+    совпадали с позициями в ответе API.
+    :return List[Optional[MovieRecord]]: Фильмы в исходном порядке.
+    """
+    not_null_fields = tuple(not_null_fields)
+    movies: List[Optional[MovieRecord]] = []
+    skipped = 0
+    for doc in docs:
+        movie = MovieRecord.from_doc(doc)
+        if movie is None or not movie.has_fields(not_null_fields):
+            skipped += 1
+            if keep_positions:
+                movies.append(None)
+            continue
+        movies.append(movie)
+    if skipped:
+        logging.info(f"Пропущено фильмов без обязательных полей: {skipped}")
+    return movies
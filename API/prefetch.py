@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from API.quota import QuotaExceeded
+
+
+class Prefetcher:
+    """Фоновая предзагрузка следующих страниц результатов на ограниченном пуле потоков.
+    Для каждого пользователя одновременно хранится не больше per_user_limit предзагрузок,
+    общее число выполняющихся задач ограничено max_pending. Результаты, которые
+    пользователь не забрал за ttl секунд, удаляются.
+    """
+
+    def __init__(
+        self, max_workers: int, per_user_limit: int, max_pending: int, ttl: float
+    ) -> None:
+        self.per_user_limit = per_user_limit
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.hits = 0
+        self.dropped = 0
+        self.expired = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prefetch"
+        )
+        self._pending: Dict[int, "OrderedDict[Hashable, Tuple[Future, float]]"] = {}
+        self._running: Set[Future] = set()
+        self._last_sweep = time.monotonic()
+        # Отмена задачи под блокировкой сразу вызывает _release, поэтому блокировка реентерабельная.
+        self._lock = threading.RLock()
+
+    def schedule(self, user_id: int, key: Hashable, fn: Callable[[], Any]) -> bool:
+        """Ставит предзагрузку в очередь, если не превышены лимиты.
+        :param user_id: Идентификатор пользователя.
+        :param key: Ключ предзагружаемой страницы.
+        :param fn: Функция, загружающая страницу.
+        :return bool: True, если задача поставлена в очередь.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= min(self.ttl, 60.0):
+                self._sweep(now)
+            user_pending = self._pending.setdefault(user_id, OrderedDict())
+            if key in user_pending:
+                return True
+            while len(user_pending) >= self.per_user_limit:
+                _, (stale, _) = user_pending.popitem(last=False)
+                self._discard(stale)
+            if len(self._running) >= self.max_pending:
+                self.dropped += 1
+                if not user_pending:
+                    del self._pending[user_id]
+                return False
+            future = self._executor.submit(fn)
+            user_pending[key] = (future, now + self.ttl)
+            self._running.add(future)
+        future.add_done_callback(self._release)
+        return True
+
+    def take(self, user_id: int, key: Hashable) -> Optional[Future]:
+        """Забирает предзагрузку страницы, если она была запланирована и еще не устарела.
+        :param user_id: Идентификатор пользователя.
+        :param key: Ключ страницы.
+        :return Optional[Future]: Задача с результатом загрузки или None.
+        """
+        with self._lock:
+            user_pending = self._pending.get(user_id)
+            if not user_pending or key not in user_pending:
+                return None
+            future, expires_at = user_pending.pop(key)
+            if not user_pending:
+                del self._pending[user_id]
+            if expires_at < time.monotonic():
+                self.expired += 1
+                future.cancel()
+                return None
+            if future.cancelled():
+                return None
+            self.hits += 1
+            return future
+
+    def cancel(self, user_id: int) -> None:
+        """Отменяет все предзагрузки пользователя.
+        :param user_id: Идентификатор пользователя.
+        :return None
+        """
+        with self._lock:
+            user_pending = self._pending.pop(user_id, None)
+            if not user_pending:
+                return
+            for future, _ in user_pending.values():
+                self._discard(future)
+
+    def shutdown(self) -> None:
+        """Останавливает пул потоков, отменяя задачи, которые еще не начали выполняться.
+        :return None
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает статистику предзагрузок.
+        :return Dict[str, int]: Число выполняющихся задач и хранимых результатов,
+        использованных, отброшенных и устаревших предзагрузок.
+        """
+        with self._lock:
+            return {
+                "pending": len(self._running),
+                "stored": sum(len(entries) for entries in self._pending.values()),
+                "hits": self.hits,
+                "dropped": self.dropped,
+                "expired": self.expired,
+            }
+
+    def _sweep(self, now: float) -> None:
+        self._last_sweep = now
+        for user_id in list(self._pending):
+            user_pending = self._pending[user_id]
+            for key in [key for key, (_, exp) in user_pending.items() if exp < now]:
+                future, _ = user_pending.pop(key)
+                future.cancel()
+                self.expired += 1
+            if not user_pending:
+                del self._pending[user_id]
+
+    def _discard(self, future: Future) -> None:
+        future.cancel()
+        self.dropped += 1
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._running.discard(future)
+        if future.cancelled():
+            return
+        err = future.exception()
+        if isinstance(err, QuotaExceeded):
+            logging.debug(f"Предзагрузка страницы пропущена: {err}")
+        elif err is not None:
+            logging.error(f"Ошибка предзагрузки страницы: {err}")
@@ -0,0 +1,179 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+from config_data.config import settings
+from database.model import ApiQuota, db
+from utils.send_scheduler import TokenBucket
+
+DAILY_LIMIT_REPLY = "Дневной лимит запросов к Кинопоиску исчерпан. Попробуйте завтра."
+
+_speculative: ContextVar[bool] = ContextVar("speculative", default=False)
+
+
+@contextmanager
+def speculative() -> Iterator[None]:
+    """Помечает запросы к API внутри блока with как упреждающие, например предзагрузку.
+    Упреждающий запрос выполняется, только если у пользователя после него останется токен
+    для следующего запроса, который он сделает сам.
+    :return Iterator[None]
+    """
+    token = _speculative.set(True)
+    try:
+        yield
+    finally:
+        _speculative.reset(token)
+
+
+class QuotaExceeded(Exception):
+    """Запрос к API не выполнен, потому что исчерпан дневной лимит или лимит пользователя.
+    Атрибут reply содержит текст ответа пользователю.
+    """
+
+    def __init__(self, reply: str) -> None:
+        super().__init__(reply)
+        self.reply = reply
+
+
+class QuotaGovernor:
+    """Распределяет дневной лимит запросов к API Кинопоиска между пользователями.
+    Расход лимита хранится в таблице ApiQuota и общий для всех процессов бота. Каждому
+    пользователю выдаются токены из собственного ведра, а последние reserve доли лимита
+    оставлены для первых страниц новых поисков: листание вглубь и предзагрузка их не тратят.
+    Упреждающие запросы (см. speculative) не забирают у пользователя последний токен.
+    """
+
+    def __init__(
+        self,
+        daily_limit: int,
+        reserve: float,
+        user_rate: float,
+        user_burst: float,
+        max_users: int = 10000,
+    ) -> None:
+        self.daily_limit = daily_limit
+        self.reserve = reserve
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self.rejected = 0
+        self._buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._reported_step: Optional[int] = None
+
+    @staticmethod
+    def today() -> str:
+        """Возвращает текущие сутки лимита (по UTC, как у API).
+        :return str: Дата в формате YYYY-MM-DD.
+        """
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def acquire(self, user_id: Optional[int], first_page: bool) -> None:
+        """Списывает один запрос из дневного лимита и лимита пользователя.
+        Дневной лимит проверяется первым; если отказывает лимит пользователя, запрос
+        возвращается в дневной лимит.
+        :param user_id: Идентификатор пользователя или None для фоновых задач бота.
+        :param first_page: Запрос первой страницы нового поиска.
+        :return None
+        :raises QuotaExceeded: Если запрос выполнять нельзя.
+        """
+        limit = self.daily_limit
+        if not first_page:
+            limit = math.floor(self.daily_limit * (1 - self.reserve))
+        day = self.today()
+        with db.atomic():
+            ApiQuota.insert(day=day, used=0).on_conflict_ignore().execute()
+            updated = (
+                ApiQuota.update(used=ApiQuota.used + 1)
+                .where((ApiQuota.day == day) & (ApiQuota.used < limit))
+                .execute()
+            )
+        if not updated:
+            self.rejected += 1
+            if first_page:
+                raise QuotaExceeded(DAILY_LIMIT_REPLY)
+            raise QuotaExceeded(
+                "Лимит запросов к Кинопоиску почти исчерпан, поэтому сегодня доступны "
+                "только первые страницы новых поисков."
+            )
+        if user_id is not None:
+            try:
+                self._take_user_token(user_id, keep=int(_speculative.get()))
+            except QuotaExceeded:
+                self._refund(day)
+                raise
+        self._report(self.remaining())
+
+    def exhaust(self) -> None:
+        """Отмечает дневной лимит исчерпанным, например после ответа API 403 или 429.
+        :return None
+        """
+        day = self.today()
+        ApiQuota.replace(day=day, used=self.daily_limit).execute()
+        logging.warning("API Кинопоиска сообщило об исчерпании дневного лимита")
+
+    def remaining(self) -> int:
+        """Возвращает количество запросов, оставшихся на сегодня.
+        :return int: Остаток дневного лимита.
+        """
+        row = ApiQuota.get_or_none(ApiQuota.day == self.today())
+        used = row.used if row is not None else 0
+        return max(0, self.daily_limit - used)
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает остаток дневного лимита и число отклоненных запросов.
+        :return Dict[str, int]: Статистика лимита.
+        """
+        return {
+            "limit": self.daily_limit,
+            "remaining": self.remaining(),
+            "rejected": self.rejected,
+        }
+
+    def _take_user_token(self, user_id: int, keep: int = 0) -> None:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = TokenBucket(self.user_rate, self.user_burst)
+                self._buckets[user_id] = bucket
+                while len(self._buckets) > self.max_users:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(user_id)
+            delay = bucket.delay(now)
+            if delay == 0 and bucket.tokens < 1 + keep:
+                delay = (1 + keep - bucket.tokens) / bucket.rate
+            if delay > 0:
+                self.rejected += 1
+                raise QuotaExceeded(
+                    f"Слишком много запросов. Попробуйте через {math.ceil(delay)} сек."
+                )
+            bucket.consume()
+
+    @staticmethod
+    def _refund(day: str) -> None:
+        ApiQuota.update(used=ApiQuota.used - 1).where(
+            (ApiQuota.day == day) & (ApiQuota.used > 0)
+        ).execute()
+
+    def _report(self, remaining: int) -> None:
+        step = remaining * 10 // max(1, self.daily_limit)
+        if step != self._reported_step:
+            self._reported_step = step
+            logging.info(
+                f"Осталось запросов к API Кинопоиска на сегодня: {remaining} из {self.daily_limit}"
+            )
+
+
+quota = QuotaGovernor(
+    daily_limit=settings.QUOTA_DAILY_LIMIT,
+    reserve=settings.QUOTA_FIRST_PAGE_RESERVE,
+    user_rate=settings.QUOTA_USER_RATE,
+    user_burst=settings.QUOTA_USER_BURST,
+)
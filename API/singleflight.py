@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """Выполняющийся запрос, результат которого ожидают другие потоки."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Объединяет одновременные одинаковые запросы в один вызов.
+    Первый поток выполняет функцию, остальные потоки с тем же ключом ждут и получают
+    тот же результат или то же исключение.
+    """
+
+    def __init__(self) -> None:
+        self.collapsed = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Выполняет функцию или присоединяется к уже выполняющемуся вызову с тем же ключом.
+        :param key: Ключ запроса.
+        :param fn: Функция, выполняющая запрос.
+        :return Any: Результат функции.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.collapsed += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает число объединенных вызовов и число выполняющихся запросов.
+        :return Dict[str, int]: Статистика.
+        """
+        with self._lock:
+            return {"collapsed": self.collapsed, "in_flight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """Вариант SingleFlight для корутин одного цикла событий asyncio."""
+
+    def __init__(self) -> None:
+        self.collapsed = 0
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполняет корутину или дожидается уже выполняющегося вызова с тем же ключом.
+        :param key: Ключ запроса.
+        :param fn: Функция, возвращающая корутину запроса.
+        :return Any: Результат корутины.
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            self.collapsed += 1
+            return await asyncio.shield(call)
+
+        call = asyncio.get_running_loop().create_future()
+        self._calls[key] = call
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as err:
+            call.set_exception(err)
+            call.exception()
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает число объединенных вызовов и число выполняющихся запросов.
+        :return Dict[str, int]: Статистика.
+        """
+        return {"collapsed": self.collapsed, "in_flight": len(self._calls)}
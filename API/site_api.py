@@ -1,204 +1,398 @@
 import logging
+import time
 from loader import bot
 from config_data.config import settings
-from database.model import User, History
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import requests
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InputMediaPhoto, Message
+from utils.send_scheduler import BULK, send_priority
+from API.client import get_session, get_timeout
+from API.cache import make_cache_key, mark_stale
+from API.circuit_breaker import UNAVAILABLE_REPLY, ApiUnavailable, breaker
+from API.singleflight import SingleFlight
+from API.movie import MovieRecord, decode_docs
+from API.quota import DAILY_LIMIT_REPLY, QuotaExceeded, quota
+from utils.tracing import API, traced
+from database import catalog, title_index
+from API.kinopoisk import (
+    ALBUM_SIZE,
+    NO_POSTER_TEXT,
+    api_latency,
+    api_requests,
+    budget_params,
+    collect_name_matches,
+    index_titles,
+    format_movie_info,
+    history_writer,
+    name_params,
+    poster_cache,
+    rating_params,
+    response_cache,
+    save_history,
+)
 
 
-logging.basicConfig(level=logging.INFO)
-
-
-base_params: Dict[str, Any] = {
-    "token": settings.API_KEY.get_secret_value(),
-    "selectFields": [
-        "name",
-        "description",
-        "year",
-        "genres",
-        "rating",
-        "ageRating",
-        "budget",
-        "poster",
-    ],
-    "notNullFields": [
-        "name",
-        "year",
-        "description",
-        "rating.kp",
-        "genres.name",
-        "ageRating",
-        "budget.value",
-        "poster.url",
-    ],
-}
+single_flight = SingleFlight()
 
 
 def search_by_budget(
     user_id: int, count: int, sort_type: int, page: int = 1
-) -> Optional[List[Dict]]:
+) -> Optional[List[MovieRecord]]:
     """Выполняет поиск фильмов по бюджету.
+    Если включен локальный каталог, фильмы берутся из него, API используется при промахе.
     :param user_id: Идентификатор пользователя, для которого выполняется поиск.
     :param count: Количество фильмов, которое нужно получить.
     :param sort_type: Тип сортировки результатов поиска.
     :param page: Номер страницы результатов поиска. По умолчанию 1.
-    :return Optional[Any[Dict]]: Список фильмов, найденных по бюджету.
+    :return Optional[List[MovieRecord]]: Список фильмов, найденных по бюджету.
     """
-    params = {
-        **base_params,
-        "sortField": "budget.value",
-        "budget.value": "10000-10e20",
-        "rating.kp": "1-10",
-        "sortType": sort_type,
-        "limit": count,
-        "page": page,
-    }
-    movies = make_request(settings.API_URL, params, user_id)
+    movies = catalog.search_by_budget(count, sort_type, page)
+    if movies:
+        return movies
+    params = budget_params(count, sort_type, page)
+    movies = make_request(
+        settings.API_URL, params, user_id, search_type="budget", first_page=page == 1
+    )
     return movies
 
 
 def search_by_name(
-    user_id: int, name: str, count: int = 10, page: int = 1
-) -> Optional[List[Dict]]:
+    user_id: int, name: str, count: int = 10, offset: int = 0
+) -> Tuple[List[MovieRecord], List[int]]:
     """Выполняет поиск фильмов по названию.
+    Локальный индекс названий отвечает, только если в нем набирается count фильмов,
+    название которых содержит запрос, иначе используется API. Уже показанные из индекса
+    фильмы при переходе к API пропускаются. Похожие названия с учетом опечаток берутся
+    из индекса, если API ничего не нашло или недоступно.
+    Результаты API фильтруются по вхождению названия, поэтому страницы API запрашиваются
+    до тех пор, пока не наберется нужное количество фильмов или результаты не закончатся.
     :param user_id: Идентификатор пользователя, для которого выполняется поиск.
     :param name: Название фильма.
     :param count: Количество фильмов, которое нужно получить. По умолчанию 10.
-    :param page: Номер страницы результатов поиска. По умолчанию 1.
-    :return Optional[Any[Dict]]: Список фильмов, найденных по названию.
+    :param offset: Позиция в результатах API, с которой начинается поиск. По умолчанию 0.
+    Отрицательная позиция - позиция в результатах локального индекса.
+    :return Tuple[List[MovieRecord], List[int]]: Список фильмов, найденных по названию, и позиции в
+    результатах API сразу после каждого из них.
     """
-    params = {
-        **base_params,
-        "query": name,
-        "limit": count,
-        "page": page,
-    }
-    movies = make_request(settings.API_URL + "/search", params, user_id)
-    filtered_movies = [
-        movie for movie in movies if name.lower() in movie["name"].lower()
-    ]
-    return filtered_movies[:count]
+    local = title_index.search_page(name, offset, count)
+    if local is not None:
+        return local
+
+    local_offset = min(offset, 0)
+    shown = title_index.shown_ids(name, local_offset)
+    offset = max(offset, 0)
+    from_start = offset == 0
+    batch_size = settings.NAME_SEARCH_BATCH
+    movies: List[MovieRecord] = []
+    offsets: List[int] = []
+
+    try:
+        for _ in range(settings.NAME_SEARCH_MAX_BATCHES):
+            page, skip = divmod(offset, batch_size)
+            batch = make_request(
+                settings.API_URL + "/search",
+                name_params(name, page + 1),
+                user_id,
+                search_type="name",
+                first_page=offset == 0,
+                keep_positions=True,
+            )
+            if collect_name_matches(
+                batch[skip:], name, offset, count, movies, offsets, shown
+            ):
+                break
+
+            if len(batch) < batch_size:
+                break
+            offset = (page + 1) * batch_size
+    except ApiUnavailable:
+        if movies or not from_start:
+            raise
+        fuzzy = title_index.fuzzy_page(name, local_offset, count)
+        if not fuzzy[0]:
+            raise
+        return fuzzy
+
+    if not movies and from_start:
+        return title_index.fuzzy_page(name, local_offset, count)
+    return movies, offsets
 
 
 def search_by_rating(
     user_id: int, count: int, sort_type: int, rating: str, page: int = 1
-) -> Optional[List[Dict]]:
+) -> Optional[List[MovieRecord]]:
     """Выполняет поиск фильмов по рейтингу.
+    Если включен локальный каталог, фильмы берутся из него, API используется при промахе.
     :param user_id: Идентификатор пользователя, для которого выполняется поиск.
     :param count: Количество фильмов, которое нужно получить.
     :param sort_type: Тип сортировки результатов поиска.
     :param rating: Диапазон рейтинга, который нужно использовать для поиска.
     :param page: Номер страницы результатов поиска. По умолчанию 1.
-    :return Optional[Any[Dict]]: Список фильмов, найденных по рейтингу.
+    :return Optional[List[MovieRecord]]: Список фильмов, найденных по рейтингу.
     """
-    params = {
-        **base_params,
-        "rating.kp": rating,
-        "sortField": "rating.kp",
-        "sortType": sort_type,
-        "limit": count,
-        "page": page,
-    }
-    movies = make_request(settings.API_URL, params, user_id)
+    movies = catalog.search_by_rating(count, sort_type, rating, page)
+    if movies:
+        return movies
+    params = rating_params(count, sort_type, rating, page)
+    movies = make_request(
+        settings.API_URL, params, user_id, search_type="rating", first_page=page == 1
+    )
     return movies
 
 
-def save_history(user_id: int, movies: List, search_type: str) -> None:
-    """Сохраняет историю поиска фильмов в БД.
-    :param user_id: Идентификатор пользователя, который выполнил поиск.
-    :param movies: Список фильмов, которые были найдены.
-    :param search_type: Тип поиска, который был использован пользователем.
-    :return None
+def send_movies_info(chat_id: int, movies: List[MovieRecord]) -> List[Message]:
+    """Отправляет информацию о фильмах пользователю в виде сообщений с фотографиями.
+    В режиме "album" постеры отправляются альбомами до 10 фотографий, фильмы без постера - текстом.
+    :param chat_id: Идентификатор чата, в который нужно отправить информацию о фильмах.
+    :param movies: Список фильмов, информацию о которых нужно отправить.
+    :return List[Message]: Отправленные сообщения в порядке отправки.
     """
-    user, _ = User.get_or_create(user_id=user_id)
+    with send_priority(BULK):
+        if settings.RESULTS_DELIVERY == "album":
+            return send_movies_albums(chat_id, movies)
 
-    for movie in movies:
-        if not movie.get("name") or movie is None:
-            continue
+        messages = []
+        for movie in movies:
+            poster_url, caption = format_movie_info(movie)
 
-        poster_url = movie.get("poster")
-        if poster_url is not None:
-            poster_url = poster_url.get("url", "Нет постера")
-
-        History.create(
-            user=user,
-            movie_name=movie.get("name"),
-            description=movie.get("description"),
-            rating=movie.get("rating", {}).get("kp"),
-            year=movie.get("year"),
-            genre=", ".join(genre["name"] for genre in movie.get("genres", [])),
-            age_rating=movie.get("ageRating", "Нет рейтинга"),
-            poster_url=poster_url,
-            timestamp=datetime.now(),
-            search_type=search_type,
-        )
+            if poster_url:
+                messages.append(send_poster(chat_id, poster_url, caption))
+            else:
+                messages.append(bot.send_message(chat_id, caption + NO_POSTER_TEXT))
+        return messages
 
 
-def format_movie_info(movie: Dict) -> tuple:
-    """Форматирует информацию о фильме для отправки пользователю.
-    :param movie: Словарь с информацией о фильме.
-    # :param show_history: Флаг, указывающий, нужно ли показывать историю поиска.
-    :return tuple: Кортеж, содержащий URL постера фильма и отформатированную информацию о фильме.
+def edit_movies_info(
+    chat_id: int, first_message_id: int, count: int, movies: List[MovieRecord]
+) -> bool:
+    """Заменяет постеры и подписи уже отправленной страницы результатов на новые фильмы.
+    Замена возможна, если у новой страницы столько же фильмов, что и у старой, и у всех
+    есть постеры.
+    :param chat_id: Идентификатор чата.
+    :param first_message_id: Идентификатор первого сообщения старой страницы.
+    :param count: Количество сообщений старой страницы.
+    :param movies: Фильмы новой страницы.
+    :return bool: True, если страница заменена, False - если ее нужно отправить заново.
     """
-    genres = movie.get("genres", [])
-    budget = movie.get("budget", {}).get("value", "Нет данных")
-    currency = movie.get("budget", {}).get("currency", "")
-    poster_url = movie.get("poster").get("url", "Нет постера")
-
-    caption_parts = [
-        f"📽Название: {movie['name']}\n"
-        f"🎯Жанр: {', '.join(genre['name'] for genre in genres) or 'Нет жанра'}\n"
-        f"💯Рейтинг: {movie.get('rating', {}).get('kp')}\n"
-        f"🗓️Год выпуска: {movie.get('year')}\n"
-        f"🔞Возрастной рейтинг: {'Нет рейтинга' if movie.get('ageRating') is None else f'{movie.get('ageRating')}+'}\n"
-        f"💰Бюджет: {budget} {currency}\n"
-        f"🎬Описание: {'Нет описания' if not movie.get('description') else movie.get('description')}\n"
-    ]
-
-    caption = "\n".join(caption_parts)
-    return poster_url, caption[:1024] if len(caption) > 1024 else caption
-
-
-def send_movies_info(chat_id: int, movies: Dict[str, Any]) -> None:
-    """Отправляет информацию о фильмах пользователю в виде сообщений с фотографиями.
+    if len(movies) != count:
+        return False
+    posters = [format_movie_info(movie) for movie in movies]
+    if not all(poster_url for poster_url, _ in posters):
+        return False
+
+    with send_priority(BULK):
+        for message_id, (poster_url, caption) in enumerate(posters, first_message_id):
+            file_id = poster_cache.get(poster_url)
+            try:
+                message = bot.edit_message_media(
+                    InputMediaPhoto(file_id or poster_url, caption),
+                    chat_id,
+                    message_id,
+                )
+            except ApiTelegramException as err:
+                if "message is not modified" in str(err):
+                    continue
+                logging.warning(
+                    f"Не удалось заменить сообщение {message_id} в чате {chat_id}: {err}"
+                )
+                if file_id:
+                    poster_cache.invalidate(poster_url)
+                return False
+            if isinstance(message, Message) and message.photo:
+                poster_cache.set(poster_url, message.photo[-1].file_id)
+    return True
+
+
+def send_movies_albums(chat_id: int, movies: List[MovieRecord]) -> List[Message]:
+    """Отправляет фильмы альбомами с подписями у каждой фотографии.
+    Порядок фильмов сохраняется: альбом прерывается перед фильмом без постера.
+    Если альбом не удалось отправить целиком, его фильмы отправляются по одному.
     :param chat_id: Идентификатор чата, в который нужно отправить информацию о фильмах.
-    :param movies: Список фильмов, информацию о которых нужно отправить.
-    :return None
+    :param movies: Список фильмов.
+    :return List[Message]: Отправленные сообщения.
     """
-    valid_movies = []
+    messages = []
+    album = []
     for movie in movies:
-        if not movie.get("name"):
-            logging.info(f"Фильм {movie.get('id')} не имеет названия.")
-        else:
-            valid_movies.append(movie)
-
-    for movie in valid_movies:
         poster_url, caption = format_movie_info(movie)
+        if not poster_url:
+            if album:
+                messages += send_album(chat_id, album)
+                album = []
+            messages.append(bot.send_message(chat_id, caption + NO_POSTER_TEXT))
+            continue
+        album.append((poster_url, caption))
+        if len(album) == ALBUM_SIZE:
+            messages += send_album(chat_id, album)
+            album = []
+    if album:
+        messages += send_album(chat_id, album)
+    return messages
 
-        if poster_url:
-            bot.send_photo(chat_id, poster_url, caption)
-        else:
-            bot.send_message(chat_id, caption + "🖼Постер: Нет постера\n\n")
+
+def send_album(chat_id: int, album: List[Tuple[str, str]]) -> List[Message]:
+    """Отправляет один альбом постеров.
+    Уже загруженные в Telegram постеры отправляются по file_id.
+    :param chat_id: Идентификатор чата.
+    :param album: Список пар (URL постера, подпись).
+    :return List[Message]: Отправленные сообщения.
+    """
+    if len(album) == 1:
+        return [send_poster(chat_id, *album[0])]
+
+    file_ids = [poster_cache.get(poster_url) for poster_url, _ in album]
+    try:
+        messages = bot.send_media_group(
+            chat_id,
+            [
+                InputMediaPhoto(file_id or poster_url, caption)
+                for (poster_url, caption), file_id in zip(album, file_ids)
+            ],
+        )
+    except ApiTelegramException as err:
+        logging.warning(f"Не удалось отправить альбом в чат {chat_id}: {err}")
+        for (poster_url, _), file_id in zip(album, file_ids):
+            if file_id:
+                poster_cache.invalidate(poster_url)
+        messages = []
+        for poster_url, caption in album:
+            try:
+                messages.append(send_poster(chat_id, poster_url, caption))
+            except ApiTelegramException:
+                messages.append(bot.send_message(chat_id, caption + NO_POSTER_TEXT))
+        return messages
+
+    for (poster_url, _), message in zip(album, messages):
+        if message.photo:
+            poster_cache.set(poster_url, message.photo[-1].file_id)
+    return messages
+
+
+def send_poster(chat_id: int, poster_url: str, caption: str) -> Message:
+    """Отправляет постер с подписью, используя file_id из кэша, если он есть.
+    Если отправка по file_id не удалась, запись кэша удаляется и постер отправляется по URL.
+    :param chat_id: Идентификатор чата.
+    :param poster_url: URL постера.
+    :param caption: Подпись к постеру.
+    :return Message: Отправленное сообщение.
+    """
+    file_id = poster_cache.get(poster_url)
+    if file_id:
+        try:
+            return bot.send_photo(chat_id, file_id, caption)
+        except ApiTelegramException as err:
+            logging.warning(f"Не удалось отправить постер по file_id {file_id}: {err}")
+            poster_cache.invalidate(poster_url)
+
+    message = bot.send_photo(chat_id, poster_url, caption)
+    if message.photo:
+        poster_cache.set(poster_url, message.photo[-1].file_id)
+    return message
 
 
+@traced(API)
 def make_request(
-    url: str, params: Dict[str, Any], user_id: int
-) -> List[Dict[str, Any]]:
+    url: str,
+    params: Dict[str, Any],
+    user_id: int,
+    search_type: Optional[str] = None,
+    first_page: bool = True,
+    keep_positions: bool = False,
+) -> List[Optional[MovieRecord]]:
     """Выполняет HTTP-запрос к указанному URL с заданными параметрами и возвращает результат в виде JSON.
+    Успешные ответы кэшируются по нормализованным параметрам запроса, а одновременные одинаковые
+    запросы объединяются в один вызов API. Каждый вызов API списывается из лимита запросов.
+    Если API недоступно или отключено предохранителем, возвращается устаревший ответ из кэша
+    с пометкой mark_stale.
     :param url: URL, к которому нужно выполнить запрос.
     :param params: Параметры, которые нужно передать в запросе.
     :param user_id: Идентификатор пользователя, для которого выполняется запрос.
-    :return List[Dict[str, Any]]: Результат запроса в виде списка словарей, если запрос был успешным, None в противном
-    случае.
+    :param search_type: Тип поиска, определяющий время жизни записи в кэше.
+    :param first_page: Запрос первой страницы нового поиска, для которой зарезервирована часть лимита.
+    :param keep_positions: Оставлять None на месте неполных фильмов, сохраняя позиции ответа API.
+    :return List[Optional[MovieRecord]]: Фильмы из ответа API или из кэша.
+    :raises QuotaExceeded: Если лимит запросов исчерпан.
+    :raises ApiUnavailable: Если API недоступно, а устаревшего ответа в кэше нет.
     """
-    response = requests.get(url, params=params)
+    cache_key = make_cache_key(url, params)
+    label = search_type or ""
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        api_requests.inc(label, "cache")
+        return cached
+
+    def fetch() -> List[MovieRecord]:
+        if not breaker.allow():
+            raise ApiUnavailable(UNAVAILABLE_REPLY)
+        try:
+            quota.acquire(user_id, first_page)
+        except QuotaExceeded:
+            breaker.cancel()
+            raise
+        started = time.monotonic()
+        try:
+            movies = fetch_docs(
+                url, params, cache_key, search_type, keep_positions
+            )
+        except QuotaExceeded:
+            breaker.record(True, time.monotonic() - started)
+            raise
+        except (requests.RequestException, ValueError):
+            breaker.record(False, time.monotonic() - started)
+            raise
+        except BaseException:
+            breaker.cancel()
+            raise
+        finally:
+            api_latency.observe(time.monotonic() - started, label)
+        breaker.record(True, time.monotonic() - started)
+        return movies
 
     try:
-        response.raise_for_status()
-        return response.json().get("docs", [])
-    except (requests.HTTPError, requests.RequestException) as err:
-        logging.error(
-            f"Произошла ошибка при запросе '{url}' с параметрами '{params}' для пользователя {user_id}: {err}."
-        )
-        return []
\ No newline at end of file
+        movies = list(single_flight.do(cache_key, fetch))
+    except QuotaExceeded:
+        api_requests.inc(label, "quota")
+        raise
+    except (requests.RequestException, ValueError, ApiUnavailable) as err:
+        if not isinstance(err, ApiUnavailable):
+            logging.error(
+                f"Произошла ошибка при запросе '{url}' с параметрами '{params}' для пользователя {user_id}: {err}."
+            )
+        stale = response_cache.get_stale(cache_key)
+        if stale is None:
+            api_requests.inc(label, "unavailable")
+            raise ApiUnavailable(UNAVAILABLE_REPLY) from err
+        api_requests.inc(label, "stale")
+        return mark_stale(stale)
+    api_requests.inc(label, "api")
+    return movies
+
+
+def fetch_docs(
+    url: str,
+    params: Dict[str, Any],
+    cache_key: str,
+    search_type: Optional[str],
+    keep_positions: bool = False,
+) -> List[Optional[MovieRecord]]:
+    """Запрашивает список фильмов у API, сохраняет его в кэш и индекс названий.
+    Фильмы разбираются один раз, неполные по notNullFields запроса отбрасываются.
+    :param url: URL, к которому нужно выполнить запрос.
+    :param params: Параметры, которые нужно передать в запросе.
+    :param cache_key: Ключ кэша для ответа.
+    :param search_type: Тип поиска, определяющий время жизни записи в кэше.
+    :param keep_positions: Оставлять None на месте неполных фильмов.
+    :return List[Optional[MovieRecord]]: Фильмы из поля "docs" ответа.
+    :raises QuotaExceeded: Если API сообщило об исчерпании лимита.
+    """
+    response = get_session().get(url, params=params, timeout=get_timeout())
+    if response.status_code in (403, 429):
+        quota.exhaust()
+        raise QuotaExceeded(DAILY_LIMIT_REPLY)
+    response.raise_for_status()
+    docs = response.json().get("docs", [])
+    movies = decode_docs(docs, params.get("notNullFields", ()), keep_positions)
+    response_cache.set(cache_key, movies, search_type)
+    index_titles(docs)
+    return movies
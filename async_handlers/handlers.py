@@ -0,0 +1,296 @@
+import asyncio
+import functools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, Union
+
+from telebot.types import Message, BotCommand, CallbackQuery
+
+from async_loader import bot
+from API.async_site_api import (
+    search_by_name,
+    search_by_rating,
+    send_movies_info,
+    search_by_budget,
+    edit_movies_info,
+)
+from API.kinopoisk import save_history
+from API.movie import MovieRecord
+from API.circuit_breaker import ApiUnavailable
+from API.quota import QuotaExceeded, speculative
+from config_data.config import settings, DEFAULT_COMMANDS
+from keyboards.reply.buttons import buttons
+from keyboards.inline.buttons import get_pagination_keyboard
+from handlers.search_state import (
+    get_name_offset,
+    get_page_messages,
+    get_page_text,
+    get_prefetch_key,
+    get_search_params,
+    has_next_page,
+    parse_page_callback,
+    update_name_cursors,
+)
+from database.search_queries import load_query, save_cursors, save_query
+
+# Предзагрузка пользователя: ключ страницы, задача и момент, после которого она устаревает.
+prefetch_tasks: Dict[int, Tuple[Tuple, asyncio.Task, float]] = {}
+prefetch_slots = asyncio.Semaphore(settings.PREFETCH_WORKERS)
+
+
+def api_guard(
+    handler: Callable[[Union[Message, CallbackQuery]], Awaitable[None]],
+) -> Callable[[Union[Message, CallbackQuery]], Awaitable[None]]:
+    """Декоратор обработчика, отвечающий пользователю, если лимит запросов к API исчерпан
+    или API недоступно.
+    :param handler: Обработчик сообщения или нажатия кнопки.
+    :return: Обработчик, перехватывающий QuotaExceeded и ApiUnavailable.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(update: Union[Message, CallbackQuery]) -> None:
+        try:
+            await handler(update)
+        except (QuotaExceeded, ApiUnavailable) as err:
+            if isinstance(update, CallbackQuery):
+                await bot.answer_callback_query(update.id, err.reply, show_alert=True)
+            else:
+                await bot.send_message(update.from_user.id, err.reply)
+
+    return wrapper
+
+
+async def set_default_commands(bot) -> None:
+    """Устанавливает набор команд по умолчанию для бота.
+    :param bot: Телеграм бот.
+    :return: None
+    """
+    await bot.set_my_commands([BotCommand(*cmd) for cmd in DEFAULT_COMMANDS])
+
+
+@bot.message_handler(commands=["start"])
+async def command_start_handler(message: Message) -> None:
+    """Обработчик команды /start.
+    :param message: Сообщение, содержащее команду /start.
+    :return: None
+    """
+    await bot.send_message(
+        message.from_user.id,
+        f"Добро пожаловать, {message.from_user.full_name}! Я чат-бот для поиска фильмов и сериалов на платформе "
+        f"КиноПоиск. Выбери, что ты хочешь сделать!",
+        reply_markup=buttons(),
+    )
+
+
+@bot.message_handler(commands=["help"])
+@bot.message_handler(func=lambda message: message.text == "Вывести справку")
+async def command_help_handler(message: Message) -> None:
+    """Обработчик команды /help.
+    :param message: Сообщение, содержащее команду /help.
+    :return: None
+    """
+    await bot.send_message(
+        message.from_user.id,
+        "Доступные команды:\n"
+        + "\n".join([f"/{cmd[0]} - {cmd[1]}" for cmd in DEFAULT_COMMANDS]),
+    )
+
+
+@bot.message_handler(func=lambda message: message.text.lower() == "главное меню")
+async def command_back_to_menu(message: Message) -> None:
+    """Обработчик команды "Главное меню".
+    :param message: Сообщение, содержащее команду "Главное меню".
+    :return: None
+    """
+    cancel_prefetch(message.from_user.id)
+    await bot.delete_state(message.from_user.id, message.chat.id)
+    await bot.send_message(
+        message.chat.id, "Выбери, что ты хочешь сделать!", reply_markup=buttons()
+    )
+
+
+async def send_movies_page(
+    user_id: int,
+    movies: List[MovieRecord],
+    search_type: str,
+    page: int,
+    search_data: Dict[str, Any],
+) -> None:
+    """Отправляет пользователю страницу с фильмами и клавиатуру для перехода между страницами.
+    Параметры поиска сохраняются под коротким идентификатором, который записывается в кнопки.
+    :param user_id: Идентификатор пользователя, для которого выполняется поиск.
+    :param movies: Список фильмов, информацию о которых нужно отправить.
+    :param search_type: Тип поиска, который был использован пользователем.
+    :param page: Номер страницы результатов поиска.
+    :param search_data: Параметры поиска пользователя.
+    :return: None
+    """
+    messages = await send_movies_info(user_id, movies)
+    if movies:
+        search = get_search_params(search_data)
+        query_id = await asyncio.to_thread(save_query, search)
+        first_message_id, count = (
+            get_page_messages(messages) if settings.PAGE_UPDATE == "edit" else (0, 0)
+        )
+        await bot.send_message(
+            user_id,
+            get_page_text(page, movies),
+            reply_markup=get_pagination_keyboard(
+                query_id, page, has_next_page(search, movies), first_message_id, count
+            ),
+        )
+        save_history(user_id, movies, search_type)
+        prefetch_page(user_id, search, page + 1)
+    else:
+        cancel_prefetch(user_id)
+        await bot.send_message(user_id, "Ничего не найдено")
+        await bot.delete_state(user_id)
+
+
+async def fetch_movies(user_id: int, search: Dict[str, Any], page: int) -> List[MovieRecord]:
+    """Запрашивает страницу результатов по сохраненным параметрам поиска.
+    Для поиска по названию в параметрах обновляются позиции начала страниц в результатах API.
+    :param user_id: Идентификатор пользователя.
+    :param search: Параметры поиска.
+    :param page: Номер страницы.
+    :return: Список фильмов.
+    """
+    if search["search_type"] == "rating":
+        return await search_by_rating(
+            user_id,
+            search["count_movies"],
+            search["sort_type"],
+            search["rating"],
+            page,
+        )
+    elif search["search_type"] == "name":
+        offset = get_name_offset(search, page)
+        movies, offsets = await search_by_name(
+            user_id, search["name"], search["count_movies"], offset
+        )
+        update_name_cursors(search, page, offset, offsets)
+        return movies
+    elif search["search_type"] == "budget":
+        return await search_by_budget(
+            user_id, search["count_movies"], search["sort_type"], page
+        )
+    return []
+
+
+def prefetch_page(user_id: int, data: Dict[str, Any], page: int) -> None:
+    """Запускает фоновую загрузку страницы результатов поиска.
+    Для каждого пользователя хранится одна предзагрузка, предыдущая при этом отменяется.
+    Всего хранится не больше PREFETCH_MAX_PENDING предзагрузок, не забранные за
+    PREFETCH_TTL секунд удаляются. Запросы предзагрузки упреждающие: они не забирают
+    у пользователя последний токен лимита.
+    :param user_id: Идентификатор пользователя.
+    :param data: Параметры поиска.
+    :param page: Номер страницы, которую нужно загрузить.
+    :return: None
+    """
+    search = get_search_params(data)
+    if search["search_type"] is None or search["count_movies"] is None:
+        return
+    if prefetch_slots.locked():
+        return
+
+    async def prefetch() -> Tuple[List[MovieRecord], Dict[str, Any]]:
+        async with prefetch_slots:
+            with speculative():
+                return await fetch_movies(user_id, search, page), search
+
+    cancel_prefetch(user_id)
+    now = time.monotonic()
+    if len(prefetch_tasks) >= settings.PREFETCH_MAX_PENDING:
+        expired = [uid for uid, (_, _, exp) in prefetch_tasks.items() if exp < now]
+        for expired_user_id in expired:
+            cancel_prefetch(expired_user_id)
+    while len(prefetch_tasks) >= settings.PREFETCH_MAX_PENDING:
+        cancel_prefetch(next(iter(prefetch_tasks)))
+    prefetch_tasks[user_id] = (
+        get_prefetch_key(search, page),
+        asyncio.create_task(prefetch()),
+        now + settings.PREFETCH_TTL,
+    )
+
+
+def cancel_prefetch(user_id: int) -> None:
+    """Отменяет предзагрузку пользователя.
+    :param user_id: Идентификатор пользователя.
+    :return: None
+    """
+    _, task, _ = prefetch_tasks.pop(user_id, (None, None, 0.0))
+    if task is not None:
+        task.cancel()
+
+
+@bot.callback_query_handler(func=lambda callback: callback.data.startswith("pg:"))
+@api_guard
+async def process_page_change(callback: CallbackQuery) -> None:
+    """Обработчик нажатия кнопок управления страницами.
+    Параметры поиска загружаются по идентификатору из кнопки, состояние пользователя не
+    используется. Если возможно, страница заменяется в уже отправленных сообщениях.
+    :param callback: Объект CallbackQuery.
+    :return: None
+    """
+    query_id, page, first_message_id, count = parse_page_callback(callback.data)
+    search = await asyncio.to_thread(load_query, query_id)
+    if search is None:
+        await bot.answer_callback_query(
+            callback.id, "Этот поиск устарел, выполните его заново."
+        )
+        return
+
+    user_id = callback.from_user.id
+    chat_id = callback.message.chat.id
+    movies, search = await get_page_movies(user_id, search, page)
+    await asyncio.to_thread(save_cursors, query_id, search["name_cursors"])
+
+    if not movies:
+        await bot.answer_callback_query(callback.id, "Больше ничего не найдено.")
+        await bot.edit_message_reply_markup(
+            chat_id,
+            callback.message.message_id,
+            reply_markup=get_pagination_keyboard(
+                query_id, page - 1, False, first_message_id, count
+            ),
+        )
+        return
+
+    await bot.answer_callback_query(callback.id)
+    if count and await edit_movies_info(chat_id, first_message_id, count, movies):
+        await bot.edit_message_text(
+            get_page_text(page, movies),
+            chat_id,
+            callback.message.message_id,
+            reply_markup=get_pagination_keyboard(
+                query_id, page, has_next_page(search, movies), first_message_id, count
+            ),
+        )
+        save_history(user_id, movies, search["search_type"])
+        prefetch_page(user_id, search, page + 1)
+    else:
+        await send_movies_page(user_id, movies, search["search_type"], page, search)
+
+
+async def get_page_movies(
+    user_id: int, search: Dict[str, Any], page: int
+) -> Tuple[List[MovieRecord], Dict[str, Any]]:
+    """Возвращает фильмы страницы, используя предзагрузку, если она есть.
+    :param user_id: Идентификатор пользователя.
+    :param search: Параметры поиска.
+    :param page: Номер страницы.
+    :return: Список фильмов и параметры поиска с обновленными позициями страниц.
+    """
+    key, task, expires_at = prefetch_tasks.pop(user_id, (None, None, 0.0))
+    if (
+        task is not None
+        and key == get_prefetch_key(search, page)
+        and expires_at >= time.monotonic()
+    ):
+        try:
+            return await task
+        except Exception:
+            pass
+    elif task is not None:
+        task.cancel()
+    return await fetch_movies(user_id, search, page), search
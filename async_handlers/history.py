@@ -0,0 +1,97 @@
+import asyncio
+from async_loader import bot
+from telebot.types import Message, CallbackQuery
+from states.movies_information import SearchMovie
+from keyboards.reply.buttons import get_main_menu_keyboard
+from handlers.history_pages import build_history_page, parse_history_callback
+from datetime import datetime
+
+
+@bot.message_handler(commands=["history"])
+@bot.message_handler(func=lambda message: message.text == "История поиска")
+async def command_history(message: Message) -> None:
+    """Обработчик команды /history и сообщения "История поиска".
+    Запрашивает у пользователя дату поиска в формате YYYY-MM-DD.
+    :param message: Входящее сообщение от пользователя.
+    :return: None
+    """
+    await bot.send_message(
+        message.from_user.id, "Пожалуйста, введите дату поиска в формате YYYY-MM-DD."
+    )
+    await bot.set_state(
+        message.from_user.id, SearchMovie.waiting_for_date_input, message.chat.id
+    )
+
+
+@bot.message_handler(
+    state=SearchMovie.waiting_for_date_input, regexp=r"^\d{4}-\d{2}-\d{2}$"
+)
+async def get_date(message: Message) -> None:
+    """Обработчик ввода даты пользователем.
+    Проверяет введенную дату и отображает первую страницу истории поиска пользователя для заданной даты.
+    :param message: Входящее сообщение от пользователя.
+    :return: None
+    """
+    wait_message = await bot.send_message(
+        message.from_user.id, "Пожалуйста, подождите..."
+    )
+    date = await parse_date(message.text, message.from_user.id)
+    if not date:
+        await bot.delete_message(message.chat.id, wait_message.message_id)
+        return
+    await bot.delete_message(message.chat.id, wait_message.message_id)
+
+    text, keyboard = await asyncio.to_thread(
+        build_history_page, message.from_user.id, date
+    )
+    if text is None:
+        await bot.send_message(
+            message.from_user.id,
+            "У вас нет истории поиска на эту дату.",
+            reply_markup=get_main_menu_keyboard(),
+        )
+    else:
+        await bot.send_message(message.from_user.id, text, reply_markup=keyboard)
+
+    await bot.delete_state(message.from_user.id, message.chat.id)
+
+
+@bot.callback_query_handler(func=lambda callback: callback.data.startswith("hist:"))
+async def process_history_page(callback: CallbackQuery) -> None:
+    """Обработчик кнопок листания истории поиска.
+    Страница истории заменяется в том же сообщении.
+    :param callback: Объект CallbackQuery с данными вида "hist:<n|p>:<дата>:<время>:<id>".
+    :return: None
+    """
+    date, cursor, backward = parse_history_callback(callback.data)
+    text, keyboard = await asyncio.to_thread(
+        build_history_page, callback.from_user.id, date, cursor, backward
+    )
+    await bot.answer_callback_query(callback.id)
+    if text is None:
+        return
+    await bot.edit_message_text(
+        text,
+        callback.message.chat.id,
+        callback.message.message_id,
+        reply_markup=keyboard,
+    )
+
+
+async def parse_date(date_str: str, user_id: int) -> datetime:
+    """Проверяет входящую дату.
+    :param date_str: Строка даты в формате YYYY-MM-DD.
+    :param user_id: ID пользователя.
+    :return: Объект datetime.
+    """
+    try:
+        date = datetime.strptime(date_str, "%Y-%m-%d")
+        if date > datetime.now():
+            await bot.send_message(user_id, "Дата не может быть в будущем.")
+            return None
+        return date
+    except ValueError:
+        await bot.send_message(
+            user_id, "Пожалуйста, введите дату в формате YYYY-MM-DD."
+        )
+        return None
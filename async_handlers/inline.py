@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from typing import Dict
+
+from telebot.types import InlineQuery
+
+from async_loader import bot
+from config_data.config import settings
+from handlers.inline_results import build_inline_results
+
+pending_queries: Dict[int, asyncio.Task] = {}
+
+
+@bot.inline_handler(func=lambda query: True)
+async def process_inline_query(query: InlineQuery) -> None:
+    """Обработчик inline-запроса: подсказывает фильмы по вводимому названию.
+    Запрос обрабатывается сразу (или через INLINE_DEBOUNCE секунд, если задержка задана),
+    а ответ на предыдущий запрос пользователя, который он успел дополнить, отменяется.
+    :param query: Объект InlineQuery.
+    :return: None
+    """
+    previous = pending_queries.pop(query.from_user.id, None)
+    if previous is not None:
+        previous.cancel()
+    task = asyncio.create_task(answer_inline_query(query))
+    pending_queries[query.from_user.id] = task
+    task.add_done_callback(
+        lambda done: (
+            pending_queries.pop(query.from_user.id, None)
+            if pending_queries.get(query.from_user.id) is done
+            else None
+        )
+    )
+
+
+async def answer_inline_query(query: InlineQuery) -> None:
+    """Отвечает на inline-запрос подсказками из локального индекса названий.
+    :param query: Объект InlineQuery.
+    :return: None
+    """
+    if settings.INLINE_DEBOUNCE:
+        await asyncio.sleep(settings.INLINE_DEBOUNCE)
+    results, next_offset = await asyncio.to_thread(
+        build_inline_results, query.query, query.offset
+    )
+    try:
+        await bot.answer_inline_query(
+            query.id,
+            results,
+            cache_time=settings.INLINE_CACHE_TIME,
+            next_offset=next_offset,
+        )
+    except Exception as err:
+        logging.warning(f"Не удалось ответить на inline-запрос {query.id}: {err}")
@@ -0,0 +1,71 @@
+from async_loader import bot
+from telebot.types import Message
+from API.async_site_api import search_by_budget
+from async_handlers.handlers import api_guard, send_movies_page
+from states.movies_information import SearchMovie
+from keyboards.reply.buttons import get_main_menu_keyboard
+
+
+@bot.message_handler(commands=["search_by_low_budget", "search_by_high_budget"])
+@bot.message_handler(
+    func=lambda message: message.text
+    in [
+        "Поиск с низким бюджетом",
+        "Поиск с высоким бюджетом",
+    ]
+)
+async def command_search_by_budget(message: Message) -> None:
+    command = message.text.lower()
+    await bot.set_state(
+        message.from_user.id, SearchMovie.number_of_results, message.chat.id
+    )
+    await bot.send_message(
+        message.from_user.id,
+        "Введите количество фильмов, которые вы хотите вывести (от 1 до 100):",
+        reply_markup=get_main_menu_keyboard(),
+    )
+
+    sort_command = (
+        "/search_by_low_budget" if "низким" in command else "/search_by_high_budget"
+    )
+    async with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
+        data["sort_command"] = sort_command
+
+
+@bot.message_handler(state=SearchMovie.number_of_results)
+@api_guard
+async def process_search_by_budget(message: Message) -> None:
+    """"""
+    if not message.text.isdigit():
+        await bot.send_message(
+            message.from_user.id,
+            "Неправильный формат. Введите целое число от 1 до 100.",
+            reply_markup=get_main_menu_keyboard(),
+        )
+        return
+
+    count = int(message.text)
+    if count < 1 or count > 100:
+        await bot.send_message(
+            message.from_user.id, "Количество фильмов должно быть от 1 до 100."
+        )
+        return
+
+    async with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
+        data["count_movies"] = count
+        sort_types = {"/search_by_low_budget": 1, "/search_by_high_budget": -1}
+        data["sort_type"] = sort_types.get(data.get("sort_command"))
+
+        if data["sort_type"] is None:
+            await bot.send_message(message.from_user.id, "Неверный тип сортировки.")
+            return
+
+        movies = await search_by_budget(
+            message.from_user.id,
+            data["count_movies"],
+            data["sort_type"],
+        )
+        data["search_type"] = "budget"
+        await send_movies_page(
+            message.from_user.id, movies, data["search_type"], page=1, search_data=data
+        )
@@ -0,0 +1,99 @@
+from async_loader import bot
+from telebot.types import Message
+from API.async_site_api import search_by_name
+from async_handlers.handlers import api_guard, send_movies_page
+from API.movie import MovieRecord
+from states.movies_information import SearchMovie
+from keyboards.reply.buttons import get_main_menu_keyboard
+
+
+@bot.message_handler(commands=["search_by_name"])
+@bot.message_handler(func=lambda message: message.text == "Поиск по названию")
+async def command_search_by_name(message: Message):
+    """Обработчик команды поиска фильма по названию.
+    :param message: Сообщение с командой поиска фильма по названию.
+    :return: None
+    """
+    await bot.send_message(
+        message.from_user.id,
+        "Введите название фильма или сериала, который вы хотите найти:",
+        reply_markup=get_main_menu_keyboard(),
+    )
+    await bot.set_state(message.from_user.id, SearchMovie.movie_name, message.chat.id)
+
+
+@bot.message_handler(state=SearchMovie.movie_name)
+@api_guard
+async def process_search_by_name(message: Message) -> None:
+    """Обработчик ввода названия фильма для поиска.
+    :param message: Сообщение с названием фильма.
+    :return: None
+    """
+    movies, offsets = await search_by_name(message.from_user.id, message.text)
+    async with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
+        data["name"] = message.text
+        data["name_movies"] = movies
+        data["name_offsets"] = offsets
+    if not movies:
+        await bot.send_message(
+            message.from_user.id,
+            f"Извините, фильм '{data['name']}' не найден",
+            reply_markup=get_main_menu_keyboard(),
+        )
+        return
+
+    await bot.send_message(
+        message.from_user.id,
+        "Сколько результатов вывести на экран?",
+        reply_markup=get_main_menu_keyboard(),
+    )
+    await bot.set_state(
+        message.from_user.id, SearchMovie.results_per_page, message.chat.id
+    )
+
+
+@bot.message_handler(state=SearchMovie.results_per_page)
+@api_guard
+async def process_search_by_name_count(message: Message) -> None:
+    """Обработчик ввода количества результатов поиска.
+    :param message: Сообщение с количеством результатов поиска.
+    :return: None
+    """
+    if not message.text.isdigit():
+        await bot.send_message(
+            message.from_user.id,
+            "Пожалуйста, введите целое число от 0 до 100.",
+            reply_markup=get_main_menu_keyboard(),
+        )
+        return
+
+    count = int(message.text)
+    if count < 1 or count > 100:
+        await bot.send_message(
+            message.from_user.id,
+            "Значение должно быть от 1 до 100.",
+            reply_markup=get_main_menu_keyboard(),
+        )
+        return
+
+    async with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
+        data["count_movies"] = count
+        movies = [
+            MovieRecord.from_values(movie)
+            for movie in data.pop("name_movies", [])[:count]
+        ]
+        offsets = data.pop("name_offsets", [])[:count]
+        if len(movies) < count:
+            more_movies, more_offsets = await search_by_name(
+                message.from_user.id,
+                data["name"],
+                count - len(movies),
+                offsets[-1] if offsets else 0,
+            )
+            movies += more_movies
+            offsets += more_offsets
+        data["name_cursors"] = [0, offsets[-1] if offsets else 0]
+        data["search_type"] = "name"
+        await send_movies_page(
+            message.from_user.id, movies, data["search_type"], page=1, search_data=data
+        )
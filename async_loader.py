@@ -0,0 +1,84 @@
+from telebot.async_telebot import AsyncTeleBot
+from config_data import config
+from database.state_storage import create_async_state_storage
+from utils.metrics import instrument_handler
+from utils.send_scheduler import AsyncSendScheduler
+from utils.tracing import SEND, traced, tracer
+
+
+class ScheduledAsyncTeleBot(AsyncTeleBot):
+    """AsyncTeleBot, отправляющий сообщения через общую очередь с учетом лимитов Telegram.
+    Время обработчиков измеряется, обработка каждого обновления трассируется по этапам.
+    """
+
+    def __init__(self, *args, scheduler: AsyncSendScheduler, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+
+    async def _run_middlewares_and_handlers(
+        self, message, handlers, middlewares, update_type
+    ):
+        with tracer.update(update_type):
+            return await super()._run_middlewares_and_handlers(
+                message, handlers, middlewares, update_type
+            )
+
+    def add_message_handler(self, handler_dict):
+        handler_dict["function"] = instrument_handler(handler_dict["function"])
+        super().add_message_handler(handler_dict)
+
+    def add_callback_query_handler(self, handler_dict):
+        handler_dict["function"] = instrument_handler(handler_dict["function"])
+        super().add_callback_query_handler(handler_dict)
+
+    def add_inline_handler(self, handler_dict):
+        handler_dict["function"] = instrument_handler(handler_dict["function"])
+        super().add_inline_handler(handler_dict)
+
+    @traced(SEND)
+    async def send_message(self, chat_id, *args, **kwargs):
+        return await self.scheduler.call(
+            chat_id, super().send_message, chat_id, *args, **kwargs
+        )
+
+    @traced(SEND)
+    async def send_photo(self, chat_id, *args, **kwargs):
+        return await self.scheduler.call(
+            chat_id, super().send_photo, chat_id, *args, **kwargs
+        )
+
+    @traced(SEND)
+    async def send_media_group(self, chat_id, *args, **kwargs):
+        return await self.scheduler.call(
+            chat_id, super().send_media_group, chat_id, *args, **kwargs
+        )
+
+    @traced(SEND)
+    async def edit_message_text(self, text, chat_id=None, *args, **kwargs):
+        if chat_id is None:
+            return await super().edit_message_text(text, chat_id, *args, **kwargs)
+        return await self.scheduler.call(
+            chat_id, super().edit_message_text, text, chat_id, *args, **kwargs
+        )
+
+    @traced(SEND)
+    async def edit_message_media(self, media, chat_id=None, *args, **kwargs):
+        if chat_id is None:
+            return await super().edit_message_media(media, chat_id, *args, **kwargs)
+        return await self.scheduler.call(
+            chat_id, super().edit_message_media, media, chat_id, *args, **kwargs
+        )
+
+
+scheduler = AsyncSendScheduler(
+    global_rate=config.settings.SEND_GLOBAL_RATE,
+    per_chat_rate=config.settings.SEND_PER_CHAT_RATE,
+    per_chat_burst=config.settings.SEND_PER_CHAT_BURST,
+    max_retries=config.settings.SEND_MAX_RETRIES,
+)
+storage = create_async_state_storage()
+bot = ScheduledAsyncTeleBot(
+    token=config.settings.BOT_TOKEN.get_secret_value(),
+    state_storage=storage,
+    scheduler=scheduler,
+)
@@ -9,9 +9,95 @@ class SiteSettings(BaseSettings):
     API_KEY: SecretStr
     API_URL: str = "https://api.kinopoisk.dev/v1.4/movie"
     BOT_TOKEN: SecretStr
+    HTTP_POOL_SIZE: int = 10
+    HTTP_CONNECT_TIMEOUT: float = 3.05
+    HTTP_READ_TIMEOUT: float = 10.0
+    HTTP_RETRIES: int = 3
+    HTTP_BACKOFF_FACTOR: float = 0.5
+    CACHE_MAX_ENTRIES: int = 1000
+    CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    CACHE_TTL_NAME: float = 600.0
+    CACHE_TTL_RATING: float = 1800.0
+    CACHE_TTL_BUDGET: float = 3600.0
+    CACHE_STALE_TTL: float = 24 * 60 * 60
+    CAPTION_CACHE_ENTRIES: int = 10000
+    POSTER_CACHE_ENTRIES: int = 10000
+    NAME_SEARCH_BATCH: int = 50
+    NAME_SEARCH_MAX_BATCHES: int = 5
+    HISTORY_BATCH_SIZE: int = 200
+    HISTORY_FLUSH_INTERVAL: float = 1.0
+    HISTORY_PAGE_SIZE: int = 5
+    RESULTS_DELIVERY: str = "album"
+    SEND_GLOBAL_RATE: float = 30.0
+    SEND_PER_CHAT_RATE: float = 1.0
+    SEND_PER_CHAT_BURST: float = 5.0
+    SEND_WORKERS: int = 8
+    SEND_MAX_RETRIES: int = 3
+    STATE_STORAGE: str = "sqlite"
+    STATE_TTL: int = 24 * 60 * 60
+    STATE_EXPIRY_INTERVAL: float = 300.0
+    STATE_REDIS_URL: str = "redis://localhost:6379/0"
+    PREFETCH_WORKERS: int = 4
+    PREFETCH_PER_USER: int = 1
+    PREFETCH_MAX_PENDING: int = 100
+    PREFETCH_TTL: float = 300.0
+    BOT_MODE: str = "polling"
+    BOT_WORKERS: int = 2
+    WEBHOOK_URL: str = ""
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: SecretStr = SecretStr("")
+    WEBHOOK_TEST_MODE: bool = False
+    SHARD_WORKERS: int = 2
+    SHARD_HEALTH_TIMEOUT: float = 60.0
+    SHARD_HEALTH_INTERVAL: float = 5.0
+    CATALOG_MIRROR: bool = False
+    CATALOG_PAGE_SIZE: int = 250
+    CATALOG_SYNC_INTERVAL: float = 6 * 60 * 60
+    CATALOG_SYNC_QUOTA: int = 50
+    TITLE_INDEX: bool = True
+    TITLE_SEARCH_LIMIT: int = 200
+    TITLE_MIN_SIMILARITY: float = 0.5
+    SUGGEST_LIMIT: int = 50
+    SUGGEST_CACHE_ENTRIES: int = 5000
+    SUGGEST_CACHE_TTL: float = 60.0
+    INLINE_RESULTS: int = 20
+    INLINE_DEBOUNCE: float = 0.0
+    INLINE_WORKERS: int = 4
+    INLINE_CACHE_TIME: int = 300
+    PAGE_UPDATE: str = "edit"
+    SEARCH_QUERY_TTL: int = 7 * 24 * 60 * 60
+    QUOTA_DAILY_LIMIT: int = 200
+    QUOTA_FIRST_PAGE_RESERVE: float = 0.2
+    QUOTA_USER_RATE: float = 1 / 30
+    QUOTA_USER_BURST: float = 10
+    BREAKER_WINDOW: int = 20
+    BREAKER_MIN_CALLS: int = 5
+    BREAKER_FAILURE_RATIO: float = 0.5
+    BREAKER_SLOW_CALL: float = 5.0
+    BREAKER_OPEN_TIMEOUT: float = 30.0
+    BREAKER_HALF_OPEN_CALLS: int = 1
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 0
+    TRACE_SLOW_UPDATE: float = 5.0
+    TRACE_PROFILE: bool = False
+    TRACE_PROFILE_AFTER: float = 1.0
+    TRACE_PROFILE_INTERVAL: float = 0.01
+    TRACE_PROFILE_DIR: str = "profiles"
 
     class Config:
         env_file = "../.env"
 
 
 settings = SiteSettings()
+
+DEFAULT_COMMANDS = (
+    ("start", "Запустить бота"),
+    ("help", "Вывести справку"),
+    ("search_by_name", "Поиск по названию"),
+    ("search_by_rating", "Поиск по рейтингу"),
+    ("search_by_low_budget", "Поиск с низким бюджетом"),
+    ("search_by_high_budget", "Поиск с высоким бюджетом"),
+    ("history", "Просмотр истории запросов"),
+)
@@ -0,0 +1,182 @@
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from peewee import chunked, fn
+
+from API.movie import MovieRecord, decode_docs
+from config_data.config import settings
+from database.model import CatalogMovie, CatalogState, db
+from utils.tracing import DB, traced
+
+CATALOG = "catalog"
+MIN_BUDGET = 10000
+
+
+def parse_range(value: str) -> Tuple[float, float]:
+    """Разбирает диапазон в формате API, например "7 - 10" или "8".
+    :param value: Диапазон значений.
+    :return Tuple[float, float]: Нижняя и верхняя границы.
+    """
+    low, _, high = str(value).partition("-")
+    return float(low), float(high or low)
+
+
+def upsert_docs(docs: List[Dict]) -> int:
+    """Сохраняет фильмы из ответа API в локальный каталог.
+    :param docs: Список фильмов в формате API.
+    :return int: Количество сохраненных фильмов.
+    """
+    rows = []
+    for doc in docs:
+        rating = (doc.get("rating") or {}).get("kp")
+        if doc.get("id") is None or rating is None:
+            continue
+        rows.append(
+            {
+                "movie_id": doc["id"],
+                "rating": rating,
+                "budget": (doc.get("budget") or {}).get("value"),
+                "updated_at": doc.get("updatedAt") or "",
+                "doc": json.dumps(doc, ensure_ascii=False),
+            }
+        )
+
+    with db.atomic():
+        for batch in chunked(rows, 100):
+            CatalogMovie.replace_many(batch).execute()
+    return len(rows)
+
+
+def last_updated_at() -> Optional[str]:
+    """Возвращает время последнего изменения фильма в каталоге по данным API.
+    :return Optional[str]: Значение поля updatedAt или None для пустого каталога.
+    """
+    return CatalogMovie.select(fn.MAX(CatalogMovie.updated_at)).scalar()
+
+
+def is_ready() -> bool:
+    """Проверяет, что каталог включен в настройках и хотя бы раз полностью загружен.
+    :return bool: True, если поиск можно выполнять по локальному каталогу.
+    """
+    if not settings.CATALOG_MIRROR:
+        return False
+    state = CatalogState.get_or_none(CatalogState.name == CATALOG)
+    return state is not None and state.completed_at is not None
+
+
+def get_progress() -> Tuple[Optional[str], int]:
+    """Возвращает курсор прерванного прохода синхронизации.
+    :return Tuple[Optional[str], int]: Значение updatedAt последнего сохраненного фильма
+    (None, если проход не начат или полная загрузка еще не сохранила ни одного фильма) и число
+    страниц, пройденных начиная с его дня.
+    """
+    state = CatalogState.get_or_none(CatalogState.name == CATALOG)
+    if state is None:
+        return None, 0
+    return state.since, state.page
+
+
+def save_progress(since: Optional[str], page: int) -> None:
+    """Сохраняет курсор прохода синхронизации после записи страницы каталога.
+    :param since: Значение updatedAt последнего сохраненного фильма или None для полной загрузки.
+    :param page: Число страниц, пройденных начиная с дня since.
+    :return None
+    """
+    CatalogState.insert(name=CATALOG, since=since, page=page).on_conflict(
+        conflict_target=[CatalogState.name],
+        update={CatalogState.since: since, CatalogState.page: page},
+    ).execute()
+
+
+def take_sync_quota(day: str, limit: int) -> bool:
+    """Списывает один запрос из дневного лимита синхронизации каталога.
+    :param day: Текущие сутки лимита.
+    :param limit: Сколько запросов в сутки может сделать синхронизация.
+    :return bool: True, если запрос можно выполнить.
+    """
+    with db.atomic():
+        CatalogState.insert(name=CATALOG).on_conflict_ignore().execute()
+        CatalogState.update(quota_day=day, quota_used=0).where(
+            (CatalogState.name == CATALOG)
+            & ((CatalogState.quota_day != day) | CatalogState.quota_day.is_null())
+        ).execute()
+        updated = (
+            CatalogState.update(quota_used=CatalogState.quota_used + 1)
+            .where((CatalogState.name == CATALOG) & (CatalogState.quota_used < limit))
+            .execute()
+        )
+    return updated > 0
+
+
+def refund_sync_quota(day: str) -> None:
+    """Возвращает в дневной лимит синхронизации запрос, который не был выполнен.
+    :param day: Сутки лимита, за которые запрос был списан.
+    :return None
+    """
+    CatalogState.update(quota_used=CatalogState.quota_used - 1).where(
+        (CatalogState.name == CATALOG)
+        & (CatalogState.quota_day == day)
+        & (CatalogState.quota_used > 0)
+    ).execute()
+
+
+def mark_synced() -> None:
+    """Отмечает успешное завершение синхронизации каталога и сбрасывает курсор прохода.
+    :return None
+    """
+    CatalogState.insert(name=CATALOG, completed_at=datetime.now()).on_conflict(
+        conflict_target=[CatalogState.name],
+        update={
+            CatalogState.completed_at: datetime.now(),
+            CatalogState.since: None,
+            CatalogState.page: 0,
+        },
+    ).execute()
+
+
+@traced(DB)
+def search_by_rating(
+    count: int, sort_type: int, rating: str, page: int = 1
+) -> Optional[List[MovieRecord]]:
+    """Ищет фильмы по рейтингу в локальном каталоге.
+    :param count: Количество фильмов на странице.
+    :param sort_type: 1 - по возрастанию рейтинга, -1 - по убыванию.
+    :param rating: Диапазон рейтинга.
+    :param page: Номер страницы результатов поиска.
+    :return Optional[List[MovieRecord]]: Список фильмов или None, если каталог не готов.
+    """
+    if not is_ready():
+        return None
+    low, high = parse_range(rating)
+    query = CatalogMovie.select(CatalogMovie.doc).where(
+        CatalogMovie.rating.between(low, high)
+    )
+    return _page(query, CatalogMovie.rating, sort_type, count, page)
+
+
+@traced(DB)
+def search_by_budget(
+    count: int, sort_type: int, page: int = 1
+) -> Optional[List[MovieRecord]]:
+    """Ищет фильмы по бюджету в локальном каталоге.
+    :param count: Количество фильмов на странице.
+    :param sort_type: 1 - по возрастанию бюджета, -1 - по убыванию.
+    :param page: Номер страницы результатов поиска.
+    :return Optional[List[MovieRecord]]: Список фильмов или None, если каталог не готов.
+    """
+    if not is_ready():
+        return None
+    query = CatalogMovie.select(CatalogMovie.doc).where(
+        (CatalogMovie.budget >= MIN_BUDGET) & CatalogMovie.rating.between(1, 10)
+    )
+    return _page(query, CatalogMovie.budget, sort_type, count, page)
+
+
+def _page(query, field, sort_type: int, count: int, page: int) -> List[MovieRecord]:
+    if sort_type == -1:
+        order = (field.desc(), CatalogMovie.movie_id.desc())
+    else:
+        order = (field.asc(), CatalogMovie.movie_id.asc())
+    query = query.order_by(*order).paginate(page, count)
+    return decode_docs(json.loads(doc) for (doc,) in query.tuples())
@@ -7,9 +7,12 @@ from peewee import (
     DateTimeField,
     FloatField,
 )
+from playhouse.sqlite_ext import FTS5Model, SearchField
 from datetime import datetime
 
-db = SqliteDatabase("bot_history.db")
+db = SqliteDatabase(
+    "bot_history.db", pragmas={"journal_mode": "wal", "busy_timeout": 5000}
+)
 
 
 class BaseModel(Model):
@@ -21,18 +24,160 @@ class User(BaseModel):
     user_id = IntegerField(primary_key=True)
 
 
-class History(BaseModel):
-    movie_name = TextField()
-    description = TextField()
-    rating = FloatField()
-    year = IntegerField()
-    genre = TextField()
+class Movie(BaseModel):
+    movie_id = IntegerField(primary_key=True)
+    name = TextField()
+    description = TextField(null=True)
+    rating = FloatField(null=True)
+    year = IntegerField(null=True)
+    genre = TextField(null=True)
     age_rating = TextField(null=True)
+    budget = FloatField(null=True)
+    currency = TextField(null=True)
     poster_url = TextField(null=True)
+
+
+class History(BaseModel):
     user = ForeignKeyField(User, backref="histories")
-    timestamp = DateTimeField(default=datetime.now)
+    movie = ForeignKeyField(Movie, backref="histories")
     search_type = TextField()
+    timestamp = DateTimeField(default=datetime.now)
+
+    class Meta:
+        indexes = ((("user", "timestamp"), False),)
+
+
+class PosterFile(BaseModel):
+    poster_url = TextField(primary_key=True)
+    file_id = TextField()
+    updated_at = DateTimeField(default=datetime.now)
+
+
+class UserState(BaseModel):
+    key = TextField(primary_key=True)
+    state = TextField(null=True)
+    data = TextField(default="{}")
+    expires_at = DateTimeField(index=True)
+
+
+class CatalogMovie(BaseModel):
+    movie_id = IntegerField(primary_key=True)
+    rating = FloatField(index=True)
+    budget = FloatField(null=True, index=True)
+    updated_at = TextField(index=True)
+    doc = TextField()
+
+
+class CatalogState(BaseModel):
+    name = TextField(primary_key=True)
+    completed_at = DateTimeField(null=True)
+    since = TextField(null=True)
+    page = IntegerField(default=0)
+    quota_day = TextField(null=True)
+    quota_used = IntegerField(default=0)
+
+
+class ApiQuota(BaseModel):
+    day = TextField(primary_key=True)
+    used = IntegerField(default=0)
+
+
+class SearchQuery(BaseModel):
+    query_id = TextField(primary_key=True)
+    params = TextField()
+    cursors = TextField(default="[0]")
+    created_at = DateTimeField(default=datetime.now, index=True)
+
+
+class TitleDoc(BaseModel):
+    movie_id = IntegerField(primary_key=True)
+    popularity = FloatField(default=0)
+    doc = TextField()
+
+
+class MovieTitle(FTS5Model):
+    name = SearchField()
+
+    class Meta:
+        database = db
+        options = {"tokenize": "unicode61 remove_diacritics 2"}
+
+
+class MovieTitleTrigram(FTS5Model):
+    name = SearchField()
+
+    class Meta:
+        database = db
+        options = {"tokenize": "trigram"}
+
+
+def migrate_history() -> None:
+    """Переносит историю из старой схемы, где данные фильма хранились в каждой строке History,
+    в таблицу Movie и облегченную таблицу History.
+    Фильмам из старой истории, у которых нет идентификатора Кинопоиска, присваиваются
+    отрицательные идентификаторы.
+    :return None
+    """
+    if "history" not in db.get_tables():
+        return
+    columns = {column.name for column in db.get_columns("history")}
+    if "movie_name" not in columns:
+        return
+
+    with db.atomic():
+        db.execute_sql("DROP INDEX IF EXISTS history_user_id")
+        db.execute_sql("ALTER TABLE history RENAME TO history_old")
+        db.create_tables([Movie, History])
+        db.execute_sql(
+            "INSERT INTO movie (movie_id, name, description, rating, year, genre, age_rating, poster_url) "
+            "SELECT -MIN(id), movie_name, description, rating, year, genre, age_rating, poster_url "
+            "FROM history_old GROUP BY movie_name, year"
+        )
+        db.execute_sql(
+            "INSERT INTO history (id, user_id, movie_id, search_type, timestamp) "
+            "SELECT h.id, h.user_id, -m.min_id, h.search_type, h.timestamp "
+            "FROM history_old AS h JOIN ("
+            "SELECT movie_name, year, MIN(id) AS min_id FROM history_old GROUP BY movie_name, year"
+            ") AS m ON m.movie_name = h.movie_name AND m.year = h.year"
+        )
+        db.execute_sql("DROP TABLE history_old")
+    db.execute_sql("VACUUM")
+
+
+def migrate_catalog_state() -> None:
+    """Добавляет в таблицу CatalogState, созданную старой версией бота, поля курсора
+    синхронизации и расхода лимита запросов.
+    :return None
+    """
+    if "catalogstate" not in db.get_tables():
+        return
+    columns = {column.name for column in db.get_columns("catalogstate")}
+    for name, definition in (
+        ("since", "TEXT"),
+        ("page", "INTEGER NOT NULL DEFAULT 0"),
+        ("quota_day", "TEXT"),
+        ("quota_used", "INTEGER NOT NULL DEFAULT 0"),
+    ):
+        if name not in columns:
+            db.execute_sql(f"ALTER TABLE catalogstate ADD COLUMN {name} {definition}")
 
 
 db.connect()
-db.create_tables([User, History])
\ No newline at end of file
+migrate_history()
+migrate_catalog_state()
+db.create_tables(
+    [
+        User,
+        Movie,
+        History,
+        PosterFile,
+        UserState,
+        CatalogMovie,
+        CatalogState,
+        ApiQuota,
+        SearchQuery,
+        TitleDoc,
+        MovieTitle,
+        MovieTitleTrigram,
+    ]
+)
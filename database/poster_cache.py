@@ -0,0 +1,71 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from database.model import PosterFile
+
+
+class PosterCache:
+    """Кэш file_id постеров, уже загруженных в Telegram.
+    Записи хранятся в таблице PosterFile, прочитанные значения дополнительно держатся в памяти:
+    не больше max_entries последних использованных постеров, остальные вытесняются по LRU.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._file_ids: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, poster_url: str) -> Optional[str]:
+        """Возвращает file_id постера, если он уже отправлялся.
+        :param poster_url: URL постера.
+        :return Optional[str]: file_id или None.
+        """
+        with self._lock:
+            if poster_url in self._file_ids:
+                self._file_ids.move_to_end(poster_url)
+                return self._file_ids[poster_url]
+
+        poster = PosterFile.get_or_none(PosterFile.poster_url == poster_url)
+        file_id = poster.file_id if poster is not None else None
+        with self._lock:
+            self._remember(poster_url, file_id)
+        return file_id
+
+    def set(self, poster_url: str, file_id: str) -> None:
+        """Сохраняет file_id, полученный после успешной отправки постера.
+        :param poster_url: URL постера.
+        :param file_id: Идентификатор файла в Telegram.
+        :return None
+        """
+        with self._lock:
+            if self._file_ids.get(poster_url) == file_id:
+                self._file_ids.move_to_end(poster_url)
+                return
+            self._remember(poster_url, file_id)
+        try:
+            PosterFile.replace(
+                poster_url=poster_url, file_id=file_id, updated_at=datetime.now()
+            ).execute()
+        except Exception as err:
+            logging.error(f"Не удалось сохранить file_id постера {poster_url}: {err}")
+
+    def invalidate(self, poster_url: str) -> None:
+        """Удаляет file_id постера, отправка которого завершилась ошибкой.
+        :param poster_url: URL постера.
+        :return None
+        """
+        with self._lock:
+            self._remember(poster_url, None)
+        try:
+            PosterFile.delete().where(PosterFile.poster_url == poster_url).execute()
+        except Exception as err:
+            logging.error(f"Не удалось удалить file_id постера {poster_url}: {err}")
+
+    def _remember(self, poster_url: str, file_id: Optional[str]) -> None:
+        self._file_ids[poster_url] = file_id
+        self._file_ids.move_to_end(poster_url)
+        while len(self._file_ids) > self.max_entries:
+            self._file_ids.popitem(last=False)
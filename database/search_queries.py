@@ -0,0 +1,92 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from config_data.config import settings
+from database.model import SearchQuery
+from utils.tracing import DB, traced
+
+PRUNE_INTERVAL = 60 * 60
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def make_query_id(params: Dict[str, Any]) -> str:
+    """Строит короткий идентификатор поиска по его параметрам.
+    Одинаковые поиски разных пользователей получают один идентификатор.
+    :param params: Параметры поиска без позиций страниц.
+    :return str: Идентификатор из 11 символов для callback_data.
+    """
+    digest = hashlib.sha1(
+        json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).digest()
+    return base64.urlsafe_b64encode(digest[:8]).decode("ascii").rstrip("=")
+
+
+@traced(DB)
+def save_query(search: Dict[str, Any]) -> str:
+    """Сохраняет параметры поиска, чтобы страницы можно было загрузить по идентификатору.
+    :param search: Параметры поиска, включая позиции страниц name_cursors.
+    :return str: Идентификатор поиска.
+    """
+    params = {key: value for key, value in search.items() if key != "name_cursors"}
+    query_id = make_query_id(params)
+    SearchQuery.insert(
+        query_id=query_id,
+        params=json.dumps(params, ensure_ascii=False),
+        cursors=json.dumps(search.get("name_cursors") or [0]),
+    ).on_conflict(
+        conflict_target=[SearchQuery.query_id],
+        update={SearchQuery.created_at: datetime.now()},
+    ).execute()
+    save_cursors(query_id, search.get("name_cursors") or [0])
+    _prune()
+    return query_id
+
+
+@traced(DB)
+def load_query(query_id: str) -> Optional[Dict[str, Any]]:
+    """Загружает параметры поиска по идентификатору.
+    :param query_id: Идентификатор поиска.
+    :return Optional[Dict[str, Any]]: Параметры поиска с позициями страниц или None.
+    """
+    row = SearchQuery.get_or_none(SearchQuery.query_id == query_id)
+    if row is None:
+        return None
+    search = json.loads(row.params)
+    search["name_cursors"] = json.loads(row.cursors)
+    return search
+
+
+@traced(DB)
+def save_cursors(query_id: str, cursors: List[int]) -> None:
+    """Запоминает позиции начала страниц поиска по названию.
+    Сохраненный список не укорачивается: известные позиции дальних страниц остаются.
+    :param query_id: Идентификатор поиска.
+    :param cursors: Позиции начала страниц, начиная с первой.
+    :return None
+    """
+    row = SearchQuery.get_or_none(SearchQuery.query_id == query_id)
+    if row is None:
+        return
+    stored = json.loads(row.cursors)
+    merged = cursors + stored[len(cursors) :]
+    if merged != stored:
+        SearchQuery.update(cursors=json.dumps(merged)).where(
+            SearchQuery.query_id == query_id
+        ).execute()
+
+
+def _prune() -> None:
+    global _last_prune
+    with _prune_lock:
+        if time.monotonic() - _last_prune < PRUNE_INTERVAL:
+            return
+        _last_prune = time.monotonic()
+    expired = datetime.now() - timedelta(seconds=settings.SEARCH_QUERY_TTL)
+    SearchQuery.delete().where(SearchQuery.created_at < expired).execute()
@@ -0,0 +1,317 @@
+import asyncio
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Union
+
+from telebot.storage import StateMemoryStorage, StateStorageBase
+from telebot.storage.base_storage import StateDataContext
+from telebot.asyncio_storage import StateMemoryStorage as AsyncStateMemoryStorage
+from telebot.asyncio_storage import StateStorageBase as AsyncStateStorageBase
+from telebot.asyncio_storage.base_storage import (
+    StateDataContext as AsyncStateDataContext,
+)
+
+from config_data.config import settings
+from database.model import UserState
+from utils.tracing import STATE, traced
+
+
+class TTLStateStorage(StateStorageBase, ABC):
+    """Основа хранилищ состояний с ограниченным временем жизни записей.
+    Запись состояния пользователя продлевается при каждом изменении и удаляется,
+    если пользователь не взаимодействовал с ботом дольше ttl секунд.
+    Наследники реализуют чтение, запись и удаление записи по ключу.
+    """
+
+    def __init__(self, ttl: int, prefix: str = "telebot", separator: str = ":") -> None:
+        super().__init__()
+        self.ttl = ttl
+        self.prefix = prefix
+        self.separator = separator
+        self._lock = threading.RLock()
+
+    @abstractmethod
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def _store(self, key: str, record: Dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    def _delete(self, key: str) -> bool:
+        pass
+
+    def _key(
+        self,
+        chat_id: int,
+        user_id: int,
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> str:
+        return self._get_key(
+            chat_id,
+            user_id,
+            self.prefix,
+            self.separator,
+            business_connection_id,
+            message_thread_id,
+            bot_id,
+        )
+
+    def set_state(self, chat_id: int, user_id: int, state: str, *args, **kwargs) -> bool:
+        if hasattr(state, "name"):
+            state = state.name
+        key = self._key(chat_id, user_id, *args, **kwargs)
+        with self._lock:
+            record = self._load(key) or {"state": None, "data": {}}
+            record["state"] = state
+            self._store(key, record)
+        return True
+
+    def get_state(self, chat_id: int, user_id: int, *args, **kwargs) -> Optional[str]:
+        record = self._load(self._key(chat_id, user_id, *args, **kwargs))
+        return record["state"] if record is not None else None
+
+    def delete_state(self, chat_id: int, user_id: int, *args, **kwargs) -> bool:
+        with self._lock:
+            return self._delete(self._key(chat_id, user_id, *args, **kwargs))
+
+    def set_data(
+        self,
+        chat_id: int,
+        user_id: int,
+        key: str,
+        value: Union[str, int, float, dict],
+        *args,
+        **kwargs,
+    ) -> bool:
+        record_key = self._key(chat_id, user_id, *args, **kwargs)
+        with self._lock:
+            record = self._load(record_key)
+            if record is None:
+                raise RuntimeError(f"{type(self).__name__}: key {record_key} does not exist.")
+            record["data"][key] = value
+            self._store(record_key, record)
+        return True
+
+    def get_data(self, chat_id: int, user_id: int, *args, **kwargs) -> dict:
+        record = self._load(self._key(chat_id, user_id, *args, **kwargs))
+        return record["data"] if record is not None else {}
+
+    def reset_data(self, chat_id: int, user_id: int, *args, **kwargs) -> bool:
+        key = self._key(chat_id, user_id, *args, **kwargs)
+        with self._lock:
+            record = self._load(key)
+            if record is None:
+                return False
+            record["data"] = {}
+            self._store(key, record)
+        return True
+
+    def get_interactive_data(
+        self,
+        chat_id: int,
+        user_id: int,
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> StateDataContext:
+        return StateDataContext(
+            self,
+            chat_id=chat_id,
+            user_id=user_id,
+            business_connection_id=business_connection_id,
+            message_thread_id=message_thread_id,
+            bot_id=bot_id,
+        )
+
+    def save(self, chat_id: int, user_id: int, data: dict, *args, **kwargs) -> bool:
+        key = self._key(chat_id, user_id, *args, **kwargs)
+        with self._lock:
+            record = self._load(key)
+            if record is None:
+                return False
+            record["data"] = data
+            self._store(key, record)
+        return True
+
+    def close(self) -> None:
+        """Освобождает ресурсы хранилища.
+        :return None
+        """
+
+
+class SqliteStateStorage(TTLStateStorage):
+    """Хранилище состояний в таблице UserState базы данных бота.
+    Устаревшие записи не возвращаются при чтении и удаляются фоновым потоком.
+    """
+
+    def __init__(self, ttl: int, expiry_interval: float, **kwargs) -> None:
+        super().__init__(ttl, **kwargs)
+        self._stop_event = threading.Event()
+        self._expiry_interval = expiry_interval
+        self._expiry_thread = threading.Thread(
+            target=self._expire_loop, name="state-expiry", daemon=True
+        )
+        self._expiry_thread.start()
+
+    @traced(STATE)
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        row = UserState.get_or_none(
+            (UserState.key == key) & (UserState.expires_at > datetime.now())
+        )
+        if row is None:
+            return None
+        return {"state": row.state, "data": json.loads(row.data)}
+
+    @traced(STATE)
+    def _store(self, key: str, record: Dict[str, Any]) -> None:
+        UserState.replace(
+            key=key,
+            state=record["state"],
+            data=json.dumps(record["data"], ensure_ascii=False, default=str),
+            expires_at=datetime.now() + timedelta(seconds=self.ttl),
+        ).execute()
+
+    @traced(STATE)
+    def _delete(self, key: str) -> bool:
+        return UserState.delete().where(UserState.key == key).execute() > 0
+
+    def expire(self) -> int:
+        """Удаляет устаревшие записи состояний.
+        :return int: Количество удаленных записей.
+        """
+        return (
+            UserState.delete().where(UserState.expires_at <= datetime.now()).execute()
+        )
+
+    def close(self) -> None:
+        self._stop_event.set()
+        self._expiry_thread.join(timeout=5)
+
+    def _expire_loop(self) -> None:
+        while not self._stop_event.wait(self._expiry_interval):
+            try:
+                removed = self.expire()
+                if removed:
+                    logging.info(f"Удалено устаревших состояний пользователей: {removed}")
+            except Exception as err:
+                logging.error(f"Ошибка при удалении устаревших состояний: {err}")
+
+
+class RedisStateStorage(TTLStateStorage):
+    """Хранилище состояний на сервере с протоколом Redis.
+    Время жизни записей задается командой EXPIRE, удалением занимается сам сервер.
+    """
+
+    def __init__(self, ttl: int, redis_url: str, **kwargs) -> None:
+        super().__init__(ttl, **kwargs)
+        try:
+            import redis
+        except ImportError:
+            raise ImportError(
+                "Для хранения состояний в Redis установите пакет redis: pip install redis"
+            )
+        self.redis = redis.Redis.from_url(redis_url)
+
+    @traced(STATE)
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.redis.get(key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    @traced(STATE)
+    def _store(self, key: str, record: Dict[str, Any]) -> None:
+        self.redis.set(
+            key, json.dumps(record, ensure_ascii=False, default=str), ex=self.ttl
+        )
+
+    @traced(STATE)
+    def _delete(self, key: str) -> bool:
+        return self.redis.delete(key) > 0
+
+    def close(self) -> None:
+        self.redis.close()
+
+
+def create_state_storage() -> StateStorageBase:
+    """Создает хранилище состояний, выбранное в настройках STATE_STORAGE.
+    :return StateStorageBase: Хранилище "memory", "sqlite" или "redis".
+    """
+    if settings.STATE_STORAGE == "sqlite":
+        return SqliteStateStorage(
+            ttl=settings.STATE_TTL, expiry_interval=settings.STATE_EXPIRY_INTERVAL
+        )
+    if settings.STATE_STORAGE == "redis":
+        return RedisStateStorage(
+            ttl=settings.STATE_TTL, redis_url=settings.STATE_REDIS_URL
+        )
+    if settings.STATE_STORAGE == "memory":
+        return StateMemoryStorage()
+    raise ValueError(f"Неизвестное хранилище состояний: {settings.STATE_STORAGE}")
+
+
+class AsyncStateStorage(AsyncStateStorageBase):
+    """Асинхронная обертка над синхронным хранилищем состояний для AsyncTeleBot.
+    Обращения к хранилищу выполняются в пуле потоков и не блокируют цикл событий.
+    """
+
+    def __init__(self, storage: TTLStateStorage) -> None:
+        super().__init__()
+        self.storage = storage
+
+    async def set_state(self, *args, **kwargs) -> bool:
+        return await asyncio.to_thread(self.storage.set_state, *args, **kwargs)
+
+    async def get_state(self, *args, **kwargs) -> Optional[str]:
+        return await asyncio.to_thread(self.storage.get_state, *args, **kwargs)
+
+    async def delete_state(self, *args, **kwargs) -> bool:
+        return await asyncio.to_thread(self.storage.delete_state, *args, **kwargs)
+
+    async def set_data(self, *args, **kwargs) -> bool:
+        return await asyncio.to_thread(self.storage.set_data, *args, **kwargs)
+
+    async def get_data(self, *args, **kwargs) -> dict:
+        return await asyncio.to_thread(self.storage.get_data, *args, **kwargs)
+
+    async def reset_data(self, *args, **kwargs) -> bool:
+        return await asyncio.to_thread(self.storage.reset_data, *args, **kwargs)
+
+    async def save(self, *args, **kwargs) -> bool:
+        return await asyncio.to_thread(self.storage.save, *args, **kwargs)
+
+    def get_interactive_data(
+        self,
+        chat_id: int,
+        user_id: int,
+        business_connection_id: Optional[str] = None,
+        message_thread_id: Optional[int] = None,
+        bot_id: Optional[int] = None,
+    ) -> AsyncStateDataContext:
+        return AsyncStateDataContext(
+            self,
+            chat_id=chat_id,
+            user_id=user_id,
+            business_connection_id=business_connection_id,
+            message_thread_id=message_thread_id,
+            bot_id=bot_id,
+        )
+
+    def close(self) -> None:
+        self.storage.close()
+
+
+def create_async_state_storage() -> AsyncStateStorageBase:
+    """Создает хранилище состояний для асинхронного режима по настройке STATE_STORAGE.
+    :return AsyncStateStorageBase: Асинхронное хранилище состояний.
+    """
+    if settings.STATE_STORAGE == "memory":
+        return AsyncStateMemoryStorage()
+    return AsyncStateStorage(create_state_storage())
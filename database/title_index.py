@@ -0,0 +1,347 @@
+import json
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from peewee import chunked
+
+from API.movie import MovieRecord
+from config_data.config import settings
+from database.model import Movie, MovieTitle, MovieTitleTrigram, TitleDoc, db
+from utils.tracing import DB, traced
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Приводит название к виду для сравнения: нижний регистр, ё -> е, одиночные пробелы.
+    :param text: Название.
+    :return str: Нормализованное название.
+    """
+    return " ".join(WORD_PATTERN.findall(text.lower().replace("ё", "е")))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Возвращает множество триграмм нормализованного названия.
+    :param text: Название.
+    :return Set[str]: Триграммы.
+    """
+    text = f" {normalize(text)} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(query: str, title: str) -> float:
+    """Оценивает, насколько название похоже на запрос, по доле триграмм запроса в названии.
+    :param query: Запрос пользователя.
+    :param title: Название фильма.
+    :return float: Значение от 0 до 1.
+    """
+    query_grams = trigrams(query)
+    if not query_grams:
+        return 0.0
+    return len(query_grams & trigrams(title)) / len(query_grams)
+
+
+def add(docs: Iterable[Dict]) -> int:
+    """Добавляет фильмы в индекс названий или обновляет уже добавленные.
+    :param docs: Фильмы в формате API.
+    :return int: Количество проиндексированных фильмов.
+    """
+    rows = {}
+    for doc in docs:
+        if doc.get("id") is None or not doc.get("name"):
+            continue
+        votes = (doc.get("votes") or {}).get("kp") or 0
+        rows[doc["id"]] = {
+            "movie_id": doc["id"],
+            "popularity": float(votes),
+            "doc": json.dumps(doc, ensure_ascii=False),
+        }
+    if not rows:
+        return 0
+
+    with db.atomic():
+        for batch in chunked(list(rows.values()), 100):
+            ids = [row["movie_id"] for row in batch]
+            titles = [
+                {
+                    "rowid": row["movie_id"],
+                    "name": normalize(json.loads(row["doc"])["name"]),
+                }
+                for row in batch
+            ]
+            TitleDoc.replace_many(batch).execute()
+            MovieTitle.delete().where(MovieTitle.rowid.in_(ids)).execute()
+            MovieTitleTrigram.delete().where(MovieTitleTrigram.rowid.in_(ids)).execute()
+            MovieTitle.insert_many(titles).execute()
+            MovieTitleTrigram.insert_many(titles).execute()
+    return len(rows)
+
+
+def matches_words(words: List[str], title: str) -> bool:
+    """Проверяет, что каждое слово запроса является началом какого-либо слова названия.
+    :param words: Нормализованные слова запроса.
+    :param title: Название фильма.
+    :return bool: True, если название подходит под запрос.
+    """
+    title_words = normalize(title).split()
+    return all(any(t.startswith(word) for t in title_words) for word in words)
+
+
+def search(name: str, limit: Optional[int] = None) -> List[MovieRecord]:
+    """Ищет фильмы по названию в локальном индексе.
+    Сначала выполняется полнотекстовый поиск по словам названия, если он ничего не нашел -
+    поиск по триграммам, допускающий опечатки. Результаты упорядочены по релевантности
+    с учетом популярности фильма.
+    :param name: Название фильма.
+    :param limit: Максимальное количество кандидатов.
+    :return List[MovieRecord]: Фильмы.
+    """
+    limit = limit or settings.TITLE_SEARCH_LIMIT
+    words = normalize(name).split()
+    if not words:
+        return []
+
+    ranked = search_words(words, name, limit)
+    if ranked:
+        return ranked
+
+    text = " ".join(words)
+    grams = {text[i : i + 3] for i in range(len(text) - 2)}
+    if not grams:
+        return []
+    query = " OR ".join(f'"{gram}"' for gram in grams)
+    return _rank(MovieTitleTrigram, query, name, limit, settings.TITLE_MIN_SIMILARITY)
+
+
+def search_words(words: List[str], name: str, limit: int) -> List[MovieRecord]:
+    """Ищет фильмы, в названии которых есть слова, начинающиеся со слов запроса.
+    :param words: Нормализованные слова запроса.
+    :param name: Исходный запрос для ранжирования.
+    :param limit: Максимальное количество кандидатов.
+    :return List[MovieRecord]: Фильмы.
+    """
+    query = " ".join(f'"{word}"*' for word in words)
+    return _rank(MovieTitle, query, name, limit, min_similarity=0.0)
+
+
+def exact_matches(name: str) -> List[MovieRecord]:
+    """Возвращает фильмы из индекса, название которых содержит запрос, как при фильтрации
+    результатов API.
+    :param name: Название фильма.
+    :return List[MovieRecord]: Фильмы в порядке релевантности.
+    """
+    words = normalize(name).split()
+    if not words:
+        return []
+    query = name.lower()
+    return [
+        movie
+        for movie in search_words(words, name, settings.TITLE_SEARCH_LIMIT)
+        if query in movie.name.lower()
+    ]
+
+
+@traced(DB)
+def search_page(
+    name: str, offset: int, count: int
+) -> Optional[Tuple[List[MovieRecord], List[int]]]:
+    """Возвращает страницу результатов поиска по названию из локального индекса.
+    В индексе есть только фильмы, которые бот уже получал от API, поэтому страница
+    отдается локально, только если индекс содержит count фильмов, название которых
+    содержит запрос. Позиции в локальных результатах хранятся отрицательными числами,
+    чтобы их можно было отличить от позиций в результатах API.
+    :param name: Название фильма.
+    :param offset: 0 для первой страницы или отрицательная позиция, с которой начинается страница.
+    :param count: Количество фильмов на странице.
+    :return Optional[Tuple[List[MovieRecord], List[int]]]: Фильмы и позиции сразу после каждого
+    из них или None, если поиск нужно выполнить через API.
+    """
+    if not settings.TITLE_INDEX or offset > 0:
+        return None
+    try:
+        movies = exact_matches(name)
+    except Exception as err:
+        logging.error(f"Ошибка при поиске по локальному индексу названий: {err}")
+        return None
+    return _page(movies, offset, count, full=True)
+
+
+def shown_ids(name: str, offset: int) -> Set[int]:
+    """Возвращает идентификаторы фильмов, уже показанных из локального индекса до позиции offset.
+    Нужны, чтобы не повторять их, когда поиск продолжается через API.
+    :param name: Название фильма.
+    :param offset: Позиция, с которой начинается страница.
+    :return Set[int]: Идентификаторы фильмов.
+    """
+    if not settings.TITLE_INDEX or offset >= 0:
+        return set()
+    try:
+        return {movie.id for movie in exact_matches(name)[:-offset]}
+    except Exception as err:
+        logging.error(f"Ошибка при поиске по локальному индексу названий: {err}")
+        return set()
+
+
+@traced(DB)
+def fuzzy_page(
+    name: str, offset: int, count: int
+) -> Tuple[List[MovieRecord], List[int]]:
+    """Возвращает страницу похожих названий из локального индекса с учетом опечаток.
+    Используется, когда API ничего не нашло или недоступно.
+    :param name: Название фильма.
+    :param offset: 0 для первой страницы или отрицательная позиция, с которой начинается страница.
+    :param count: Количество фильмов на странице.
+    :return Tuple[List[MovieRecord], List[int]]: Фильмы и позиции сразу после каждого из них.
+    """
+    if not settings.TITLE_INDEX or offset > 0:
+        return [], []
+    try:
+        movies = search(name)
+    except Exception as err:
+        logging.error(f"Ошибка при поиске по локальному индексу названий: {err}")
+        return [], []
+    return _page(movies, offset, count, full=False) or ([], [])
+
+
+def _page(
+    movies: List[MovieRecord], offset: int, count: int, full: bool
+) -> Optional[Tuple[List[MovieRecord], List[int]]]:
+    start = -offset
+    page = movies[start : start + count]
+    if not page or (full and len(page) < count):
+        return None
+    return page, [-(start + position) for position in range(1, len(page) + 1)]
+
+
+class SuggestionCache:
+    """Кэш подсказок по началу названия для inline-режима.
+    Если для более короткого префикса запроса в кэше лежит полный список совпадений
+    по словам, подсказки для продолжения запроса фильтруются из него без обращения к БД.
+    Если после фильтрации ничего не осталось, выполняется поиск с учетом опечаток.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, limit: int) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, bool, List[MovieRecord]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def suggest(self, query: str) -> List[MovieRecord]:
+        """Возвращает фильмы, подходящие под вводимое название.
+        :param query: Текст inline-запроса.
+        :return List[MovieRecord]: Фильмы в порядке релевантности.
+        """
+        key = normalize(query)
+        if not key:
+            return []
+        words = key.split()
+
+        cached = self._lookup(key, words)
+        if cached is not None:
+            return cached
+
+        movies = search_words(words, query, self.limit)
+        complete = len(movies) < self.limit
+        if not movies:
+            movies = search(query, self.limit)
+            complete = False
+        self._store(key, complete, movies)
+        return movies
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает счетчики попаданий и промахов кэша.
+        :return Dict[str, int]: Статистика кэша.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
+    def _lookup(self, key: str, words: List[str]) -> Optional[List[MovieRecord]]:
+        now = time.monotonic()
+        with self._lock:
+            for end in range(len(key), 0, -1):
+                prefix = key[:end]
+                entry = self._entries.get(prefix)
+                if entry is None:
+                    continue
+                expires_at, complete, movies = entry
+                if expires_at < now:
+                    del self._entries[prefix]
+                    continue
+                if end == len(key):
+                    self._entries.move_to_end(prefix)
+                    self.hits += 1
+                    return movies
+                if complete:
+                    found = [
+                        movie for movie in movies if matches_words(words, movie.name)
+                    ]
+                    if found:
+                        self.hits += 1
+                        return found
+                    break
+            self.misses += 1
+            return None
+
+    def _store(self, key: str, complete: bool, movies: List[MovieRecord]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, complete, movies)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+suggestions = SuggestionCache(
+    max_entries=settings.SUGGEST_CACHE_ENTRIES,
+    ttl=settings.SUGGEST_CACHE_TTL,
+    limit=settings.SUGGEST_LIMIT,
+)
+
+
+def backfill() -> int:
+    """Заполняет пустой индекс фильмами, которые уже сохранены в истории поиска.
+    :return int: Количество проиндексированных фильмов.
+    """
+    if TitleDoc.select().exists():
+        return 0
+    return add(
+        MovieRecord.from_model(movie).to_doc() for movie in Movie.select().iterator()
+    )
+
+
+def _rank(
+    table, query: str, name: str, limit: int, min_similarity: float
+) -> List[MovieRecord]:
+    rows = (
+        TitleDoc.select(TitleDoc.doc, TitleDoc.popularity, table.bm25().alias("score"))
+        .join(table, on=(table.rowid == TitleDoc.movie_id))
+        .where(table.match(query))
+        .order_by(table.bm25())
+        .limit(limit)
+        .tuples()
+    )
+    ranked = []
+    for doc, popularity, score in rows:
+        movie = MovieRecord.from_doc(json.loads(doc))
+        if movie is None:
+            continue
+        match = similarity(name, movie.name)
+        if match < min_similarity:
+            continue
+        relevance = -score * (1 + match) * (1 + math.log1p(popularity) / 10)
+        ranked.append((relevance, movie))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return [movie for _, movie in ranked]
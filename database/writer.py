@@ -0,0 +1,118 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List
+
+from peewee import chunked
+
+from database.model import db, History, Movie, User
+from utils.metrics import registry
+
+history_write_latency = registry.histogram(
+    "history_write_seconds", "Длительность записи пачки истории поиска в БД"
+)
+history_rows = registry.counter(
+    "history_rows_total", "Строки истории поиска по результату записи", ("result",)
+)
+
+
+class HistoryWriter(threading.Thread):
+    """Фоновый поток, записывающий историю поиска в БД пачками.
+    Строки накапливаются в очереди и сбрасываются одной транзакцией, когда набирается
+    batch_size строк или проходит flush_interval секунд.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float) -> None:
+        super().__init__(name="history-writer", daemon=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._stop_event = threading.Event()
+
+    def add(self, rows: List[Dict[str, Any]]) -> None:
+        """Добавляет строки истории в очередь на запись.
+        :param rows: Список строк истории с полями user, movie, search_type и timestamp,
+        где movie - словарь с полями таблицы Movie.
+        :return None
+        """
+        for row in rows:
+            self._queue.put(row)
+
+    def queue_depth(self) -> int:
+        """Возвращает число строк, ожидающих записи.
+        :return int: Размер очереди.
+        """
+        return self._queue.qsize()
+
+    def run(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            try:
+                timeout = max(0.0, deadline - time.monotonic())
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+        self._flush(batch)
+        db.close()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Останавливает поток, предварительно записав все строки из очереди.
+        :param timeout: Максимальное время ожидания в секундах.
+        :return None
+        """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            movies = {row["movie"]["movie_id"]: row["movie"] for row in batch}
+            histories = [
+                {
+                    "user": row["user"],
+                    "movie": row["movie"]["movie_id"],
+                    "search_type": row["search_type"],
+                    "timestamp": row["timestamp"],
+                }
+                for row in batch
+            ]
+            with db.atomic():
+                User.insert_many(
+                    [{"user_id": user_id} for user_id in {row["user"] for row in batch}]
+                ).on_conflict_ignore().execute()
+                for rows in chunked(list(movies.values()), 50):
+                    Movie.insert_many(rows).on_conflict(
+                        conflict_target=[Movie.movie_id],
+                        preserve=[
+                            Movie.name,
+                            Movie.description,
+                            Movie.rating,
+                            Movie.year,
+                            Movie.genre,
+                            Movie.age_rating,
+                            Movie.budget,
+                            Movie.currency,
+                            Movie.poster_url,
+                        ],
+                    ).execute()
+                for rows in chunked(histories, 100):
+                    History.insert_many(rows).execute()
+        except Exception as err:
+            history_rows.inc("error", amount=len(batch))
+            logging.error(f"Ошибка при сохранении истории поиска ({len(batch)} строк): {err}")
+        else:
+            history_rows.inc("ok", amount=len(batch))
+        finally:
+            history_write_latency.observe(time.perf_counter() - started)
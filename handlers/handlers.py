@@ -1,3 +1,4 @@
+import functools
 from loader import bot
 from telebot.types import Message, BotCommand, CallbackQuery
 from API.site_api import (
@@ -6,23 +7,59 @@ from API.site_api import (
     send_movies_info,
     search_by_budget,
     save_history,
+    edit_movies_info,
 )
+from API.prefetch import Prefetcher
+from API.movie import MovieRecord
+from API.circuit_breaker import ApiUnavailable
+from API.quota import QuotaExceeded, speculative
+from config_data.config import settings, DEFAULT_COMMANDS
 from keyboards.reply.buttons import buttons
 from keyboards.inline.buttons import get_pagination_keyboard
-from typing import List, Dict
+from handlers.search_state import (
+    get_name_offset,
+    get_prefetch_key,
+    get_page_messages,
+    get_page_text,
+    get_search_params,
+    has_next_page,
+    parse_page_callback,
+    update_name_cursors,
+)
+from database.search_queries import load_query, save_cursors, save_query
+from typing import List, Dict, Any, Tuple, Callable, Union
 
 
-DEFAULT_COMMANDS = (
-    ("start", "Запустить бота"),
-    ("help", "Вывести справку"),
-    ("search_by_name", "Поиск по названию"),
-    ("search_by_rating", "Поиск по рейтингу"),
-    ("search_by_low_budget", "Поиск с низким бюджетом"),
-    ("search_by_high_budget", "Поиск с высоким бюджетом"),
-    ("history", "Просмотр истории запросов"),
+prefetcher = Prefetcher(
+    max_workers=settings.PREFETCH_WORKERS,
+    per_user_limit=settings.PREFETCH_PER_USER,
+    max_pending=settings.PREFETCH_MAX_PENDING,
+    ttl=settings.PREFETCH_TTL,
 )
 
 
+def api_guard(
+    handler: Callable[[Union[Message, CallbackQuery]], None],
+) -> Callable[[Union[Message, CallbackQuery]], None]:
+    """Декоратор обработчика, отвечающий пользователю, если лимит запросов к API исчерпан
+    или API недоступно.
+    :param handler: Обработчик сообщения или нажатия кнопки.
+    :return: Обработчик, перехватывающий QuotaExceeded и ApiUnavailable.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(update: Union[Message, CallbackQuery]) -> None:
+        try:
+            handler(update)
+        except (QuotaExceeded, ApiUnavailable) as err:
+            if isinstance(update, CallbackQuery):
+                bot.answer_callback_query(update.id, err.reply, show_alert=True)
+            else:
+                bot.send_message(update.from_user.id, err.reply)
+
+    return wrapper
+
+
 def set_default_commands(bot) -> None:
     """Устанавливает набор команд по умолчанию для бота.
     :param bot: Телеграм бот.
@@ -65,6 +102,7 @@ def command_back_to_menu(message: Message) -> None:
     :param message: Сообщение, содержащее команду /back_to_menu.
     :return: None
     """
+    prefetcher.cancel(message.from_user.id)
     bot.delete_state(message.from_user.id, message.chat.id)
     bot.send_message(
         message.chat.id, "Выбери, что ты хочешь сделать!", reply_markup=buttons()
@@ -72,65 +110,158 @@ def command_back_to_menu(message: Message) -> None:
 
 
 def send_movies_page(
-    user_id: int, movies: List[Dict], search_type: str, page: int = 1
+    user_id: int,
+    movies: List[MovieRecord],
+    search_type: str,
+    page: int,
+    search_data: Dict[str, Any],
 ) -> None:
-    """Отправляет пользователю страницу с фильмами.
+    """Отправляет пользователю страницу с фильмами и клавиатуру для перехода между страницами.
+    Параметры поиска сохраняются под коротким идентификатором, который записывается в кнопки.
+    После отправки страницы в фоне запрашивается следующая страница того же поиска.
     :param user_id: Идентификатор пользователя, для которого выполняется поиск.
     :param movies: Список фильмов, информацию о которых нужно отправить.
     :param search_type: Тип поиска, который был использован пользователем.
     :param page: Номер страницы результатов поиска.
+    :param search_data: Параметры поиска пользователя.
     :return: None
     """
-    send_movies_info(user_id, movies)
+    messages = send_movies_info(user_id, movies)
     if movies:
+        search = get_search_params(search_data)
+        query_id = save_query(search)
+        first_message_id, count = (
+            get_page_messages(messages)
+            if settings.PAGE_UPDATE == "edit"
+            else (0, 0)
+        )
         bot.send_message(
-            user_id, "Показать еще варианты?", reply_markup=get_pagination_keyboard()
+            user_id,
+            get_page_text(page, movies),
+            reply_markup=get_pagination_keyboard(
+                query_id, page, has_next_page(search, movies), first_message_id, count
+            ),
         )
         save_history(user_id, movies, search_type)
+        prefetch_page(user_id, search, page + 1)
     else:
+        prefetcher.cancel(user_id)
         bot.send_message(user_id, "Ничего не найдено")
         bot.delete_state(user_id)
 
 
-@bot.callback_query_handler(
-    func=lambda callback: callback.data in ["next_page", "prev_page"]
-)
+def fetch_movies(user_id: int, search: Dict[str, Any], page: int) -> List[MovieRecord]:
+    """Запрашивает страницу результатов по сохраненным параметрам поиска.
+    :param user_id: Идентификатор пользователя.
+    Для поиска по названию в параметрах обновляются позиции начала страниц в результатах API.
+    :param search: Параметры поиска.
+    :param page: Номер страницы.
+    :return: Список фильмов.
+    """
+    if search["search_type"] == "rating":
+        return search_by_rating(
+            user_id,
+            search["count_movies"],
+            search["sort_type"],
+            search["rating"],
+            page,
+        )
+    elif search["search_type"] == "name":
+        offset = get_name_offset(search, page)
+        movies, offsets = search_by_name(
+            user_id, search["name"], search["count_movies"], offset
+        )
+        update_name_cursors(search, page, offset, offsets)
+        return movies
+    elif search["search_type"] == "budget":
+        return search_by_budget(
+            user_id, search["count_movies"], search["sort_type"], page
+        )
+    return []
+
+
+def prefetch_page(user_id: int, data: Dict[str, Any], page: int) -> None:
+    """Запускает фоновую загрузку страницы результатов поиска.
+    Запросы предзагрузки упреждающие: они не забирают у пользователя последний токен лимита.
+    :param user_id: Идентификатор пользователя.
+    :param data: Параметры поиска.
+    :param page: Номер страницы, которую нужно загрузить.
+    :return: None
+    """
+    search = get_search_params(data)
+    if search["search_type"] is None or search["count_movies"] is None:
+        return
+
+    def prefetch() -> Tuple[List[MovieRecord], Dict[str, Any]]:
+        with speculative():
+            return fetch_movies(user_id, search, page), search
+
+    prefetcher.schedule(user_id, get_prefetch_key(search, page), prefetch)
+
+
+@bot.callback_query_handler(func=lambda callback: callback.data.startswith("pg:"))
+@api_guard
 def process_page_change(callback: CallbackQuery) -> None:
     """Обработчик нажатия кнопок управления страницами.
-    :param callback: Объект CallbackQuery.
+    Параметры поиска загружаются по идентификатору из кнопки, состояние пользователя не
+    используется. Если возможно, страница заменяется в уже отправленных сообщениях.
+    :param callback: Объект CallbackQuery с данными вида
+    "pg:<id поиска>:<страница>:<первое сообщение>:<число сообщений>".
     :return: None
     """
-    get_page_data(callback.from_user.id, callback.message.chat.id, callback.data)
+    query_id, page, first_message_id, count = parse_page_callback(callback.data)
+    search = load_query(query_id)
+    if search is None:
+        bot.answer_callback_query(
+            callback.id, "Этот поиск устарел, выполните его заново."
+        )
+        return
 
+    user_id = callback.from_user.id
+    chat_id = callback.message.chat.id
+    movies, search = get_page_movies(user_id, search, page)
+    save_cursors(query_id, search["name_cursors"])
 
-def get_page_data(user_id: int, chat_id: int, page_action: str) -> None:
-    """Вспомогательная функция для получения данных страницы.
+    if not movies:
+        bot.answer_callback_query(callback.id, "Больше ничего не найдено.")
+        bot.edit_message_reply_markup(
+            chat_id,
+            callback.message.message_id,
+            reply_markup=get_pagination_keyboard(
+                query_id, page - 1, False, first_message_id, count
+            ),
+        )
+        return
+
+    bot.answer_callback_query(callback.id)
+    if count and edit_movies_info(chat_id, first_message_id, count, movies):
+        bot.edit_message_text(
+            get_page_text(page, movies),
+            chat_id,
+            callback.message.message_id,
+            reply_markup=get_pagination_keyboard(
+                query_id, page, has_next_page(search, movies), first_message_id, count
+            ),
+        )
+        save_history(user_id, movies, search["search_type"])
+        prefetch_page(user_id, search, page + 1)
+    else:
+        send_movies_page(user_id, movies, search["search_type"], page, search)
+
+
+def get_page_movies(
+    user_id: int, search: Dict[str, Any], page: int
+) -> Tuple[List[MovieRecord], Dict[str, Any]]:
+    """Возвращает фильмы страницы, используя предзагрузку, если она есть.
     :param user_id: Идентификатор пользователя.
-    :param chat_id: Идентификатор чата.
-    :param page_action: Действие, которое нужно выполнить.
-    :return: None
+    :param search: Параметры поиска.
+    :param page: Номер страницы.
+    :return: Список фильмов и параметры поиска с обновленными позициями страниц.
     """
-    with bot.retrieve_data(user_id, chat_id) as data:
-        if page_action == "next_page":
-            page = data.get("current_page", 1) + 1
-        elif page_action == "prev_page":
-            page = max(1, data.get("current_page", 1) - 1)
-
-        if data["search_type"] == "rating":
-            movies = search_by_rating(
-                user_id,
-                data["count_movies"],
-                data["sort_type"],
-                data["rating"],
-                page,
-            )
-        elif data["search_type"] == "name":
-            movies = search_by_name(user_id, data["name"], data["count_movies"], page)
-
-        elif data["search_type"] == "budget":
-            movies = search_by_budget(
-                user_id, data["count_movies"], data["sort_type"], page
-            )
-
-        data["current_page"] = page
-        send_movies_page(user_id, movies, data["search_type"], page)
+    prefetched = prefetcher.take(user_id, get_prefetch_key(search, page))
+    if prefetched is not None:
+        try:
+            return prefetched.result()
+        except Exception:
+            pass
+    return fetch_movies(user_id, search, page), search
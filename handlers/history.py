@@ -1,11 +1,9 @@
 from loader import bot
-from telebot.types import Message
-from API.site_api import format_movie_info
+from telebot.types import Message, CallbackQuery
 from states.movies_information import SearchMovie
 from keyboards.reply.buttons import get_main_menu_keyboard
-from database.model import History, User
+from handlers.history_pages import build_history_page, parse_history_callback
 from datetime import datetime
-from typing import List
 
 
 @bot.message_handler(commands=["history"])
@@ -29,7 +27,7 @@ def command_history(message: Message) -> None:
 )
 def get_date(message: Message) -> None:
     """Обработчик ввода даты пользователем.
-    Проверяет введенную дату и отображает историю поиска пользователя для заданной даты.
+    Проверяет введенную дату и отображает первую страницу истории поиска пользователя для заданной даты.
     :param message: Входящее сообщение от пользователя.
     :return: None
     """
@@ -40,25 +38,39 @@ def get_date(message: Message) -> None:
         return
     bot.delete_message(message.chat.id, wait_message.message_id)
 
-    user, created = User.get_or_create(user_id=message.from_user.id)
-    histories = fetch_user_histories(user, date)
-
-    if not histories:
-        bot.send_message(message.from_user.id, "У вас нет истории поиска на эту дату.")
-        return
-
-    history_text = format_history(histories)
-
-    if len(history_text) > 4096:
-        send_long_message(message.from_user.id, history_text)
-    else:
+    text, keyboard = build_history_page(message.from_user.id, date)
+    if text is None:
         bot.send_message(
-            message.from_user.id, history_text, reply_markup=get_main_menu_keyboard()
+            message.from_user.id,
+            "У вас нет истории поиска на эту дату.",
+            reply_markup=get_main_menu_keyboard(),
         )
+    else:
+        bot.send_message(message.from_user.id, text, reply_markup=keyboard)
 
     bot.delete_state(message.from_user.id, message.chat.id)
 
 
+@bot.callback_query_handler(func=lambda callback: callback.data.startswith("hist:"))
+def process_history_page(callback: CallbackQuery) -> None:
+    """Обработчик кнопок листания истории поиска.
+    Страница истории заменяется в том же сообщении.
+    :param callback: Объект CallbackQuery с данными вида "hist:<n|p>:<дата>:<время>:<id>".
+    :return: None
+    """
+    date, cursor, backward = parse_history_callback(callback.data)
+    text, keyboard = build_history_page(callback.from_user.id, date, cursor, backward)
+    bot.answer_callback_query(callback.id)
+    if text is None:
+        return
+    bot.edit_message_text(
+        text,
+        callback.message.chat.id,
+        callback.message.message_id,
+        reply_markup=keyboard,
+    )
+
+
 def parse_date(date_str: str, user_id: int) -> datetime:
     """Проверяет входящую дату.
     :param date_str: Строка даты в формате YYYY-MM-DD.
@@ -74,59 +86,3 @@ def parse_date(date_str: str, user_id: int) -> datetime:
     except ValueError:
         bot.send_message(user_id, "Пожалуйста, введите дату в формате YYYY-MM-DD.")
         return None
-
-
-def fetch_user_histories(user: User, date: datetime) -> List[History]:
-    """Получает историю поиска пользователя на заданную дату.
-    :param user: Объект User.
-    :param date: Объект datetime.
-    :return: Список объектов History.
-    """
-    start_time = datetime.combine(date, datetime.min.time())
-    end_time = datetime.combine(date, datetime.max.time())
-
-    return History.select().where(
-        History.user == user,
-        (History.timestamp >= start_time) & (History.timestamp <= end_time),
-    )
-
-
-def format_history(histories: List[History]) -> str:
-    """Форматирует историю поиска для вывода.
-    :param histories: Список объектов History.
-    :return: Строка с форматированной историей поиска.
-    """
-    history_text = "История поиска:\n\n"
-
-    for history in histories:
-        movie_info = {
-            "timestamp": history.timestamp,
-            "user_id": history.user,
-            "type": history.search_type,
-            "name": history.movie_name,
-            "description": history.description,
-            "rating": {"kp": history.rating},
-            "year": history.year,
-            "genres": [{"name": genre.strip()} for genre in history.genre.split(",")],
-            "ageRating": history.age_rating,
-            "poster": {"url": history.poster_url},
-        }
-
-        history_info = format_movie_info(movie_info)
-        _, history_text_part = history_info
-        history_text_part += (
-            f"\n📅Время поиска: {history.timestamp.strftime('%Y-%m-%d %H:%M')}\n"
-            f"🆔ID пользователя: {history.user}\n"
-            f"🔍Тип поиска: {history.search_type}\n"
-        )
-        history_text += (
-            history_text_part + "\n___________________________________\n"
-        )
-    return history_text
-
-
-def send_long_message(user_id: int, history_text: str):
-    """Разделяет и отправляет длинные сообщения частями."""
-    parts = [history_text[i : i + 4096] for i in range(0, len(history_text), 4096)]
-    for part in parts:
-        bot.send_message(user_id, part, reply_markup=get_main_menu_keyboard())
\ No newline at end of file
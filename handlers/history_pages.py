@@ -0,0 +1,152 @@
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from telebot.types import InlineKeyboardMarkup
+
+from API.kinopoisk import format_movie_info
+from API.movie import MovieRecord
+from config_data.config import settings
+from database.model import History, Movie
+from keyboards.inline.buttons import get_history_keyboard
+from utils.text import utf16_len
+from utils.tracing import DB, RENDER, traced
+
+MESSAGE_LIMIT = 4096
+CURSOR_FORMAT = "%Y%m%d%H%M%S%f"
+ENTRY_SEPARATOR = "\n___________________________________\n"
+
+
+def parse_history_callback(data: str) -> Tuple[datetime, Tuple[datetime, int], bool]:
+    """Разбирает данные кнопки листания истории.
+    :param data: Строка вида "hist:<n|p>:<дата>:<время>:<id>".
+    :return: Дата, ключ (timestamp, id) и признак листания назад.
+    """
+    _, direction, date_str, timestamp_str, history_id = data.split(":")
+    date = datetime.strptime(date_str, "%Y%m%d")
+    cursor = (datetime.strptime(timestamp_str, CURSOR_FORMAT), int(history_id))
+    return date, cursor, direction == "p"
+
+
+@traced(DB)
+def fetch_user_histories(
+    user_id: int,
+    date: datetime,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    backward: bool = False,
+    limit: int = 10,
+) -> List[History]:
+    """Получает страницу истории поиска пользователя на заданную дату.
+    Страницы выбираются по ключу (timestamp, id), поэтому запрос использует индекс
+    и не зависит от того, насколько далеко от начала дня находится страница.
+    :param user_id: Идентификатор пользователя.
+    :param date: Объект datetime.
+    :param cursor: Ключ (timestamp, id) записи, от которой нужно продолжить. None - начало дня.
+    :param backward: Выбирать записи до курсора, а не после него.
+    :param limit: Максимальное количество записей.
+    :return: Список объектов History в хронологическом порядке.
+    """
+    start_time = datetime.combine(date, datetime.min.time())
+    end_time = datetime.combine(date, datetime.max.time())
+
+    query = (
+        History.select(History, Movie)
+        .join(Movie)
+        .where(
+            History.user == user_id,
+            (History.timestamp >= start_time) & (History.timestamp <= end_time),
+        )
+    )
+    if cursor is not None:
+        timestamp, history_id = cursor
+        if backward:
+            query = query.where(
+                (History.timestamp < timestamp)
+                | ((History.timestamp == timestamp) & (History.id < history_id))
+            )
+        else:
+            query = query.where(
+                (History.timestamp > timestamp)
+                | ((History.timestamp == timestamp) & (History.id > history_id))
+            )
+
+    if backward:
+        query = query.order_by(History.timestamp.desc(), History.id.desc())
+        return list(reversed(query.limit(limit)))
+    return list(query.order_by(History.timestamp, History.id).limit(limit))
+
+
+def format_history(histories: Iterable[History]) -> Iterator[str]:
+    """Форматирует записи истории поиска для вывода.
+    :param histories: Объекты History.
+    :return: Итератор строк, по одной на каждую запись.
+    """
+    for history in histories:
+        _, history_text_part = format_movie_info(MovieRecord.from_model(history.movie))
+        history_text_part += (
+            f"\n📅Время поиска: {history.timestamp.strftime('%Y-%m-%d %H:%M')}\n"
+            f"🆔ID пользователя: {history.user_id}\n"
+            f"🔍Тип поиска: {history.search_type}\n"
+        )
+        yield history_text_part
+
+
+@traced(RENDER)
+def build_history_page(
+    user_id: int,
+    date: datetime,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    backward: bool = False,
+) -> Tuple[Optional[str], Optional[InlineKeyboardMarkup]]:
+    """Собирает одну страницу истории поиска, не превышающую лимит длины сообщения.
+    Страница разбивается только по границам записей, длина считается в кодовых единицах UTF-16.
+    :param user_id: Идентификатор пользователя.
+    :param date: Дата поиска.
+    :param cursor: Ключ (timestamp, id), от которого строится страница.
+    :param backward: Строить страницу, предшествующую курсору.
+    :return: Текст страницы и клавиатура для листания или (None, None), если записей нет.
+    """
+    limit = settings.HISTORY_PAGE_SIZE
+    histories = fetch_user_histories(user_id, date, cursor, backward, limit + 1)
+    if not histories:
+        return None, None
+
+    has_more = len(histories) > limit
+    if has_more:
+        histories = histories[1:] if backward else histories[:limit]
+    if backward:
+        histories.reverse()
+
+    header = f"История поиска за {date.strftime('%Y-%m-%d')}:\n\n"
+    length = utf16_len(header)
+    entries = []
+    shown = []
+    for history, entry in zip(histories, format_history(histories)):
+        entry += ENTRY_SEPARATOR
+        if entries and length + utf16_len(entry) > MESSAGE_LIMIT:
+            has_more = True
+            break
+        entries.append(entry)
+        shown.append(history)
+        length += utf16_len(entry)
+
+    if backward:
+        entries.reverse()
+        shown.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = cursor is not None, has_more
+
+    keyboard = get_history_keyboard(
+        date,
+        get_cursor(shown[0]) if has_prev else None,
+        get_cursor(shown[-1]) if has_next else None,
+    )
+    return header + "".join(entries), keyboard
+
+
+def get_cursor(history: History) -> str:
+    """Кодирует ключ записи истории для данных кнопки.
+    :param history: Объект History.
+    :return: Строка вида "<время>:<id>".
+    """
+    return f"{history.timestamp.strftime(CURSOR_FORMAT)}:{history.id}"
@@ -0,0 +1,41 @@
+import logging
+
+from telebot.types import InlineQuery
+
+from loader import bot
+from config_data.config import settings
+from handlers.inline_results import build_inline_results
+from utils.debounce import Debouncer
+
+debouncer = Debouncer(
+    delay=settings.INLINE_DEBOUNCE, workers=settings.INLINE_WORKERS, name="inline"
+)
+
+
+@bot.inline_handler(func=lambda query: True)
+def process_inline_query(query: InlineQuery) -> None:
+    """Обработчик inline-запроса: подсказывает фильмы по вводимому названию.
+    Запрос обрабатывается сразу (или через INLINE_DEBOUNCE секунд, если задержка задана).
+    Пока готовится ответ на предыдущий запрос пользователя, новый ждет, а запросы, которые
+    пользователь успел дополнить, отбрасываются.
+    :param query: Объект InlineQuery.
+    :return: None
+    """
+    debouncer.submit(query.from_user.id, lambda: answer_inline_query(query))
+
+
+def answer_inline_query(query: InlineQuery) -> None:
+    """Отвечает на inline-запрос подсказками из локального индекса названий.
+    :param query: Объект InlineQuery.
+    :return: None
+    """
+    results, next_offset = build_inline_results(query.query, query.offset)
+    try:
+        bot.answer_inline_query(
+            query.id,
+            results,
+            cache_time=settings.INLINE_CACHE_TIME,
+            next_offset=next_offset,
+        )
+    except Exception as err:
+        logging.warning(f"Не удалось ответить на inline-запрос {query.id}: {err}")
@@ -0,0 +1,42 @@
+from typing import List, Tuple
+
+from telebot.types import InlineQueryResultArticle, InputTextMessageContent
+
+from config_data.config import settings
+from database.title_index import suggestions
+from API.kinopoisk import format_movie_info
+from API.movie import MovieRecord
+
+
+def build_inline_results(
+    query: str, offset: str
+) -> Tuple[List[InlineQueryResultArticle], str]:
+    """Подбирает подсказки для inline-запроса из локального индекса названий.
+    :param query: Текст inline-запроса.
+    :param offset: Смещение, переданное Telegram при прокрутке результатов.
+    :return Tuple[List[InlineQueryResultArticle], str]: Результаты и смещение следующей порции
+    или пустая строка, если результатов больше нет.
+    """
+    start = int(offset) if offset.isdigit() else 0
+    movies = suggestions.suggest(query)
+    page = movies[start : start + settings.INLINE_RESULTS]
+    end = start + len(page)
+    next_offset = str(end) if end < len(movies) else ""
+    return [build_article(movie) for movie in page], next_offset
+
+
+def build_article(movie: MovieRecord) -> InlineQueryResultArticle:
+    """Создает результат inline-запроса для фильма.
+    :param movie: Фильм.
+    :return InlineQueryResultArticle: Результат со ссылкой на постер и описанием фильма.
+    """
+    poster_url, caption = format_movie_info(movie)
+    return InlineQueryResultArticle(
+        id=str(movie.id),
+        title=f"{movie.name} ({movie.year})" if movie.year else movie.name,
+        description=" • ".join(
+            str(part) for part in (movie.rating, ", ".join(movie.genres)) if part
+        ),
+        input_message_content=InputTextMessageContent(caption),
+        thumbnail_url=poster_url,
+    )
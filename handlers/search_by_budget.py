@@ -1,7 +1,7 @@
 from loader import bot
 from telebot.types import Message
 from API.site_api import search_by_budget
-from handlers.handlers import send_movies_page
+from handlers.handlers import api_guard, send_movies_page
 from states.movies_information import SearchMovie
 from keyboards.reply.buttons import get_main_menu_keyboard
 
@@ -31,6 +31,7 @@ def command_search_by_budget(message: Message) -> None:
 
 
 @bot.message_handler(state=SearchMovie.number_of_results)
+@api_guard
 def process_search_by_budget(message: Message) -> None:
     """"""
     if not message.text.isdigit():
@@ -50,7 +51,6 @@ def process_search_by_budget(message: Message) -> None:
 
     with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
         data["count_movies"] = count
-        data["current_page"] = 1
         sort_types = {"/search_by_low_budget": 1, "/search_by_high_budget": -1}
         data["sort_type"] = sort_types.get(data.get("sort_command"))
 
@@ -64,4 +64,6 @@ def process_search_by_budget(message: Message) -> None:
             data["sort_type"],
         )
         data["search_type"] = "budget"
-        send_movies_page(message.from_user.id, movies, data["search_type"], page=1)
\ No newline at end of file
+        send_movies_page(
+            message.from_user.id, movies, data["search_type"], page=1, search_data=data
+        )
\ No newline at end of file
@@ -1,7 +1,8 @@
 from loader import bot
 from telebot.types import Message
 from API.site_api import search_by_name
-from handlers.handlers import send_movies_page
+from handlers.handlers import api_guard, send_movies_page
+from API.movie import MovieRecord
 from states.movies_information import SearchMovie
 from keyboards.reply.buttons import get_main_menu_keyboard
 
@@ -22,14 +23,17 @@ def command_search_by_name(message: Message):
 
 
 @bot.message_handler(state=SearchMovie.movie_name)
+@api_guard
 def process_search_by_name(message: Message) -> None:
     """Обработчик ввода названия фильма для поиска.
     :param message: Сообщение с названием фильма.
     :return: None
     """
+    movies, offsets = search_by_name(message.from_user.id, message.text)
     with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
         data["name"] = message.text
-    movies = search_by_name(message.from_user.id, data["name"])
+        data["name_movies"] = movies
+        data["name_offsets"] = offsets
     if not movies:
         bot.send_message(
             message.from_user.id,
@@ -47,6 +51,7 @@ def process_search_by_name(message: Message) -> None:
 
 
 @bot.message_handler(state=SearchMovie.results_per_page)
+@api_guard
 def process_search_by_name_count(message: Message) -> None:
     """Обработчик ввода количества результатов поиска.
     :param message: Сообщение с количеством результатов поиска.
@@ -71,9 +76,22 @@ def process_search_by_name_count(message: Message) -> None:
 
     with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
         data["count_movies"] = count
-        data["current_page"] = 1
-        movies = search_by_name(
-            message.from_user.id, data["name"], data["count_movies"]
-        )
+        movies = [
+            MovieRecord.from_values(movie)
+            for movie in data.pop("name_movies", [])[:count]
+        ]
+        offsets = data.pop("name_offsets", [])[:count]
+        if len(movies) < count:
+            more_movies, more_offsets = search_by_name(
+                message.from_user.id,
+                data["name"],
+                count - len(movies),
+                offsets[-1] if offsets else 0,
+            )
+            movies += more_movies
+            offsets += more_offsets
+        data["name_cursors"] = [0, offsets[-1] if offsets else 0]
         data["search_type"] = "name"
-        send_movies_page(message.from_user.id, movies, data["search_type"], page=1)
\ No newline at end of file
+        send_movies_page(
+            message.from_user.id, movies, data["search_type"], page=1, search_data=data
+        )
\ No newline at end of file
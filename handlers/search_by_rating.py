@@ -1,7 +1,7 @@
 from loader import bot
 from telebot.types import Message
 from API.site_api import search_by_rating
-from handlers.handlers import send_movies_page
+from handlers.handlers import api_guard, send_movies_page
 from states.movies_information import SearchMovie
 from keyboards.reply.buttons import (
     buttons_rating_numbers,
@@ -123,6 +123,7 @@ def process_filter_rating(message: Message) -> None:
 
 
 @bot.message_handler(state=SearchMovie.sort_by_rating_count)
+@api_guard
 def process_search_by_rating_count(message: Message) -> None:
     """Обработчик ввода количества результатов поиска.
     :param message: Сообщение, содержащее количество результатов поиска.
@@ -147,7 +148,6 @@ def process_search_by_rating_count(message: Message) -> None:
 
     with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
         data["count_movies"] = count
-        data["current_page"] = 1
         data["rating"] = f"{data['min_rating']} - {data['max_rating']}"
 
         movies = search_by_rating(
@@ -157,4 +157,6 @@ def process_search_by_rating_count(message: Message) -> None:
             data["rating"],
         )
         data["search_type"] = "rating"
-        send_movies_page(message.from_user.id, movies, data["search_type"], page=1)
\ No newline at end of file
+        send_movies_page(
+            message.from_user.id, movies, data["search_type"], page=1, search_data=data
+        )
\ No newline at end of file
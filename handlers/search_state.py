@@ -0,0 +1,101 @@
+from typing import Any, Dict, List, Tuple
+
+from API.cache import is_stale
+from API.movie import MovieRecord
+
+SEARCH_KEYS = ("search_type", "count_movies", "sort_type", "rating", "name")
+STALE_TEXT = "Кинопоиск сейчас недоступен, показаны сохраненные ранее результаты."
+
+
+def get_search_params(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Выбирает из состояния пользователя параметры текущего поиска.
+    :param data: Данные состояния пользователя.
+    :return: Словарь с параметрами поиска.
+    """
+    search = {key: data.get(key) for key in SEARCH_KEYS}
+    search["name_cursors"] = list(data.get("name_cursors") or [0])
+    return search
+
+
+def get_prefetch_key(search: Dict[str, Any], page: int) -> Tuple:
+    """Строит ключ предзагрузки из параметров поиска и номера страницы.
+    :param search: Параметры поиска.
+    :param page: Номер страницы.
+    :return: Кортеж-ключ.
+    """
+    return tuple(search.get(key) for key in SEARCH_KEYS) + (page,)
+
+
+def get_name_offset(search: Dict[str, Any], page: int) -> int:
+    """Возвращает позицию в результатах API, с которой начинается страница поиска по названию.
+    Отрицательная позиция означает позицию в результатах локального индекса названий.
+    :param search: Параметры поиска.
+    :param page: Номер страницы.
+    :return: Позиция в результатах API.
+    """
+    cursors = search["name_cursors"]
+    return cursors[page - 1] if page <= len(cursors) else cursors[-1]
+
+
+def update_name_cursors(
+    search: Dict[str, Any], page: int, offset: int, offsets: List[int]
+) -> None:
+    """Запоминает, с какой позиции в результатах API начнется следующая страница.
+    :param search: Параметры поиска.
+    :param page: Номер загруженной страницы.
+    :param offset: Позиция, с которой загружалась страница.
+    :param offsets: Позиции в результатах API сразу после каждого найденного фильма.
+    :return: None
+    """
+    search["name_cursors"] = search["name_cursors"][:page] + [
+        offsets[-1] if offsets else offset
+    ]
+
+
+def parse_page_callback(data: str) -> Tuple[str, int, int, int]:
+    """Разбирает данные кнопки листания результатов поиска.
+    :param data: Строка вида "pg:<id поиска>:<страница>:<первое сообщение>:<число сообщений>".
+    :return: Идентификатор поиска, номер страницы, идентификатор первого сообщения страницы
+    и количество ее сообщений.
+    """
+    _, query_id, page, first_message_id, messages = data.split(":")
+    return query_id, int(page), int(first_message_id), int(messages)
+
+
+def get_page_messages(messages: List[Any]) -> Tuple[int, int]:
+    """Определяет, можно ли заменить отправленную страницу на месте.
+    Страница заменяется, если все ее сообщения - постеры и идут в чате подряд.
+    :param messages: Отправленные сообщения страницы.
+    :return: Идентификатор первого сообщения и их количество или (0, 0).
+    """
+    if not messages or any(not message.photo for message in messages):
+        return 0, 0
+    first_message_id = messages[0].message_id
+    ids = [message.message_id for message in messages]
+    if ids != list(range(first_message_id, first_message_id + len(ids))):
+        return 0, 0
+    return first_message_id, len(ids)
+
+
+def get_page_text(page: int, movies: List[MovieRecord]) -> str:
+    """Возвращает текст сообщения с кнопками листания.
+    Если фильмы взяты из устаревшего кэша во время недоступности API, текст сообщает об этом.
+    :param page: Номер страницы.
+    :param movies: Фильмы страницы.
+    :return: Текст сообщения.
+    """
+    text = "Показать еще варианты?"
+    if page > 1:
+        text = f"Страница {page}. {text}"
+    if is_stale(movies):
+        text = f"{STALE_TEXT}\n{text}"
+    return text
+
+
+def has_next_page(search: Dict[str, Any], movies: List[MovieRecord]) -> bool:
+    """Проверяет, может ли у поиска быть следующая страница.
+    :param search: Параметры поиска.
+    :param movies: Фильмы текущей страницы.
+    :return: False, если страница заполнена не полностью.
+    """
+    return search["count_movies"] is None or len(movies) >= search["count_movies"]
@@ -1,13 +1,76 @@
+from datetime import datetime
+from typing import Optional
+
 from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 
-def get_pagination_keyboard() -> InlineKeyboardMarkup:
+def get_pagination_keyboard(
+    query_id: str,
+    page: int,
+    has_next: bool = True,
+    first_message_id: int = 0,
+    messages: int = 0,
+) -> Optional[InlineKeyboardMarkup]:
     """Создает клавиатуру с кнопками для навигации по страницам.
-    :return InlineKeyboardMarkup: Объект клавиатуры.
+    Кнопки содержат идентификатор поиска и номер страницы, поэтому для перехода не нужно
+    состояние пользователя. Если страница может быть заменена на месте, в кнопки также
+    записываются идентификатор первого сообщения страницы и число ее сообщений.
+    :param query_id: Идентификатор поиска.
+    :param page: Номер текущей страницы.
+    :param has_next: Есть ли следующая страница.
+    :param first_message_id: Идентификатор первого сообщения страницы.
+    :param messages: Количество сообщений страницы, 0 - страница не заменяется на месте.
+    :return Optional[InlineKeyboardMarkup]: Объект клавиатуры или None, если листать некуда.
     """
+    row = []
+    if page > 1:
+        row.append(
+            InlineKeyboardButton(
+                text="⬅️Предыдущая страница",
+                callback_data=f"pg:{query_id}:{page - 1}:{first_message_id}:{messages}",
+            )
+        )
+    if has_next:
+        row.append(
+            InlineKeyboardButton(
+                text="➡️Следующая страница",
+                callback_data=f"pg:{query_id}:{page + 1}:{first_message_id}:{messages}",
+            )
+        )
+    if not row:
+        return None
+
+    keyboard = InlineKeyboardMarkup()
+    keyboard.add(*row)
+    return keyboard
+
+
+def get_history_keyboard(
+    date: datetime, prev_cursor: Optional[str], next_cursor: Optional[str]
+) -> Optional[InlineKeyboardMarkup]:
+    """Создает клавиатуру для листания истории поиска.
+    :param date: Дата, за которую показывается история.
+    :param prev_cursor: Ключ первой записи страницы или None, если предыдущей страницы нет.
+    :param next_cursor: Ключ последней записи страницы или None, если следующей страницы нет.
+    :return Optional[InlineKeyboardMarkup]: Объект клавиатуры или None, если листать некуда.
+    """
+    day = date.strftime("%Y%m%d")
+    row = []
+    if prev_cursor is not None:
+        row.append(
+            InlineKeyboardButton(
+                text="⬅️Назад", callback_data=f"hist:p:{day}:{prev_cursor}"
+            )
+        )
+    if next_cursor is not None:
+        row.append(
+            InlineKeyboardButton(
+                text="➡️Далее", callback_data=f"hist:n:{day}:{next_cursor}"
+            )
+        )
+    if not row:
+        return None
+
     keyboard = InlineKeyboardMarkup()
-    keyboard.add(
-        InlineKeyboardButton(text="⬅️Предыдущая страница", callback_data="prev_page"),
-        InlineKeyboardButton(text="➡️Следующая страница", callback_data="next_page"),
-    )
-    return keyboard
\ No newline at end of file
+    keyboard.add(*row)
+    return keyboard
@@ -1,6 +1,80 @@
 from telebot import TeleBot
-from telebot.storage import StateMemoryStorage
 from config_data import config
+from database.state_storage import create_state_storage
+from utils.metrics import instrument_handler
+from utils.tracing import SEND, traced, tracer
+from utils.send_scheduler import SendScheduler
 
-storage = StateMemoryStorage()
-bot = TeleBot(token=config.settings.BOT_TOKEN.get_secret_value(), state_storage=storage)
+
+class ScheduledTeleBot(TeleBot):
+    """TeleBot, отправляющий сообщения через общую очередь с учетом лимитов Telegram.
+    Обработка каждого обновления трассируется по этапам.
+    """
+
+    def __init__(self, *args, scheduler: SendScheduler, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+
+    def _run_middlewares_and_handler(self, message, handlers, middlewares, update_type):
+        with tracer.update(update_type):
+            return super()._run_middlewares_and_handler(
+                message, handlers, middlewares, update_type
+            )
+
+    def add_message_handler(self, handler_dict):
+        handler_dict["function"] = instrument_handler(handler_dict["function"])
+        super().add_message_handler(handler_dict)
+
+    def add_callback_query_handler(self, handler_dict):
+        handler_dict["function"] = instrument_handler(handler_dict["function"])
+        super().add_callback_query_handler(handler_dict)
+
+    def add_inline_handler(self, handler_dict):
+        handler_dict["function"] = instrument_handler(handler_dict["function"])
+        super().add_inline_handler(handler_dict)
+
+    @traced(SEND)
+    def send_message(self, chat_id, *args, **kwargs):
+        return self.scheduler.call(chat_id, super().send_message, chat_id, *args, **kwargs)
+
+    @traced(SEND)
+    def send_photo(self, chat_id, *args, **kwargs):
+        return self.scheduler.call(chat_id, super().send_photo, chat_id, *args, **kwargs)
+
+    @traced(SEND)
+    def send_media_group(self, chat_id, *args, **kwargs):
+        return self.scheduler.call(
+            chat_id, super().send_media_group, chat_id, *args, **kwargs
+        )
+
+    @traced(SEND)
+    def edit_message_text(self, text, chat_id=None, *args, **kwargs):
+        if chat_id is None:
+            return super().edit_message_text(text, chat_id, *args, **kwargs)
+        return self.scheduler.call(
+            chat_id, super().edit_message_text, text, chat_id, *args, **kwargs
+        )
+
+    @traced(SEND)
+    def edit_message_media(self, media, chat_id=None, *args, **kwargs):
+        if chat_id is None:
+            return super().edit_message_media(media, chat_id, *args, **kwargs)
+        return self.scheduler.call(
+            chat_id, super().edit_message_media, media, chat_id, *args, **kwargs
+        )
+
+
+scheduler = SendScheduler(
+    global_rate=config.settings.SEND_GLOBAL_RATE,
+    per_chat_rate=config.settings.SEND_PER_CHAT_RATE,
+    per_chat_burst=config.settings.SEND_PER_CHAT_BURST,
+    workers=config.settings.SEND_WORKERS,
+    max_retries=config.settings.SEND_MAX_RETRIES,
+)
+storage = create_state_storage()
+bot = ScheduledTeleBot(
+    token=config.settings.BOT_TOKEN.get_secret_value(),
+    state_storage=storage,
+    scheduler=scheduler,
+    num_threads=config.settings.BOT_WORKERS,
+)
@@ -1,21 +1,125 @@
 import logging
-from loader import bot
+from loader import bot, scheduler, storage
 from telebot.custom_filters import StateFilter
-from handlers.handlers import set_default_commands
+from handlers.handlers import set_default_commands, prefetcher
 from handlers.search_by_budget import command_search_by_budget
 from handlers.search_by_name import command_search_by_name
 from handlers.search_by_rating import command_search_by_rating
 from handlers.history import command_history
+from handlers.inline import process_inline_query
 from database.model import db
+from config_data.config import settings
+from utils.webhook import run_webhook
+from utils.metrics import registry, start_metrics_server
+from utils.tracing import tracer
+from utils.sharding import Supervisor, serve_shard
+from API.client import close_session
+from API.site_api import history_writer
+from API.catalog_sync import catalog_sync
+from API.quota import quota
+from API.circuit_breaker import CLOSED, breaker
 
 
 logging.basicConfig(level=logging.INFO)
 logging.info("Запуск бота")
 
+
+def shutdown() -> None:
+    """Останавливает фоновые потоки и освобождает ресурсы бота.
+    :return: None
+    """
+    prefetcher.shutdown()
+    catalog_sync.stop()
+    history_writer.stop()
+    scheduler.shutdown()
+    if hasattr(storage, "close"):
+        storage.close()
+    close_session()
+
+
+def start_metrics(port: int) -> None:
+    """Регистрирует показатели состояния процесса и запускает HTTP-сервер метрик.
+    :param port: Порт сервера; 0 отключает сервер.
+    :return: None
+    """
+    registry.gauge(
+        "kinopoisk_quota_remaining",
+        "Остаток дневного лимита запросов к API Кинопоиска",
+        quota.remaining,
+    )
+    registry.gauge(
+        "kinopoisk_breaker_open",
+        "Предохранитель API разомкнут (1) или замкнут (0)",
+        lambda: breaker.state != CLOSED,
+    )
+    registry.gauge(
+        "history_queue_depth",
+        "Строки истории, ожидающие записи в БД",
+        history_writer.queue_depth,
+    )
+    registry.gauge(
+        "send_queue_depth",
+        "Сообщения, ожидающие отправки в Telegram",
+        scheduler.queue_depth,
+    )
+    start_metrics_server(settings.METRICS_HOST, port)
+
+
+def run_shard(index: int, updates, health) -> None:
+    """Точка входа рабочего процесса в режиме sharded.
+    :param index: Номер рабочего процесса.
+    :param updates: Очередь обновлений от супервизора.
+    :param health: Общий с супервизором массив состояния процесса.
+    :return: None
+    """
+    logging.info(f"Рабочий процесс {index} готов к обработке обновлений")
+    try:
+        if settings.METRICS_PORT:
+            start_metrics(settings.METRICS_PORT + 1 + index)
+        bot.add_custom_filter(StateFilter(bot))
+        serve_shard(bot, updates, health, lanes=settings.BOT_WORKERS)
+    finally:
+        shutdown()
+
+
 if __name__ == "__main__":
     try:
         bot.add_custom_filter(StateFilter(bot))
         set_default_commands(bot)
-        bot.infinity_polling(none_stop=True)
+        start_metrics(settings.METRICS_PORT)
+        if settings.CATALOG_MIRROR:
+            catalog_sync.start()
+        if settings.BOT_MODE == "sharded":
+            Supervisor(
+                token=settings.BOT_TOKEN.get_secret_value(),
+                target=run_shard,
+                workers=settings.SHARD_WORKERS,
+                health_timeout=settings.SHARD_HEALTH_TIMEOUT,
+                health_interval=settings.SHARD_HEALTH_INTERVAL,
+                env={
+                    "SEND_GLOBAL_RATE": str(
+                        settings.SEND_GLOBAL_RATE / settings.SHARD_WORKERS
+                    )
+                },
+            ).run()
+        elif settings.BOT_MODE == "webhook":
+            run_webhook(
+                bot,
+                url=settings.WEBHOOK_URL,
+                host=settings.WEBHOOK_HOST,
+                port=settings.WEBHOOK_PORT,
+                path=settings.WEBHOOK_PATH,
+                secret_token=settings.WEBHOOK_SECRET.get_secret_value() or None,
+                test_mode=settings.WEBHOOK_TEST_MODE,
+                stats_providers={
+                    "quota": quota.stats,
+                    "breaker": breaker.stats,
+                    "tracing": tracer.stats,
+                },
+            )
+        else:
+            bot.infinity_polling(none_stop=True)
     except Exception as e:
         logging.error(f"Ошибка при запуске бота: {e}")
+    finally:
+        shutdown()
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from async_loader import bot, scheduler, storage
+from telebot.asyncio_filters import StateFilter
+from async_handlers.handlers import set_default_commands
+from async_handlers.search_by_budget import command_search_by_budget
+from async_handlers.search_by_name import command_search_by_name
+from async_handlers.search_by_rating import command_search_by_rating
+from async_handlers.history import command_history
+from async_handlers.inline import process_inline_query
+from API.async_site_api import close_session
+from API.kinopoisk import history_writer
+from API.catalog_sync import catalog_sync
+from API.quota import quota
+from API.circuit_breaker import CLOSED, breaker
+from config_data.config import settings
+from utils.metrics import registry, start_metrics_server
+
+
+logging.info("Запуск бота в асинхронном режиме")
+
+
+def start_metrics() -> None:
+    """Регистрирует показатели состояния процесса и запускает HTTP-сервер метрик.
+    :return: None
+    """
+    registry.gauge(
+        "kinopoisk_quota_remaining",
+        "Остаток дневного лимита запросов к API Кинопоиска",
+        quota.remaining,
+    )
+    registry.gauge(
+        "kinopoisk_breaker_open",
+        "Предохранитель API разомкнут (1) или замкнут (0)",
+        lambda: breaker.state != CLOSED,
+    )
+    registry.gauge(
+        "history_queue_depth",
+        "Строки истории, ожидающие записи в БД",
+        history_writer.queue_depth,
+    )
+    registry.gauge(
+        "send_queue_depth",
+        "Сообщения, ожидающие отправки в Telegram",
+        scheduler.queue_depth,
+    )
+    start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+
+
+async def main() -> None:
+    """Запускает бота на AsyncTeleBot и освобождает ресурсы после остановки.
+    :return: None
+    """
+    try:
+        bot.add_custom_filter(StateFilter(bot))
+        await set_default_commands(bot)
+        start_metrics()
+        if settings.CATALOG_MIRROR:
+            catalog_sync.start()
+        await bot.infinity_polling()
+    except Exception as e:
+        logging.error(f"Ошибка при запуске бота: {e}")
+    finally:
+        await close_session()
+        await bot.close_session()
+        if hasattr(storage, "close"):
+            storage.close()
+        catalog_sync.stop()
+        history_writer.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
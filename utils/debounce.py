@@ -0,0 +1,79 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Set, Tuple
+
+
+class Debouncer:
+    """Выполняет задачи по ключам, пропуская те, которые успела заменить более новая.
+    Задача выполняется через delay секунд (при delay=0 сразу) в пуле из workers потоков.
+    По каждому ключу одновременно выполняется одна задача: пришедшая в это время ждет ее
+    завершения, а если до этого по ключу пришла еще одна, ожидающая отбрасывается.
+    """
+
+    def __init__(self, delay: float, workers: int, name: str = "debouncer") -> None:
+        self.delay = delay
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix=name)
+        self.dropped = 0
+        self._latest: Dict[Hashable, int] = {}
+        self._tasks: Dict[int, Callable[[], None]] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._running: Set[Hashable] = set()
+        self._waiting: Dict[Hashable, Callable[[], None]] = {}
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, key: Hashable, fn: Callable[[], None]) -> None:
+        """Планирует выполнение задачи через delay секунд, отменяя невыполненную по этому ключу.
+        :param key: Ключ, например идентификатор пользователя.
+        :param fn: Задача без аргументов.
+        :return None
+        """
+        with self._condition:
+            previous = self._latest.get(key)
+            if previous is not None and self._tasks.pop(previous, None) is not None:
+                self.dropped += 1
+            if self._waiting.pop(key, None) is not None:
+                self.dropped += 1
+            seq = next(self._seq)
+            self._latest[key] = seq
+            self._tasks[seq] = fn
+            heapq.heappush(self._heap, (time.monotonic() + self.delay, seq, key))
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = (
+                        self._heap[0][0] - time.monotonic() if self._heap else None
+                    )
+                    self._condition.wait(timeout)
+                _, seq, key = heapq.heappop(self._heap)
+                fn = self._tasks.pop(seq, None)
+                if self._latest.get(key) == seq:
+                    del self._latest[key]
+                if fn is None:
+                    continue
+                if key in self._running:
+                    self._waiting[key] = fn
+                    continue
+                self._running.add(key)
+            self._executor.submit(self._call, key, fn)
+
+    def _call(self, key: Hashable, fn: Callable[[], None]) -> None:
+        while True:
+            try:
+                fn()
+            except Exception as err:
+                logging.error(f"Ошибка при выполнении отложенной задачи: {err}")
+            with self._condition:
+                fn = self._waiting.pop(key, None)
+                if fn is None:
+                    self._running.discard(key)
+                    return
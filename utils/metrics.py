@@ -0,0 +1,315 @@
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.tracing import set_handler
+
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Форматирует метки образца в формате Prometheus.
+    :param names: Имена меток.
+    :param values: Значения меток.
+    :return str: Строка вида {name="value",...} или пустая строка.
+    """
+    if not names:
+        return ""
+    pairs = (f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    """Счетчик, который только увеличивается, с набором меток."""
+
+    kind = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        """Увеличивает счетчик.
+        :param labelvalues: Значения меток в порядке labelnames.
+        :param amount: Величина увеличения.
+        :return None
+        """
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        """Возвращает строки образцов для вывода.
+        :return List[str]: Образцы в текстовом формате.
+        """
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{format_labels(self.labelnames, labels)} {value:g}"
+            for labels, value in values
+        ]
+
+
+class Histogram:
+    """Гистограмма длительностей с накопительными корзинами, суммой и количеством."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """Учитывает одно наблюдение.
+        :param value: Значение, например длительность в секундах.
+        :param labelvalues: Значения меток в порядке labelnames.
+        :return None
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labelvalues)
+            if counts is None:
+                # Корзины, затем +Inf, сумма и количество.
+                counts = self._values[labelvalues] = [0.0] * (len(self.buckets) + 3)
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def collect(self) -> List[str]:
+        """Возвращает строки образцов для вывода.
+        :return List[str]: Образцы в текстовом формате.
+        """
+        with self._lock:
+            values = [(labels, list(counts)) for labels, counts in self._values.items()]
+        lines = []
+        names = self.labelnames + ("le",)
+        for labels, counts in values:
+            total = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                total += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(
+                    f"{self.name}_bucket{format_labels(names, labels + (le,))} {total:g}"
+                )
+            suffix = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {counts[-2]:g}")
+            lines.append(f"{self.name}_count{suffix} {counts[-1]:g}")
+        return lines
+
+
+class Gauge:
+    """Показатель, значение которого вычисляется функцией при каждом чтении метрик."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], float]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+
+    def collect(self) -> List[str]:
+        """Возвращает строку образца для вывода.
+        :return List[str]: Образец в текстовом формате.
+        """
+        return [f"{self.name} {float(self.fn()):g}"]
+
+
+class Registry:
+    """Набор метрик процесса, выводимый в текстовом формате Prometheus."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()
+    ) -> Counter:
+        """Создает и регистрирует счетчик.
+        :param name: Имя метрики.
+        :param documentation: Описание метрики.
+        :param labelnames: Имена меток.
+        :return Counter: Счетчик.
+        """
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Создает и регистрирует гистограмму.
+        :param name: Имя метрики.
+        :param documentation: Описание метрики.
+        :param labelnames: Имена меток.
+        :param buckets: Верхние границы корзин.
+        :return Histogram: Гистограмма.
+        """
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, fn: Callable[[], float]) -> Gauge:
+        """Создает и регистрирует показатель, вычисляемый функцией.
+        Повторная регистрация с тем же именем заменяет функцию.
+        :param name: Имя метрики.
+        :param documentation: Описание метрики.
+        :param fn: Функция, возвращающая текущее значение.
+        :return Gauge: Показатель.
+        """
+        gauge = Gauge(name, documentation, fn)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        """Выводит все метрики в текстовом формате Prometheus.
+        :return str: Текст для ответа на GET /metrics.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.collect()
+            except Exception as err:
+                logging.error(f"Ошибка при получении метрики {metric.name}: {err}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+registry = Registry()
+
+handler_latency = registry.histogram(
+    "bot_handler_seconds", "Время обработки обновления обработчиком", ("handler",)
+)
+handler_errors = registry.counter(
+    "bot_handler_errors_total", "Исключения в обработчиках обновлений", ("handler",)
+)
+telegram_latency = registry.histogram(
+    "telegram_request_seconds", "Длительность запросов к Bot API", ("method",)
+)
+telegram_requests = registry.counter(
+    "telegram_requests_total", "Запросы к Bot API по результату", ("method", "result")
+)
+
+
+def instrument_handler(handler: Callable) -> Callable:
+    """Оборачивает обработчик телеграм бота, измеряя время его работы и считая исключения.
+    Подходит и для обычных функций, и для корутин; сигнатура обработчика сохраняется,
+    поэтому telebot передает ему те же аргументы.
+    Имя обработчика записывается в трассировку текущего обновления.
+    :param handler: Обработчик.
+    :return Callable: Обработчик с измерением времени.
+    """
+    name = handler.__name__
+
+    if inspect.iscoroutinefunction(handler):
+
+        @functools.wraps(handler)
+        async def async_wrapper(*args, **kwargs):
+            set_handler(name)
+            started = time.perf_counter()
+            try:
+                return await handler(*args, **kwargs)
+            except Exception:
+                handler_errors.inc(name)
+                raise
+            finally:
+                handler_latency.observe(time.perf_counter() - started, name)
+
+        return async_wrapper
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        set_handler(name)
+        started = time.perf_counter()
+        try:
+            return handler(*args, **kwargs)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_latency.observe(time.perf_counter() - started, name)
+
+    return wrapper
+
+
+def observe_telegram_request(method: str, started: float, result: str) -> None:
+    """Учитывает запрос к Bot API.
+    :param method: Имя метода, например send_photo.
+    :param started: Время начала запроса по time.perf_counter().
+    :param result: Результат: ok, retry или error.
+    :return None
+    """
+    telegram_latency.observe(time.perf_counter() - started, method)
+    telegram_requests.inc(method, result)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Отдает метрики по GET /metrics."""
+
+    def do_GET(self) -> None:
+        if self.path != METRICS_PATH:
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug(f"Метрики {self.client_address[0]}: {format % args}")
+
+
+def start_metrics_server(host: str, port: int) -> Optional[ThreadingHTTPServer]:
+    """Запускает HTTP-сервер метрик в фоновом потоке.
+    :param host: Адрес, на котором слушает сервер.
+    :param port: Порт сервера; 0 отключает сервер.
+    :return Optional[ThreadingHTTPServer]: Запущенный сервер или None, если он отключен.
+    """
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    logging.info(f"Метрики доступны на http://{host}:{port}{METRICS_PATH}")
+    return server
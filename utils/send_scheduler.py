@@ -0,0 +1,467 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from telebot import asyncio_helper
+from telebot.apihelper import ApiTelegramException
+
+from utils.metrics import observe_telegram_request
+
+
+INTERACTIVE = 0
+BULK = 1
+IDLE_SWEEP_INTERVAL = 60.0
+
+_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def send_priority(priority: int) -> Iterator[None]:
+    """Задает приоритет отправок, выполняемых в текущем потоке или задаче asyncio
+    внутри блока with.
+    :param priority: INTERACTIVE или BULK.
+    :return Iterator[None]
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    """Возвращает приоритет отправок текущего потока или задачи asyncio.
+    :return int: INTERACTIVE или BULK.
+    """
+    return _priority.get()
+
+
+class TokenBucket:
+    """Ведро токенов: не больше capacity запросов подряд и rate запросов в секунду в среднем."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self, now: float) -> float:
+        """Возвращает время в секундах, через которое появится токен.
+        :param now: Текущее время по time.monotonic().
+        :return float: 0, если токен доступен сейчас.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class _Job:
+    __slots__ = ("priority", "fn", "args", "kwargs", "future", "enqueued_at", "attempts")
+
+    def __init__(
+        self, priority: int, fn: Callable, args: Tuple, kwargs: Dict[str, Any]
+    ) -> None:
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class SendScheduler:
+    """Центральная очередь исходящих запросов к Bot API.
+    Соблюдает общий лимит запросов в секунду и темп отправки в каждый чат, сохраняет порядок
+    сообщений внутри чата, обслуживает интерактивные ответы раньше массовых отправок и
+    повторяет запросы, получившие ответ 429, после указанного Telegram retry_after.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        per_chat_rate: float,
+        per_chat_burst: float,
+        workers: int,
+        max_retries: int,
+    ) -> None:
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._dispatched = 0
+        self._last_sweep = time.monotonic()
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._chats: Dict[int, Deque[_Job]] = {}
+        self._ready: List[Tuple[int, int, int]] = []
+        self._delayed: List[Tuple[float, int, int, int]] = []
+        self._seq = itertools.count()
+        self._pending = 0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._workers = [
+            threading.Thread(target=self._run, name=f"sender-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, chat_id: int, fn: Callable, *args, **kwargs) -> Future:
+        """Ставит запрос к Bot API в очередь чата.
+        :param chat_id: Идентификатор чата, в который выполняется отправка.
+        :param fn: Функция, выполняющая запрос.
+        :return Future: Результат запроса.
+        """
+        job = _Job(current_priority(), fn, args, kwargs)
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("Очередь отправки остановлена")
+            queue = self._chats.get(chat_id)
+            if queue is None:
+                self._chats[chat_id] = deque([job])
+                heapq.heappush(self._ready, (job.priority, next(self._seq), chat_id))
+            else:
+                queue.append(job)
+            self._pending += 1
+            self._cond.notify()
+        return job.future
+
+    def call(self, chat_id: int, fn: Callable, *args, **kwargs) -> Any:
+        """Ставит запрос в очередь и дожидается его результата.
+        :param chat_id: Идентификатор чата, в который выполняется отправка.
+        :param fn: Функция, выполняющая запрос.
+        :return Any: Результат функции.
+        """
+        return self.submit(chat_id, fn, *args, **kwargs).result()
+
+    def queue_depth(self) -> int:
+        """Возвращает число запросов, ожидающих отправки.
+        :return int: Размер очереди.
+        """
+        with self._cond:
+            return self._pending
+
+    def stats(self) -> Dict[str, float]:
+        """Возвращает метрики очереди отправки.
+        :return Dict[str, float]: Глубина очереди, число отправок, повторов, ошибок и время ожидания.
+        """
+        with self._cond:
+            return {
+                "queue_depth": self._pending,
+                "active_chats": len(self._chats),
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+                "wait_avg": (
+                    self.wait_total / self._dispatched if self._dispatched else 0.0
+                ),
+                "wait_max": self.wait_max,
+            }
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Останавливает очередь, дождавшись отправки уже поставленных запросов.
+        :param timeout: Максимальное время ожидания в секундах.
+        :return None
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                taken = self._take()
+                if taken is None:
+                    return
+            chat_id, job = taken
+            self._execute(chat_id, job)
+
+    def _take(self) -> Optional[Tuple[int, _Job]]:
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, seq, priority, chat_id = heapq.heappop(self._delayed)
+                heapq.heappush(self._ready, (priority, seq, chat_id))
+
+            if self._ready:
+                priority, seq, chat_id = heapq.heappop(self._ready)
+                bucket = self._chat_buckets.get(chat_id)
+                if bucket is None:
+                    bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+                    self._chat_buckets[chat_id] = bucket
+                delay = max(bucket.delay(now), self._global_bucket.delay(now))
+                if delay > 0:
+                    heapq.heappush(self._delayed, (now + delay, seq, priority, chat_id))
+                    continue
+                bucket.consume()
+                self._global_bucket.consume()
+                job = self._chats[chat_id].popleft()
+                wait = now - job.enqueued_at
+                self._dispatched += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+                return chat_id, job
+
+            if self._stopping and self._pending == 0:
+                self._cond.notify_all()
+                return None
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            self._cond.wait(timeout)
+
+    def _execute(self, chat_id: int, job: _Job) -> None:
+        retry_after = None
+        method = getattr(job.fn, "__name__", "call")
+        started = time.perf_counter()
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except ApiTelegramException as err:
+            retry_after = self._get_retry_after(err)
+            if retry_after is None or job.attempts >= self.max_retries:
+                job.future.set_exception(err)
+                observe_telegram_request(method, started, "error")
+            else:
+                observe_telegram_request(method, started, "retry")
+        except Exception as err:
+            job.future.set_exception(err)
+            observe_telegram_request(method, started, "error")
+        else:
+            job.future.set_result(result)
+            observe_telegram_request(method, started, "ok")
+
+        with self._cond:
+            if retry_after is not None and job.attempts < self.max_retries:
+                job.attempts += 1
+                self.retried += 1
+                logging.warning(
+                    f"Превышен лимит отправки в чат {chat_id}, повтор через {retry_after} с."
+                )
+                self._chats[chat_id].appendleft(job)
+                heapq.heappush(
+                    self._delayed,
+                    (time.monotonic() + retry_after, next(self._seq), job.priority, chat_id),
+                )
+            else:
+                self._pending -= 1
+                if job.future.exception() is None:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                queue = self._chats[chat_id]
+                if queue:
+                    heapq.heappush(
+                        self._ready, (queue[0].priority, next(self._seq), chat_id)
+                    )
+                else:
+                    del self._chats[chat_id]
+                    self._evict_idle_buckets()
+            self._cond.notify_all()
+
+    def _evict_idle_buckets(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < IDLE_SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        idle = [
+            chat_id
+            for chat_id, bucket in self._chat_buckets.items()
+            if chat_id not in self._chats and bucket.is_full(now)
+        ]
+        for chat_id in idle:
+            del self._chat_buckets[chat_id]
+
+    @staticmethod
+    def _get_retry_after(err: ApiTelegramException) -> Optional[float]:
+        return get_retry_after(err)
+
+
+def get_retry_after(err: Exception) -> Optional[float]:
+    """Возвращает время, через которое Telegram разрешает повторить запрос после ответа 429.
+    :param err: Исключение Bot API.
+    :return Optional[float]: Время в секундах или None, если запрос не нужно повторять.
+    """
+    if getattr(err, "error_code", None) != 429:
+        return None
+    parameters = (err.result_json or {}).get("parameters") or {}
+    return float(parameters.get("retry_after", 1))
+
+
+class AsyncSendScheduler:
+    """Очередь исходящих запросов к Bot API для AsyncTeleBot с теми же правилами, что
+    у SendScheduler: общий лимит запросов в секунду, темп и порядок отправки в каждый чат,
+    приоритет интерактивных ответов и повтор запросов после retry_after ответа 429.
+    Запрос выполняется в задаче, которая его отправила, поэтому отдельные рабочие потоки
+    не нужны.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        per_chat_rate: float,
+        per_chat_burst: float,
+        max_retries: int,
+    ) -> None:
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._dispatched = 0
+        self._pending = 0
+        self._last_sweep = time.monotonic()
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        # Блокировка чата и число запросов, которые ее ждут или держат.
+        self._chats: Dict[int, List[Any]] = {}
+        self._waiting: List[Tuple[int, int]] = []
+        self._changed = asyncio.Event()
+        self._seq = itertools.count()
+
+    async def call(self, chat_id: int, fn: Callable, *args, **kwargs) -> Any:
+        """Дожидается очереди чата и общего лимита и выполняет запрос.
+        :param chat_id: Идентификатор чата, в который выполняется отправка.
+        :param fn: Корутинная функция, выполняющая запрос.
+        :return Any: Результат функции.
+        """
+        priority = current_priority()
+        enqueued_at = time.monotonic()
+        chat = self._chats.setdefault(chat_id, [asyncio.Lock(), 0])
+        chat[1] += 1
+        self._pending += 1
+        try:
+            async with chat[0]:
+                attempts = 0
+                while True:
+                    await self._acquire(chat_id, priority)
+                    if attempts == 0:
+                        wait = time.monotonic() - enqueued_at
+                        self._dispatched += 1
+                        self.wait_total += wait
+                        self.wait_max = max(self.wait_max, wait)
+                    result, retry_after = await self._execute(fn, args, kwargs, attempts)
+                    if retry_after is None:
+                        return result
+                    attempts += 1
+                    self.retried += 1
+                    logging.warning(
+                        f"Превышен лимит отправки в чат {chat_id}, повтор через {retry_after} с."
+                    )
+                    await asyncio.sleep(retry_after)
+        finally:
+            self._pending -= 1
+            chat[1] -= 1
+            if chat[1] == 0:
+                del self._chats[chat_id]
+                self._evict_idle_buckets()
+
+    def queue_depth(self) -> int:
+        """Возвращает число запросов, ожидающих отправки.
+        :return int: Размер очереди.
+        """
+        return self._pending
+
+    def stats(self) -> Dict[str, float]:
+        """Возвращает метрики очереди отправки.
+        :return Dict[str, float]: Глубина очереди, число отправок, повторов, ошибок и время ожидания.
+        """
+        return {
+            "queue_depth": self._pending,
+            "active_chats": len(self._chats),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "wait_avg": self.wait_total / self._dispatched if self._dispatched else 0.0,
+            "wait_max": self.wait_max,
+        }
+
+    async def _execute(
+        self, fn: Callable, args: Tuple, kwargs: Dict[str, Any], attempts: int
+    ) -> Tuple[Any, Optional[float]]:
+        method = getattr(fn, "__name__", "call")
+        started = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio_helper.ApiTelegramException as err:
+            retry_after = get_retry_after(err)
+            if retry_after is None or attempts >= self.max_retries:
+                self.failed += 1
+                observe_telegram_request(method, started, "error")
+                raise
+            observe_telegram_request(method, started, "retry")
+            return None, retry_after
+        except Exception:
+            self.failed += 1
+            observe_telegram_request(method, started, "error")
+            raise
+        self.sent += 1
+        observe_telegram_request(method, started, "ok")
+        return result, None
+
+    async def _acquire(self, chat_id: int, priority: int) -> None:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        delay = bucket.delay(time.monotonic())
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = bucket.delay(time.monotonic())
+
+        # Общий лимит достается запросам по приоритету, затем по порядку поступления.
+        entry = (priority, next(self._seq))
+        heapq.heappush(self._waiting, entry)
+        try:
+            while True:
+                if self._waiting[0] == entry:
+                    delay = self._global_bucket.delay(time.monotonic())
+                    if delay <= 0:
+                        self._global_bucket.consume()
+                        bucket.consume()
+                        return
+                    await asyncio.sleep(delay)
+                else:
+                    await self._changed.wait()
+        finally:
+            self._waiting.remove(entry)
+            heapq.heapify(self._waiting)
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    def _evict_idle_buckets(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < IDLE_SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        idle = [
+            chat_id
+            for chat_id, bucket in self._chat_buckets.items()
+            if chat_id not in self._chats and bucket.is_full(now)
+        ]
+        for chat_id in idle:
+            del self._chat_buckets[chat_id]
@@ -0,0 +1,296 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from telebot import TeleBot, apihelper
+from telebot.types import Update
+
+POLL_TIMEOUT = 20
+QUEUE_POLL_INTERVAL = 1.0
+DRAIN_TIMEOUT = 0.1
+# Ячейки общего массива состояния рабочего процесса.
+HEARTBEAT = 0
+HANDLED = 1
+
+
+def get_update_user_id(update: Dict[str, Any]) -> int:
+    """Находит идентификатор пользователя в необработанном обновлении Telegram.
+    :param update: Обновление в виде словаря из ответа getUpdates.
+    :return int: Идентификатор пользователя, чата или 0, если его нет.
+    """
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        if isinstance(value.get("from"), dict):
+            return value["from"]["id"]
+        if isinstance(value.get("user"), dict):
+            return value["user"]["id"]
+        if isinstance(value.get("chat"), dict):
+            return value["chat"]["id"]
+    return 0
+
+
+def get_shard(user_id: int, shards: int) -> int:
+    """Возвращает номер обработчика, за которым закреплен пользователь.
+    :param user_id: Идентификатор пользователя.
+    :param shards: Количество обработчиков.
+    :return int: Номер обработчика.
+    """
+    return user_id % shards
+
+
+def serve_shard(
+    bot: TeleBot,
+    updates: multiprocessing.Queue,
+    health: Any,
+    lanes: int,
+) -> None:
+    """Обрабатывает обновления, присланные рабочему процессу супервизором.
+    Обновления одного пользователя выполняются в одном потоке по порядку поступления,
+    разные пользователи распределяются между lanes потоками.
+    В health[HEARTBEAT] записывается время начала самого старого обрабатываемого обновления,
+    а если потоки обработки свободны, текущее время. Так супервизор замечает и зависший
+    процесс, и поток, который застрял на одном обновлении. В health[HANDLED] считаются
+    обработанные обновления.
+    :param bot: Телеграм бот рабочего процесса.
+    :param updates: Очередь необработанных обновлений от супервизора.
+    :param health: Общий с супервизором массив состояния процесса.
+    :param lanes: Количество потоков обработки.
+    :return None
+    """
+    bot.threaded = False
+    lane_queues: List[queue.Queue] = [queue.Queue() for _ in range(lanes)]
+    # Время начала обновления, которое сейчас обрабатывает поток, или None.
+    in_flight: List[Optional[float]] = [None] * lanes
+    handled_lock = threading.Lock()
+
+    def lane_loop(index: int) -> None:
+        lane = lane_queues[index]
+        while True:
+            update = lane.get()
+            if update is None:
+                return
+            in_flight[index] = time.time()
+            try:
+                bot.process_new_updates([update])
+            except Exception as err:
+                logging.error(
+                    f"Ошибка при обработке обновления {update.update_id}: {err}"
+                )
+            finally:
+                in_flight[index] = None
+                with handled_lock:
+                    health[HANDLED] += 1
+
+    threads = [
+        threading.Thread(target=lane_loop, args=(i,), name=f"lane-{i}", daemon=True)
+        for i in range(lanes)
+    ]
+    for thread in threads:
+        thread.start()
+
+    while True:
+        started = [value for value in in_flight if value is not None]
+        health[HEARTBEAT] = min(started, default=time.time())
+        try:
+            raw = updates.get(timeout=QUEUE_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+        if raw is None:
+            break
+        user_id = get_update_user_id(raw)
+        lane_queues[get_shard(user_id, lanes)].put(Update.de_json(raw))
+
+    for lane in lane_queues:
+        lane.put(None)
+    for thread in threads:
+        thread.join()
+
+
+class Supervisor:
+    """Запускает рабочие процессы бота и распределяет между ними обновления.
+    Обновления получаются методом getUpdates и отправляются процессу, выбранному по
+    идентификатору пользователя, поэтому состояние диалога и порядок сообщений одного
+    пользователя остаются в одном процессе. Упавшие процессы и процессы, которые дольше
+    health_timeout не получают обновления или обрабатывают одно обновление, перезапускаются.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        target: Callable[[int, multiprocessing.Queue, Any], None],
+        workers: int,
+        health_timeout: float,
+        health_interval: float,
+        env: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.token = token
+        self.target = target
+        self.workers = workers
+        self.health_timeout = health_timeout
+        self.health_interval = health_interval
+        self.env = env or {}
+        self.restarts = 0
+        self.lost = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = [self._context.Queue() for _ in range(workers)]
+        self._health = [self._context.RawArray("d", 2) for _ in range(workers)]
+        self._dispatched = [0] * workers
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._queues_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def start_worker(self, index: int) -> None:
+        """Запускает рабочий процесс с указанным номером.
+        Переменные окружения env передаются процессу и переопределяют его настройки.
+        :param index: Номер рабочего процесса.
+        :return None
+        """
+        self._health[index][HEARTBEAT] = time.time()
+        process = self._context.Process(
+            target=self.target,
+            args=(index, self._queues[index], self._health[index]),
+            name=f"bot-worker-{index}",
+            daemon=True,
+        )
+        previous_env = {key: os.environ.get(key) for key in self.env}
+        os.environ.update(self.env)
+        try:
+            process.start()
+        finally:
+            for key, value in previous_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        self._processes[index] = process
+        logging.info(f"Запущен рабочий процесс {index} (pid {process.pid})")
+
+    def check_workers(self) -> None:
+        """Перезапускает рабочие процессы, которые завершились или перестали отвечать.
+        :return None
+        """
+        now = time.time()
+        for index, process in enumerate(self._processes):
+            stalled = now - self._health[index][HEARTBEAT] > self.health_timeout
+            if process is not None and process.is_alive() and not stalled:
+                continue
+            if process is not None:
+                logging.warning(
+                    f"Рабочий процесс {index} (pid {process.pid}) "
+                    f"{'не отвечает' if process.is_alive() else 'завершился'}, перезапуск"
+                )
+                process.terminate()
+                process.join(timeout=5)
+                self._replace_queue(index)
+                self.restarts += 1
+            self.start_worker(index)
+
+    def dispatch(self, update: Dict[str, Any]) -> None:
+        """Отправляет обновление рабочему процессу, за которым закреплен пользователь.
+        :param update: Обновление в виде словаря.
+        :return None
+        """
+        index = get_shard(get_update_user_id(update), self.workers)
+        with self._queues_lock:
+            self._queues[index].put(update)
+            self._dispatched[index] += 1
+
+    def run(self) -> None:
+        """Запускает рабочие процессы и получает обновления до остановки супервизора.
+        :return None
+        """
+        for index in range(self.workers):
+            self.start_worker(index)
+
+        health_thread = threading.Thread(
+            target=self._health_loop, name="bot-health", daemon=True
+        )
+        health_thread.start()
+        try:
+            self._poll()
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Останавливает рабочие процессы, дав им обработать уже полученные обновления.
+        :return None
+        """
+        self._stop_event.set()
+        for updates in self._queues:
+            updates.put(None)
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает состояние рабочих процессов.
+        :return Dict[str, Any]: Количество живых процессов, перезапусков и обновлений,
+        потерянных при перезапусках.
+        """
+        alive = sum(1 for p in self._processes if p is not None and p.is_alive())
+        return {
+            "workers": self.workers,
+            "alive": alive,
+            "restarts": self.restarts,
+            "lost": self.lost,
+        }
+
+    def _replace_queue(self, index: int) -> None:
+        # Процесс мог завершиться, удерживая блокировку очереди, поэтому новый процесс
+        # получает новую очередь, а необработанные обновления переносятся в нее.
+        # Обновления, которые процесс уже забрал из очереди, но не обработал, теряются.
+        with self._queues_lock:
+            old = self._queues[index]
+            new = self._context.Queue()
+            moved = 0
+            while True:
+                try:
+                    update = old.get(timeout=DRAIN_TIMEOUT)
+                except queue.Empty:
+                    break
+                if update is not None:
+                    new.put(update)
+                    moved += 1
+            lost = self._dispatched[index] - int(self._health[index][HANDLED]) - moved
+            self._queues[index] = new
+            self._dispatched[index] = moved
+            self._health[index][HANDLED] = 0
+        self.lost += lost
+        if lost:
+            logging.error(
+                f"При перезапуске процесса {index} потеряно необработанных обновлений: {lost}"
+            )
+        logging.info(f"Процессу {index} передано необработанных обновлений: {moved}")
+
+    def _health_loop(self) -> None:
+        while not self._stop_event.wait(self.health_interval):
+            try:
+                self.check_workers()
+            except Exception as err:
+                logging.error(f"Ошибка при проверке рабочих процессов: {err}")
+
+    def _poll(self) -> None:
+        apihelper.delete_webhook(self.token)
+        offset = None
+        while not self._stop_event.is_set():
+            try:
+                updates = apihelper.get_updates(
+                    self.token,
+                    offset=offset,
+                    timeout=POLL_TIMEOUT,
+                    long_polling_timeout=POLL_TIMEOUT,
+                )
+            except Exception as err:
+                logging.error(f"Ошибка при получении обновлений: {err}")
+                time.sleep(3)
+                continue
+            for update in updates:
+                offset = update["update_id"] + 1
+                self.dispatch(update)
@@ -0,0 +1,66 @@
+import unicodedata
+
+ELLIPSIS = "…"
+ZWJ = "\u200d"
+
+
+def utf16_len(text: str) -> int:
+    """Возвращает длину текста в кодовых единицах UTF-16, в которых Telegram считает лимиты.
+    :param text: Текст.
+    :return int: Длина текста.
+    """
+    return len(text.encode("utf-16-le")) // 2
+
+
+def extends_grapheme(char: str) -> bool:
+    """Проверяет, что символ продолжает предыдущую графему и не может начинать новую:
+    комбинируемые знаки, селекторы начертания, модификаторы цвета кожи эмодзи и теги.
+    :param char: Символ.
+    :return bool: True, если перед символом нельзя обрезать текст.
+    """
+    code = ord(char)
+    return (
+        unicodedata.category(char) in ("Mn", "Me", "Mc")
+        or char == ZWJ
+        or 0xFE00 <= code <= 0xFE0F
+        or 0x1F3FB <= code <= 0x1F3FF
+        or 0xE0020 <= code <= 0xE007F
+    )
+
+
+def truncate(text: str, limit: int) -> str:
+    """Обрезает текст до limit кодовых единиц UTF-16, не разрывая графемы, и добавляет многоточие.
+    Эмодзи с селекторами и модификаторами, последовательности через ZWJ, флаги и буквы
+    с комбинируемыми знаками удаляются целиком.
+    :param text: Текст.
+    :param limit: Максимальная длина результата в кодовых единицах UTF-16.
+    :return str: Исходный текст, если он помещается, иначе обрезанный текст с многоточием.
+    """
+    if utf16_len(text) <= limit:
+        return text
+
+    budget = limit - utf16_len(ELLIPSIS)
+    end = 0
+    used = 0
+    for char in text:
+        size = 2 if ord(char) > 0xFFFF else 1
+        if used + size > budget:
+            break
+        used += size
+        end += 1
+
+    while end > 0 and (
+        extends_grapheme(text[end]) or text[end - 1] == ZWJ or _splits_flag(text, end)
+    ):
+        end -= 1
+    return text[:end].rstrip() + ELLIPSIS
+
+
+def _splits_flag(text: str, end: int) -> bool:
+    # Флаг состоит из пары региональных индикаторов; считаем их подряд до позиции end.
+    count = 0
+    index = end - 1
+    while index >= 0 and 0x1F1E6 <= ord(text[index]) <= 0x1F1FF:
+        count += 1
+        index -= 1
+    return count % 2 == 1 and 0x1F1E6 <= ord(text[end]) <= 0x1F1FF
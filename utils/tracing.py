@@ -0,0 +1,298 @@
+import asyncio
+import contextlib
+import functools
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+from config_data.config import settings
+
+# Этапы обработки обновления.
+STATE = "state"
+API = "api"
+RENDER = "render"
+SEND = "send"
+DB = "db"
+
+
+class Trace:
+    """Время, потраченное на этапы обработки одного обновления.
+    Время вложенных этапов вычитается из внешнего, поэтому сумма этапов не больше общего.
+    """
+
+    def __init__(self, update_type: str) -> None:
+        self.update_type = update_type
+        self.handler: Optional[str] = None
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+        self.samples: Counter = Counter()
+        self.thread_id = threading.get_ident()
+        self.task = _current_task()
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, duration: float) -> None:
+        """Учитывает время этапа.
+        :param stage: Этап, например api или send.
+        :param duration: Собственное время этапа в секундах.
+        :return None
+        """
+        with self._lock:
+            total = self.stages.setdefault(stage, [0.0, 0])
+            total[0] += duration
+            total[1] += 1
+
+    def elapsed(self) -> float:
+        """Возвращает время с начала обработки обновления.
+        :return float: Время в секундах.
+        """
+        return time.perf_counter() - self.started
+
+    def breakdown(self, elapsed: float) -> str:
+        """Описывает, на что ушло время обработки обновления.
+        :param elapsed: Общее время обработки в секундах.
+        :return str: Строка вида "send 38.10 сек. (100), api 1.20 сек. (1), прочее 0.50 сек.".
+        """
+        with self._lock:
+            stages = sorted(
+                self.stages.items(), key=lambda item: item[1][0], reverse=True
+            )
+        parts = [
+            f"{stage} {total:.2f} сек. ({count})" for stage, (total, count) in stages
+        ]
+        other = elapsed - sum(total for _, (total, _) in stages)
+        parts.append(f"прочее {max(other, 0.0):.2f} сек.")
+        return ", ".join(parts)
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+# Открытый этап: [название, время вложенных этапов].
+_span: ContextVar[Optional[list]] = ContextVar("span", default=None)
+
+
+def _current_task() -> Optional[asyncio.Task]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+@contextlib.contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Измеряет время этапа обработки текущего обновления.
+    Вне обработки обновления, например в фоновых потоках, ничего не делает.
+    :param stage: Этап, например api или send.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    parent = _span.get()
+    current = [stage, 0.0]
+    token = _span.set(current)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        _span.reset(token)
+        trace.add(stage, duration - current[1])
+        if parent is not None:
+            parent[1] += duration
+
+
+def traced(stage: str) -> Callable[[Callable], Callable]:
+    """Декоратор, измеряющий время вызова функции или корутины как этап обработки обновления.
+    :param stage: Этап, например api или send.
+    :return Callable: Декоратор.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def set_handler(name: str) -> None:
+    """Запоминает обработчик, которому досталось текущее обновление.
+    :param name: Имя обработчика.
+    :return None
+    """
+    trace = _trace.get()
+    if trace is not None:
+        trace.handler = name
+
+
+class Tracer:
+    """Трассировка обработки обновлений.
+    Если обработка обновления заняла больше slow_update секунд, в лог пишется разбивка
+    времени по этапам. Если включено профилирование, обновления, которые выполняются
+    дольше profile_after секунд, раз в profile_interval секунд снимаются сэмплирующим
+    профилировщиком, а стеки медленных обновлений сохраняются в profile_dir в формате
+    collapsed stacks, который принимают flamegraph.pl и speedscope.
+    """
+
+    def __init__(
+        self,
+        slow_update: float,
+        profile: bool,
+        profile_after: float,
+        profile_interval: float,
+        profile_dir: str,
+    ) -> None:
+        self.slow_update = slow_update
+        self.profile = profile
+        self.profile_after = profile_after
+        self.profile_interval = profile_interval
+        self.profile_dir = profile_dir
+        self.slow = 0
+        self._active: Dict[int, Trace] = {}
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    @contextlib.contextmanager
+    def update(self, update_type: str) -> Iterator[Trace]:
+        """Трассирует обработку одного обновления.
+        :param update_type: Тип обновления, например message или callback_query.
+        """
+        trace = Trace(update_type)
+        token = _trace.set(trace)
+        if self.profile:
+            self._watch(trace)
+        try:
+            yield trace
+        finally:
+            _trace.reset(token)
+            if self.profile:
+                with self._lock:
+                    self._active.pop(id(trace), None)
+            self._finish(trace, trace.elapsed())
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает количество медленных обновлений.
+        :return Dict[str, int]: Статистика трассировки.
+        """
+        return {"slow": self.slow}
+
+    def _finish(self, trace: Trace, elapsed: float) -> None:
+        if not self.slow_update or elapsed < self.slow_update:
+            return
+        with self._lock:
+            self.slow += 1
+        message = (
+            f"Медленное обновление {trace.update_type} ({trace.handler or '-'}), "
+            f"{elapsed:.2f} сек.: {trace.breakdown(elapsed)}"
+        )
+        if trace.samples:
+            try:
+                message += f"; профиль: {self._dump(trace)}"
+            except OSError as err:
+                logging.error(f"Ошибка при сохранении профиля обновления: {err}")
+        logging.warning(message)
+
+    def _dump(self, trace: Trace) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = "-".join(
+            (
+                datetime.now().strftime("%Y%m%d-%H%M%S"),
+                trace.update_type,
+                trace.handler or "unknown",
+                str(id(trace)),
+            )
+        )
+        path = os.path.join(self.profile_dir, f"{name}.folded")
+        with trace._lock:
+            samples = trace.samples.most_common()
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in samples:
+                file.write(f"{stack} {count}\n")
+        return path
+
+    def _watch(self, trace: Trace) -> None:
+        with self._lock:
+            self._active[id(trace)] = trace
+            if self._sampler is None:
+                self._sampler = threading.Thread(
+                    target=self._sample_loop, name="update-profiler", daemon=True
+                )
+                self._sampler.start()
+
+    def _sample_loop(self) -> None:
+        while True:
+            time.sleep(self.profile_interval)
+            with self._lock:
+                traces = [
+                    trace
+                    for trace in self._active.values()
+                    if trace.elapsed() >= self.profile_after
+                ]
+            if not traces:
+                continue
+            frames = sys._current_frames()
+            for trace in traces:
+                try:
+                    stack = _sample(trace, frames)
+                except Exception as err:
+                    logging.debug(f"Не удалось снять стек обновления: {err}")
+                    continue
+                if stack:
+                    with trace._lock:
+                        trace.samples[stack] += 1
+
+
+def _sample(trace: Trace, frames: Dict[int, object]) -> str:
+    # Для корутин стек собирается по цепочке await задачи: поток цикла событий
+    # в момент снятия может выполнять другое обновление.
+    labels = []
+    if trace.task is not None:
+        coro = trace.task.get_coro()
+        while coro is not None:
+            frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+            if frame is None:
+                break
+            labels.append(_label(frame))
+            coro = getattr(coro, "cr_await", None) or getattr(
+                coro, "gi_yieldfrom", None
+            )
+        return ";".join(labels)
+
+    frame = frames.get(trace.thread_id)
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+tracer = Tracer(
+    slow_update=settings.TRACE_SLOW_UPDATE,
+    profile=settings.TRACE_PROFILE,
+    profile_after=settings.TRACE_PROFILE_AFTER,
+    profile_interval=settings.TRACE_PROFILE_INTERVAL,
+    profile_dir=settings.TRACE_PROFILE_DIR,
+)
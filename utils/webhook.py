@@ -0,0 +1,189 @@
+import hmac
+import json
+import logging
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from telebot import TeleBot
+from telebot.types import Update
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+MAX_BODY_SIZE = 1024 * 1024
+HEALTH_PATH = "/health"
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """Встроенный HTTP-сервер, принимающий обновления Telegram по вебхуку.
+    Запрос подтверждается сразу после разбора, а сами обновления обрабатываются
+    в пуле потоков бота, поэтому Telegram не ждет окончания работы обработчиков.
+    По GET /health сервер отдает счетчики запросов для проверок балансировщика.
+    В тестовом режиме сервер принимает и списки обновлений, например из файлов-фикстур.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        bot: TeleBot,
+        host: str,
+        port: int,
+        path: str,
+        secret_token: Optional[str] = None,
+        test_mode: bool = False,
+        stats_providers: Optional[Dict[str, Callable[[], Dict[str, Any]]]] = None,
+    ) -> None:
+        super().__init__((host, port), WebhookRequestHandler)
+        self.bot = bot
+        self.webhook_path = path
+        self.secret_token = secret_token
+        self.test_mode = test_mode
+        self.stats_providers = stats_providers or {}
+        self.received = 0
+        self.rejected = 0
+        self._counter_lock = threading.Lock()
+
+    def check_secret(self, token: Optional[str]) -> bool:
+        """Проверяет секретный токен из заголовка запроса.
+        :param token: Значение заголовка X-Telegram-Bot-Api-Secret-Token.
+        :return bool: True, если токен совпадает с заданным. Без заданного токена
+        запросы принимаются только в тестовом режиме.
+        """
+        if not self.secret_token:
+            return self.test_mode
+        return token is not None and hmac.compare_digest(token, self.secret_token)
+
+    def parse_updates(self, body: bytes) -> List[Update]:
+        """Разбирает тело запроса в список обновлений.
+        :param body: Тело запроса в формате JSON.
+        :return List[Update]: Обновления из запроса.
+        """
+        payload = json.loads(body)
+        if isinstance(payload, list) and self.test_mode:
+            return [Update.de_json(item) for item in payload]
+        if not isinstance(payload, dict):
+            raise ValueError("ожидался объект Update")
+        return [Update.de_json(payload)]
+
+    def dispatch(self, updates: List[Update]) -> None:
+        """Передает обновления в пул потоков бота.
+        :param updates: Список обновлений.
+        :return None
+        """
+        with self._counter_lock:
+            self.received += len(updates)
+        if self.bot.threaded:
+            self.bot.worker_pool.put(self.bot.process_new_updates, updates)
+        else:
+            self.bot.process_new_updates(updates)
+
+    def reject(self) -> None:
+        with self._counter_lock:
+            self.rejected += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает количество принятых обновлений и отклоненных запросов, а также
+        статистику из stats_providers, например остаток лимита запросов к API.
+        :return Dict[str, Any]: Статистика сервера.
+        """
+        with self._counter_lock:
+            stats: Dict[str, Any] = {
+                "received": self.received,
+                "rejected": self.rejected,
+            }
+        for name, provider in self.stats_providers.items():
+            try:
+                stats[name] = provider()
+            except Exception as err:
+                logging.error(f"Ошибка при получении статистики {name}: {err}")
+        return stats
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик HTTP-запросов вебхука."""
+
+    server: WebhookServer
+
+    def do_POST(self) -> None:
+        if self.path != self.server.webhook_path:
+            self.send_error(404)
+            return
+        if not self.server.check_secret(self.headers.get(SECRET_HEADER)):
+            self.server.reject()
+            logging.warning(f"Отклонен запрос вебхука от {self.client_address[0]}")
+            self.send_error(403)
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY_SIZE:
+            self.send_error(413 if length > MAX_BODY_SIZE else 400)
+            return
+        try:
+            updates = self.server.parse_updates(self.rfile.read(length))
+        except (ValueError, KeyError, TypeError) as err:
+            logging.warning(f"Некорректное обновление в запросе вебхука: {err}")
+            self.send_error(400)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        self.server.dispatch(updates)
+
+    def do_GET(self) -> None:
+        if self.path != HEALTH_PATH:
+            self.send_error(404)
+            return
+        body = json.dumps(self.server.stats()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug(f"Вебхук {self.client_address[0]}: {format % args}")
+
+
+def run_webhook(
+    bot: TeleBot,
+    url: str,
+    host: str,
+    port: int,
+    path: str,
+    secret_token: Optional[str] = None,
+    test_mode: bool = False,
+    stats_providers: Optional[Dict[str, Callable[[], Dict[str, Any]]]] = None,
+) -> None:
+    """Регистрирует вебхук в Telegram и обслуживает запросы до остановки процесса.
+    В тестовом режиме вебхук не регистрируется, сервер только принимает POST-запросы с обновлениями.
+    Если секретный токен не задан, вне тестового режима для вебхука создается случайный токен.
+    :param bot: Телеграм бот.
+    :param url: Публичный адрес сервера, на который Telegram будет отправлять обновления.
+    :param host: Адрес, на котором слушает сервер.
+    :param port: Порт сервера.
+    :param path: Путь, по которому принимаются обновления.
+    :param secret_token: Секретный токен для проверки запросов.
+    :param test_mode: Режим локального тестирования без регистрации вебхука.
+    :param stats_providers: Дополнительная статистика для GET /health по именам разделов.
+    :return None
+    """
+    if not test_mode and not secret_token:
+        secret_token = secrets.token_urlsafe(32)
+        logging.info(
+            "WEBHOOK_SECRET не задан, для вебхука создан случайный секретный токен"
+        )
+    server = WebhookServer(
+        bot, host, port, path, secret_token, test_mode, stats_providers
+    )
+    if not test_mode:
+        bot.remove_webhook()
+        bot.set_webhook(url=url.rstrip("/") + path, secret_token=secret_token)
+    logging.info(f"Вебхук слушает {host}:{port}{path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if not test_mode:
+            bot.remove_webhook()